@@ -0,0 +1,64 @@
+"""
+Benchmark binning event lists into spectra and spectrograms.
+
+Compares ``np.histogram`` and ``np.histogram2d`` with the ``np.bincount`` based
+binning of `padre_sharp.calibration.binning`.
+
+Run with ``python benchmarks/bench_binning.py [num_events]``.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from padre_sharp.calibration import binning
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(num_events=100_000_000):
+    rng = np.random.default_rng(0)
+    # One day of events
+    times = np.sort(rng.uniform(0, 86_400, num_events))
+    energies = rng.exponential(10, num_events).astype(np.float32)
+    edges = binning.DEFAULT_ENERGY_EDGES
+    time_edges = np.arange(0.0, 86_401.0, 1.0)
+    print(f"{num_events:,} events, {len(edges) - 1} energy bins")
+
+    # The numpy histograms are slow, time them on a tenth of the events
+    sample = slice(0, num_events // 10)
+    for name, elapsed, num in [
+        (
+            "np.histogram",
+            timeit(np.histogram, energies[sample], edges),
+            num_events // 10,
+        ),
+        ("spectrum", timeit(binning.spectrum, energies, edges), num_events),
+        (
+            "np.histogram2d",
+            timeit(
+                np.histogram2d, times[sample], energies[sample], [time_edges, edges]
+            ),
+            num_events // 10,
+        ),
+        (
+            "spectrogram",
+            timeit(binning.spectrogram, times, energies, time_edges, edges),
+            num_events,
+        ),
+        (
+            "spectrograms",
+            timeit(binning.spectrograms, times, energies, energy_edges=[edges]),
+            num_events,
+        ),
+    ]:
+        print(f"{name:>16}: {num / elapsed:14,.0f} events/s, {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
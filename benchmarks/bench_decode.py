@@ -0,0 +1,92 @@
+"""
+Benchmark decoding raw SHARP files into event tables.
+
+Compares a per-packet loop with the bulk `padre_sharp.io.decode.decode_packets`
+for files of increasing size.
+
+Run with ``python benchmarks/bench_decode.py [size_mb ...]``.
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from padre_sharp.io import decode
+from padre_sharp.util import packets
+
+
+def make_file(path, num_bytes, packet_nbytes=22_000, seed=0):
+    """Write a file of science packets filled with random event records."""
+    rng = np.random.default_rng(seed)
+    num_packets = max(1, num_bytes // packet_nbytes)
+    buffer = rng.integers(0, 256, (num_packets, packet_nbytes), dtype=np.uint8)
+    buffer[:, 0] = 0x08
+    buffer[:, 1] = decode.SCIENCE_APID
+    seq = np.arange(num_packets) % 16384
+    buffer[:, 2] = 0xC0 | (seq >> 8)
+    buffer[:, 3] = seq & 0xFF
+    buffer[:, 4] = (packet_nbytes - 7) >> 8
+    buffer[:, 5] = (packet_nbytes - 7) & 0xFF
+    # No frame headers
+    buffer[:, 12] = 0
+    buffer.tofile(path)
+
+
+def per_packet_loop(path):
+    """Decode each packet on its own into an event table and concatenate them."""
+    view = packets.open_packets(path, use_cache=False)
+    tables = []
+    for i in range(len(view)):
+        packet = view.packet(i)
+        coarse_time = int.from_bytes(packet[6:12].tobytes(), "big")
+        data = packet[12:].tobytes()
+        num_records = len(data) // decode.EVENT_RECORD_DTYPE.itemsize
+        records = np.frombuffer(
+            data, dtype=decode.EVENT_RECORD_DTYPE, count=num_records
+        )
+        table = np.empty(num_records, dtype=decode.EVENT_DTYPE)
+        table["packet_index"] = i
+        table["coarse_time"] = coarse_time
+        table["fine_time"] = records["fine_time"]
+        table["channel"] = records["channel_adc"] >> decode.ADC_NUM_BITS
+        table["adc"] = records["channel_adc"] & ((1 << decode.ADC_NUM_BITS) - 1)
+        table["flags"] = records["flags"]
+        table["energy"] = np.nan
+        tables.append(table)
+    return np.concatenate(tables)
+
+
+def bulk(path):
+    return decode.decode_packets(packets.open_packets(path, use_cache=False))
+
+
+def timeit(func, *args, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(*sizes_mb):
+    sizes_mb = sizes_mb or (1, 10, 100)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes_mb:
+            path = Path(tmp_dir) / f"bench_{size_mb}.DAT"
+            make_file(path, int(size_mb * 1e6))
+            num_events = len(bulk(path)["events"])
+            print(f"{size_mb} MB, {num_events} events")
+            for name, func in [("per-packet loop", per_packet_loop), ("bulk", bulk)]:
+                elapsed = timeit(func, path)
+                print(
+                    f"{name:>16}: {size_mb / elapsed:8,.1f} MB/s "
+                    f"{num_events / elapsed:14,.0f} events/s"
+                )
+
+
+if __name__ == "__main__":
+    main(*map(float, sys.argv[1:]))
@@ -0,0 +1,53 @@
+"""
+Benchmark decoding a raw file against loading its tables from the decode cache.
+
+The raw file is the sample file repeated to the given size.
+
+Run with ``python benchmarks/bench_decode_cache.py [num_repeats]``.
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from padre_sharp.io import decode, decode_cache
+
+SAMPLE_FILE = Path(__file__).parent.parent / (
+    "padre_sharp/tests/data/PADRESP13_250503042550.DAT"
+)
+
+
+def best_of(func, *args, repeat=3):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = func(*args)
+        # Touch the tables, a memory map is only read when used
+        float(data["events"]["energy"].sum())
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def main(num_repeats=400):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        data_filename = temp_dir / SAMPLE_FILE.name
+        np.tile(np.fromfile(SAMPLE_FILE, dtype=np.uint8), num_repeats).tofile(
+            data_filename
+        )
+        cache = decode_cache.DecodeCache(temp_dir / "decoded", max_size=10**10)
+        cache.decode_file(data_filename)
+        decoded = best_of(decode.decode_file, data_filename)
+        cached = best_of(cache.decode_file, data_filename)
+        size = data_filename.stat().st_size
+        print(
+            f"{size / 1e6:.1f} MB raw file: decode {decoded:6.3f} s, "
+            f"decode cache {cached:6.3f} s ({decoded / cached:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
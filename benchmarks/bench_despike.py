@@ -0,0 +1,64 @@
+"""
+Benchmark despiking a full day light curve at 1 ms cadence.
+
+Compares the rolling median of `padre_sharp.calibration.despiking` with
+``np.median`` over a sliding window view, then times the full despike.
+
+Run with ``python benchmarks/bench_despike.py [num_samples] [window]``.
+"""
+
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from padre_sharp.calibration import despiking
+
+#: One day at 1 ms cadence
+NUM_SAMPLES = 86_400_000
+
+
+def sliding_window_median(data, window, chunk_size=despiking.DEFAULT_CHUNK_SIZE):
+    """Rolling median with ``np.median`` on a sliding window view, by chunk."""
+    half_window = window // 2
+    padded = np.pad(data, half_window, mode="reflect")
+    median = np.empty(len(data), dtype=np.float32)
+    for start in range(0, len(data), chunk_size):
+        segment = padded[start : start + chunk_size + window - 1]
+        median[start : start + chunk_size] = np.median(
+            sliding_window_view(segment, window), axis=1
+        )
+    return median
+
+
+def timeit(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main(num_samples=NUM_SAMPLES, window=9):
+    rng = np.random.default_rng(0)
+    counts = rng.poisson(20, num_samples).astype(np.int32)
+    spikes = rng.choice(num_samples, num_samples // 100_000, replace=False)
+    counts[spikes] += 1000
+    print(f"{num_samples:,} samples, window {window}, {len(spikes)} spikes injected")
+
+    # The sliding window median is slow, time it on a tenth of the data
+    sample = counts[: num_samples // 10]
+    elapsed, _ = timeit(sliding_window_median, sample, window)
+    print(f"{'np.median':>16}: {len(sample) / elapsed:14,.0f} samples/s")
+    elapsed, _ = timeit(despiking.rolling_median, sample, window)
+    print(f"{'rolling_median':>16}: {len(sample) / elapsed:14,.0f} samples/s")
+
+    elapsed, result = timeit(despiking.despike, counts, window=window)
+    print(
+        f"{'despike':>16}: {len(counts) / elapsed:14,.0f} samples/s, "
+        f"{elapsed:.1f} s, {result.num_spikes} spikes found, "
+        f"{result.num_corrected} corrected"
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,62 @@
+"""
+Benchmark the cold start import time of the package and its main modules.
+
+Each module is imported in a new interpreter with ``python -X importtime``, the
+cumulative import time and the slowest modules it imports are printed.
+
+Run with ``python benchmarks/bench_import_time.py [module ...]``.
+"""
+
+import subprocess
+import sys
+
+MODULES = [
+    "padre_sharp",
+    "padre_sharp.io.decode",
+    "padre_sharp.io.file_tools",
+    "padre_sharp.calibration",
+]
+
+
+def import_times(code, repeat=3):
+    """
+    Return the best cumulative import time of each module imported, in seconds.
+    """
+    best = {}
+    for _ in range(repeat):
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            name = name.strip()
+            best[name] = min(best.get(name, float("inf")), int(cumulative) / 1e6)
+    return best
+
+
+def main(*modules):
+    # Imported at interpreter startup, before the module
+    startup = set(import_times("pass"))
+    for module in modules or MODULES:
+        times = import_times(f"import {module}")
+        print(f"{module}: {times[module] * 1e3:7.1f} ms")
+        slowest = sorted(
+            (
+                name
+                for name in times
+                if "." not in name and name != module and name not in startup
+            ),
+            key=times.get,
+            reverse=True,
+        )
+        for name in slowest[:5]:
+            print(f"    {name:30s} {times[name] * 1e3:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
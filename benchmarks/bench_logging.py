@@ -0,0 +1,66 @@
+"""
+Benchmark the time the calling thread spends logging warnings to a file, with
+and without asynchronous logging.
+
+The file is written through the page cache, as on a local disk, and synced
+after every record, as a stand in for slow or network storage.
+
+Run with ``python benchmarks/bench_logging.py [num_records]``.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import padre_sharp
+
+
+class SyncedFileHandler(logging.FileHandler):
+    def emit(self, record):
+        super().emit(record)
+        os.fsync(self.stream.fileno())
+
+
+def time_logging(log, num_records):
+    start = time.perf_counter()
+    for i in range(num_records):
+        log.warning(f"Validation finding {i}")
+    return time.perf_counter() - start
+
+
+def main(num_records=20000):
+    padre_sharp.log.name  # set up the logger
+    log = logging.getLogger("padre_sharp")
+    for handler in log.handlers[:]:
+        log.removeHandler(handler)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for handler_class in [logging.FileHandler, SyncedFileHandler]:
+            handler = handler_class(Path(temp_dir) / "bench.log")
+            handler.setFormatter(
+                logging.Formatter("%(asctime)s, %(origin)s, %(levelname)s, %(message)s")
+            )
+            log.addHandler(handler)
+            print(f"{handler_class.__name__}:")
+            elapsed = time_logging(log, num_records)
+            print(f"    synchronous: {num_records / elapsed:9.0f} records/s")
+            for full_policy in ["block", "drop"]:
+                log.enable_async_logging(full_policy=full_policy)
+                (queue_handler,) = log.handlers
+                elapsed = time_logging(log, num_records)
+                start = time.perf_counter()
+                log.disable_async_logging()
+                flushed = time.perf_counter() - start
+                print(
+                    f"    async {full_policy}:  {num_records / elapsed:9.0f} records/s, "
+                    f"{queue_handler.num_dropped} dropped, "
+                    f"flushed in {flushed:.3f} s"
+                )
+            log.removeHandler(handler)
+            handler.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,92 @@
+"""
+Benchmark merging overlapping l1 event list files into one daily product.
+
+Compares the streaming merge of `padre_sharp.calibration.merge` with loading all
+the files, concatenating, sorting and dropping duplicates in memory.
+
+Run with ``python benchmarks/bench_merge.py [num_files] [events_per_file]``.
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import astropy.units as u
+import numpy as np
+from astropy.time import Time
+
+from padre_sharp.calibration import merge
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode
+
+
+def make_files(output_dir, num_files, events_per_file):
+    rng = np.random.default_rng(0)
+    filenames = []
+    for i in range(num_files):
+        # Each downlink overlaps the next by a tenth
+        start = i * 0.9 * 86_400 / num_files
+        times = np.sort(rng.uniform(start, start + 86_400 / num_files, events_per_file))
+        events = np.zeros(events_per_file, dtype=decode.EVENT_DTYPE)
+        events["coarse_time"] = times
+        events["fine_time"] = (times % 1) * 2**16
+        events["adc"] = rng.integers(0, 4096, events_per_file)
+        events["energy"] = rng.exponential(10, events_per_file)
+        product = DataProduct(
+            instrument="sharp",
+            time=Time("2025-05-03") + i * u.min,
+            level="l1",
+            descriptor="eventlist",
+            data={"events": decode.sort_events(events)},
+        )
+        filenames.append(product.write(output_dir))
+    return filenames
+
+
+def merge_in_memory(filenames, output_dir):
+    events = np.concatenate(
+        [DataProduct.from_file(filename).data["events"] for filename in filenames]
+    )
+    events = np.unique(events[list(merge.DUPLICATE_COLUMNS)], return_index=True)[1]
+    return events
+
+
+def measure(func, *args, **kwargs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(num_files=16, events_per_file=2_000_000):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = Path(temp_dir)
+        (temp_dir / "inputs").mkdir()
+        filenames = make_files(temp_dir / "inputs", num_files, events_per_file)
+        num_events = num_files * events_per_file
+        print(f"{num_files} files, {num_events:,} events")
+        for name, (elapsed, peak) in [
+            ("in memory", measure(merge_in_memory, filenames, temp_dir)),
+            (
+                "merge_eventlists",
+                measure(
+                    merge.merge_eventlists,
+                    filenames,
+                    output_dir=temp_dir,
+                    chunk_size=256 * 1024,
+                ),
+            ),
+        ]:
+            print(
+                f"{name:>16}: {num_events / elapsed:14,.0f} events/s, "
+                f"{elapsed:6.2f} s, peak {peak / 1e6:8.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,99 @@
+"""
+Benchmark reading a time range of events from l1 event list files of growing size.
+
+Compares ``read_file(path, time_range=...)``, which binary searches the time
+index and reads only the needed rows, with reading the whole event table and
+masking it. Also compares the peak memory of streaming the whole event table
+with ``iter_chunks`` and of loading it.
+
+Run with ``python benchmarks/bench_read_file.py``.
+"""
+
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from astropy.time import Time
+
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode, file_tools
+
+#: Events per second of the simulated files
+RATE = 1000
+
+
+def write_file(output_dir, num_events):
+    events = np.zeros(num_events, dtype=decode.EVENT_DTYPE)
+    times = np.arange(num_events) / RATE
+    events["coarse_time"] = times
+    events["fine_time"] = (times % 1) * 2**16
+    product = DataProduct(
+        instrument="sharp",
+        time=Time("2025-05-03"),
+        level="l1",
+        descriptor="eventlist",
+        data={"events": events},
+    )
+    return product.write(output_dir)
+
+
+def read_indexed(filename, time_range):
+    return file_tools.read_file(filename, time_range=time_range).read("events")
+
+
+def sum_streamed(filename, n_rows=1_000_000):
+    dataset = file_tools.read_file(filename)
+    return sum(float(chunk["energy"].sum()) for chunk in dataset.iter_chunks(n_rows))
+
+
+def sum_loaded(filename):
+    return float(DataProduct.from_file(filename).data["events"]["energy"].sum())
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def read_masked(filename, time_range):
+    events = DataProduct.from_file(filename).data["events"]
+    times = decode.event_times(events)
+    return events[(times >= time_range[0]) & (times < time_range[1])]
+
+
+def best_of(func, *args, repeat=5, **kwargs):
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for num_events in [1_000_000, 4_000_000, 16_000_000]:
+            filename = write_file(Path(temp_dir), num_events)
+            # 30 s around the middle of the file
+            middle = num_events / RATE / 2
+            time_range = (middle - 15, middle + 15)
+            file_tools.get_time_index(filename)
+            indexed = best_of(read_indexed, filename, time_range)
+            masked = best_of(read_masked, filename, time_range, repeat=1)
+            streamed = peak_memory(sum_streamed, filename)
+            loaded = peak_memory(sum_loaded, filename)
+            print(
+                f"{num_events:>12,} events: read_file {indexed * 1e3:8.2f} ms, "
+                f"whole file {masked * 1e3:9.1f} ms; peak memory iter_chunks "
+                f"{streamed / 1e6:7.1f} MB, whole file {loaded / 1e6:7.1f} MB"
+            )
+            filename.unlink()
+
+
+if __name__ == "__main__":
+    main()
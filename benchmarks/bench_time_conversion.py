@@ -0,0 +1,67 @@
+"""
+Benchmark converting spacecraft times to UTC.
+
+Compares the vectorized conversions of `padre_sharp.util.time_conversion` with
+building an `~astropy.time.Time` for each row, which is timed on a subset and
+extrapolated.
+
+Run with ``python benchmarks/bench_time_conversion.py [num_rows]``.
+"""
+
+import sys
+import time
+
+import numpy as np
+from astropy.time import Time, TimeDelta
+
+from padre_sharp.util import time_conversion
+
+NUM_PER_ROW = 2_000
+
+#: A clock counting from the GPS epoch
+EPOCH = "1980-01-06T00:00:00"
+
+
+def per_row(coarse_time, fine_time):
+    epoch = Time(EPOCH, scale="utc")
+    return [
+        (epoch + TimeDelta(int(coarse), fine / 2**16, format="sec")).unix
+        for coarse, fine in zip(coarse_time, fine_time)
+    ]
+
+
+def measure(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(num_rows=10_000_000):
+    rng = np.random.default_rng(0)
+    coarse_time = np.sort(rng.integers(1_430_000_000, 1_430_086_400, num_rows))
+    fine_time = rng.integers(0, 2**16, num_rows).astype(np.uint16)
+    # Warm the leap second table and the astropy caches
+    time_conversion.spacecraft_to_time(EPOCH, coarse_time[:10], fine_time[:10])
+
+    print(f"{num_rows:,} rows")
+    results = [
+        (
+            "per row Time",
+            measure(per_row, coarse_time[:NUM_PER_ROW], fine_time[:NUM_PER_ROW])
+            * num_rows
+            / NUM_PER_ROW,
+        )
+    ]
+    for func in [
+        time_conversion.spacecraft_to_unix,
+        time_conversion.spacecraft_to_tt2000,
+        time_conversion.spacecraft_to_jd,
+        time_conversion.spacecraft_to_time,
+    ]:
+        results.append((func.__name__, measure(func, EPOCH, coarse_time, fine_time)))
+    for name, elapsed in results:
+        print(f"{name:>22}: {num_rows / elapsed:14,.0f} rows/s, {elapsed:9.2f} s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
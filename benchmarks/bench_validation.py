@@ -0,0 +1,67 @@
+"""
+Benchmark packet checksum validation.
+
+Compares the per-packet loop over ``ccsdspy.utils.split_packet_bytes`` with the
+vectorized `padre_sharp.util.validation.find_checksum_errors`.
+
+Run with ``python benchmarks/bench_validation.py [num_packets]``.
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from ccsdspy import utils
+
+from padre_sharp.util import validation
+
+
+def make_file(path, num_packets, packet_nbytes=2048, seed=0):
+    """Write a file of fixed length packets filled with random payloads."""
+    rng = np.random.default_rng(seed)
+    packets = rng.integers(0, 256, (num_packets, packet_nbytes), dtype=np.uint8)
+    packets[:, 0] = 0x08
+    packets[:, 1] = 0xA0
+    seq = np.arange(num_packets) % 16384
+    packets[:, 2] = 0xC0 | (seq >> 8)
+    packets[:, 3] = seq & 0xFF
+    packets[:, 4] = (packet_nbytes - 7) >> 8
+    packets[:, 5] = (packet_nbytes - 7) & 0xFF
+    packets.tofile(path)
+
+
+def per_packet_loop(file):
+    """The original implementation, one ``np.frombuffer`` per packet."""
+    errors = []
+    for i, packet in enumerate(utils.split_packet_bytes(file)):
+        if np.bitwise_xor.reduce(np.frombuffer(packet, dtype=np.uint8)) != 0:
+            errors.append(i)
+    return errors
+
+
+def timeit(func, *args, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(num_packets=100_000):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "bench.bin"
+        make_file(path, num_packets)
+        print(f"{num_packets} packets, {path.stat().st_size / 1e6:.1f} MB")
+        for name, func in [
+            ("per-packet loop", per_packet_loop),
+            ("vectorized", validation.find_checksum_errors),
+        ]:
+            elapsed = timeit(func, path)
+            print(f"{name:>16}: {num_packets / elapsed:12,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
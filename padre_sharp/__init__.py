@@ -1,5 +1,6 @@
 # see license/LICENSE.rst
 import os
+import threading
 from pathlib import Path
 
 try:
@@ -10,25 +11,50 @@ except ImportError:
     version_tuple = (0, 0, "unknown version")
 
 from padre_sharp.util.config import load_config, print_config
-from padre_sharp.util.logger import _init_log
+from padre_sharp.util.lazy import LazyObject
 
 # Get SWXSOC_MISSIONS environment variable if it exists or use default for mission
 SWXSOC_MISSION = os.getenv("SWXSOC_MISSION", "padre")
 os.environ["SWXSOC_MISSION"] = SWXSOC_MISSION
 
-# Load user configuration
-config = load_config()
-
-log = _init_log(config=config)
-
 # Then you can be explicit to control what ends up in the namespace,
 __all__ = ["config", "print_config"]
 
-log.debug(f"padre_sharp version: {__version__}")
-
 MISSION_NAME = "PADRE"
 INSTRUMENT_NAME = "SHARP"
 
 _package_directory = Path(__file__).parent
 _data_directory = _package_directory / "data"
 _test_files_directory = _package_directory / "data" / "test"
+
+#: Subpackages imported on first attribute access, e.g. ``padre_sharp.io``
+_SUBPACKAGES = ("calibration", "io", "util")
+
+_config_lock = threading.RLock()
+
+
+def __getattr__(name):
+    # The user configuration is loaded on first use rather than on import,
+    # see padre_sharp.util.lazy
+    if name == "config":
+        with _config_lock:
+            if "config" not in globals():
+                globals()["config"] = load_config()
+        return globals()["config"]
+    if name in _SUBPACKAGES:
+        import importlib
+
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _load_log():
+    # astropy is imported by the logger, only once something is logged
+    from padre_sharp.util.logger import _init_log
+
+    log = _init_log(config=__getattr__("config"))
+    log.debug(f"padre_sharp version: {__version__}")
+    return log
+
+
+log = LazyObject(_load_log)
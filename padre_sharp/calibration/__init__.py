@@ -1 +1,9 @@
 from .calibration import *
+from .registry import *
+from .manifest import *
+from .energy import *
+from .despiking import *
+from .binning import *
+from .accumulator import *
+from .merge import *
+from .batch import *
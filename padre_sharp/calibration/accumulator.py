@@ -0,0 +1,376 @@
+"""
+A module to accumulate spectrograms over many event list files.
+
+Spectrograms spanning weeks of data are built without loading whole event
+lists, each l1 ``eventlist`` file is read chunk by chunk from a memory mapped
+FITS file and its events added to a preallocated time and energy count grid.
+The grid can also be stored in a directory together with the progress of each
+file, so that an interrupted accumulation resumes from its last checkpoint.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import numpy as np
+from astropy.io import fits
+from astropy.time import Time
+
+from padre_sharp import log
+from padre_sharp.calibration import binning
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode
+from padre_sharp.util.lazy import LazyModule
+
+# swxsoc is slow to import, it is imported on first use
+util = LazyModule("swxsoc.util.util")
+
+__all__ = [
+    "DEFAULT_READ_SIZE",
+    "DEFAULT_CHECKPOINT_INTERVAL",
+    "SpectrogramAccumulator",
+]
+
+#: Default number of events read from a file at a time
+DEFAULT_READ_SIZE = 4 * 1024 * 1024
+
+#: Default number of seconds between two checkpoints of a stored accumulator
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+
+#: File names of the count grid of a checkpoint and the state in an accumulator
+#: directory
+COUNTS_FILENAME = "counts.{:d}.npy"
+STATE_FILENAME = "state.json"
+
+
+class SpectrogramAccumulator:
+    """
+    A time and energy count grid that event list files are added to.
+
+    The grid is fixed when the accumulator is created and has an underflow and
+    an overflow bin on both axes, so that every event added is counted once. Its
+    time axis is in UTC unix seconds, the event times of each file are converted
+    with the clock epoch of that file, so files from different power cycles of
+    the instrument fall in place. Events are read ``read_size`` at a time, the
+    memory used besides the grid does not depend on the size of the files.
+
+    With a ``path``, the grid and the number of events added from each file are
+    saved to that directory when `add_file` or `add_files` return, also on an
+    exception, and in between once ``checkpoint_interval`` seconds have passed
+    since the last checkpoint. Each checkpoint writes the whole grid, so many
+    files are best added with one call to `add_files`. The grid is a copy on
+    write memory map of the grid of the last checkpoint, so events added since
+    are never written to it, also if the process is killed. Creating an
+    accumulator on an existing directory resumes it from its last checkpoint,
+    files already added are skipped and a partly added file continues at its
+    first missing chunk.
+
+    Parameters
+    ----------
+    time_range: tuple
+        The start and end time of the grid, in UTC unix seconds.
+    cadence: float
+        The time resolution of the grid, in seconds.
+    energy_edges: `np.ndarray`, optional
+        The energy bin edges. Defaults to
+        `~padre_sharp.calibration.binning.DEFAULT_ENERGY_EDGES`.
+    path: Path, optional
+        The directory to store the accumulator in. The accumulator is only kept
+        in memory if not given.
+    value_name: str, optional
+        The event column to bin, ``"energy"`` or ``"adc"``.
+    read_size: int, optional
+        The number of events read from a file at a time.
+    checkpoint_interval: float, optional
+        The minimum number of seconds between two checkpoints while files are
+        added.
+    """
+
+    def __init__(
+        self,
+        time_range: Sequence[float],
+        cadence: float,
+        energy_edges: np.ndarray = None,
+        path: Path = None,
+        value_name: str = "energy",
+        read_size: int = DEFAULT_READ_SIZE,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    ) -> None:
+        start, end = (float(time) for time in time_range)
+        num_times = int(np.ceil((end - start) / cadence))
+        if num_times <= 0:
+            raise ValueError(f"The time range {time_range} is empty.")
+        if energy_edges is None:
+            energy_edges = binning.DEFAULT_ENERGY_EDGES
+        self.time_edges = start + cadence * np.arange(num_times + 1)
+        self.energy_edges = np.asarray(energy_edges, dtype=np.float64)
+        self.cadence = float(cadence)
+        self.value_name = value_name
+        self.read_size = read_size
+        self.checkpoint_interval = checkpoint_interval
+        self.path = None if path is None else Path(path)
+        # The state of the last checkpoint, to skip checkpoints without changes
+        self._saved_state = None
+        self._last_checkpoint = time.monotonic()
+
+        self._state = {
+            "time_edges": [start, cadence, num_times],
+            "energy_edges": self.energy_edges.tolist(),
+            "value_name": value_name,
+            "instrument": None,
+            "time": None,
+            "num_events": 0,
+            "files": {},
+            "checkpoint": 0,
+        }
+        shape = (num_times + 2, len(self.energy_edges) + 1)
+        if self.path is None:
+            self._counts = np.zeros(shape, dtype=np.int64)
+        elif (self.path / STATE_FILENAME).exists():
+            self._resume(shape)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._counts = np.zeros(shape, dtype=np.int64)
+            self.checkpoint()
+
+    @property
+    def counts(self) -> np.ndarray:
+        """The counts of each time and energy bin, a view of the grid."""
+        return self._counts[1:-1, 1:-1]
+
+    @property
+    def num_events(self) -> int:
+        """The number of events added, including the ones outside the grid."""
+        return self._state["num_events"]
+
+    @property
+    def num_outside(self) -> int:
+        """The number of events added outside of the grid."""
+        return self.num_events - int(self.counts.sum())
+
+    def add_events(self, events: np.ndarray, epoch: str) -> None:
+        """
+        Add the events of an event table to the grid.
+
+        Events added this way are not recorded in the state, an interrupted
+        accumulation can only resume the files added with `add_file`.
+
+        Parameters
+        ----------
+        events: `np.ndarray`
+            An event table, see `~padre_sharp.io.decode.EVENT_DTYPE`.
+        epoch: str
+            The UTC epoch of the clock of the events, see
+            `~padre_sharp.util.time_conversion.clock_epoch`.
+        """
+        binning.add_counts(
+            self._counts,
+            decode.event_times(events, epoch),
+            events[self.value_name],
+            self.time_edges,
+            self.energy_edges,
+        )
+        self._state["num_events"] += len(events)
+
+    def add_file(self, data_filename: Path) -> int:
+        """
+        Add the events of an l1 event list file, chunk by chunk.
+
+        Parameters
+        ----------
+        data_filename: Path
+            An l1 ``eventlist`` file written by the pipeline, with the clock
+            epoch of its events.
+
+        Returns
+        -------
+        num_events: int
+            The number of events added, 0 if the file was already added.
+        """
+        return self.add_files([data_filename])
+
+    def add_files(self, data_filenames: Iterable[Path]) -> int:
+        """
+        Add the events of several l1 event list files, see `add_file`.
+
+        Returns
+        -------
+        num_events: int
+            The number of events added.
+        """
+        try:
+            return sum(
+                self._add_file(data_filename) for data_filename in data_filenames
+            )
+        finally:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """
+        Write the count grid and the state to the accumulator directory.
+
+        The grid is written to a new file, which the state names. Replacing the
+        state atomically commits both, so the stored grid and state always
+        match, whenever the process stops. Nothing is written if nothing was
+        added since the last checkpoint.
+        """
+        if self.path is None:
+            return
+        self._last_checkpoint = time.monotonic()
+        if self._state == self._saved_state:
+            return
+        checkpoint = self._state["checkpoint"] + 1
+        counts_filename = self.path / COUNTS_FILENAME.format(checkpoint)
+        with open(counts_filename, "wb") as counts_file:
+            np.save(counts_file, self._counts)
+            counts_file.flush()
+            os.fsync(counts_file.fileno())
+
+        state = dict(self._state, checkpoint=checkpoint)
+        state_filename = self.path / STATE_FILENAME
+        temp_filename = state_filename.with_suffix(".tmp")
+        with open(temp_filename, "w") as state_file:
+            json.dump(state, state_file)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(temp_filename, state_filename)
+
+        self._state["checkpoint"] = checkpoint
+        self._saved_state = json.loads(json.dumps(self._state))
+        # Drops the modified pages of the previous grid
+        self._counts = np.lib.format.open_memmap(counts_filename, mode="c")
+        (self.path / COUNTS_FILENAME.format(checkpoint - 1)).unlink(missing_ok=True)
+
+    def to_spectrogram(self) -> binning.Spectrogram:
+        """
+        Return the accumulated counts as a spectrogram, a copy of the grid.
+        """
+        return binning.Spectrogram(
+            self.time_edges, self.energy_edges, np.array(self.counts)
+        )
+
+    def to_product(self, version: str = "0.0.0") -> DataProduct:
+        """
+        Return the accumulated counts as a ``spec`` product.
+
+        The product is timed at the earliest file added. It has no clock epoch,
+        the times of the spectrogram are UTC unix seconds.
+
+        Parameters
+        ----------
+        version: str, optional
+            The file version of the product.
+
+        Returns
+        -------
+        product: `~padre_sharp.calibration.DataProduct`
+        """
+        if self._state["time"] is None:
+            raise ValueError("No file was added to the accumulator.")
+        return DataProduct(
+            instrument=self._state["instrument"],
+            time=Time(self._state["time"]),
+            level="ql",
+            version=version,
+            descriptor="spec",
+            data={
+                "energy_bins": binning.energy_bins_table(
+                    self.energy_edges, self.value_name
+                ),
+                f"spectrogram_{self.cadence:g}s": self.to_spectrogram().to_table(),
+            },
+        )
+
+    def _add_file(self, data_filename: Path) -> int:
+        """
+        Add the events of a file, see `add_file`, checkpointing once
+        ``checkpoint_interval`` seconds have passed.
+        """
+        data_filename = Path(data_filename)
+        file_metadata = util.parse_science_filename(data_filename.name)
+        if file_metadata["level"] != "l1" or "eventlist" not in (
+            file_metadata["descriptor"] or ""
+        ):
+            raise ValueError(f"{data_filename} is not an l1 event list file.")
+
+        key = str(data_filename.resolve())
+        stat = data_filename.stat()
+        progress = self._state["files"].get(key)
+        if progress is not None and progress["mtime_ns"] != stat.st_mtime_ns:
+            raise ValueError(
+                f"{data_filename} changed since it was added to the accumulator."
+            )
+        if progress is not None and progress["complete"]:
+            log.debug(f"Skipping {data_filename}, already accumulated.")
+            return 0
+
+        num_added = 0
+        with fits.open(data_filename, memmap=True) as hdul:
+            epoch = hdul[0].header.get("CLKEPOCH", "")
+            if not epoch:
+                raise ValueError(f"{data_filename} has no clock epoch.")
+            if progress is None:
+                progress = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "num_rows": 0,
+                    "complete": False,
+                }
+                self._state["files"][key] = progress
+            self._update_metadata(file_metadata)
+            events = hdul["EVENTS"].data
+            num_rows = 0 if events is None else len(events)
+            for start in range(progress["num_rows"], num_rows, self.read_size):
+                chunk = events[start : start + self.read_size]
+                self.add_events(chunk, epoch)
+                # The count grid and the progress change together
+                progress["num_rows"] = start + len(chunk)
+                num_added += len(chunk)
+                if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                    self.checkpoint()
+        progress["complete"] = True
+        log.info(f"Accumulated {num_added} events of {data_filename}.")
+        return num_added
+
+    def _update_metadata(self, file_metadata: dict) -> None:
+        """
+        Keep the instrument and the earliest time of the files added.
+        """
+        file_time = Time(file_metadata["time"])
+        if self._state["time"] is None or file_time < Time(self._state["time"]):
+            self._state["time"] = file_time.isot
+        self._state["instrument"] = file_metadata["instrument"]
+
+    def _resume(self, shape) -> None:
+        """
+        Reopen a stored accumulator, checking it matches the parameters.
+        """
+        with open(self.path / STATE_FILENAME) as state_file:
+            state = json.load(state_file)
+        for name in ["time_edges", "energy_edges", "value_name"]:
+            if state[name] != self._state[name]:
+                raise ValueError(
+                    f"The accumulator in {self.path} has different {name}."
+                )
+        # Changes are kept in memory until the next checkpoint
+        counts = np.lib.format.open_memmap(
+            self.path / COUNTS_FILENAME.format(state["checkpoint"]), mode="c"
+        )
+        if counts.shape != shape or counts.dtype != np.int64:
+            raise ValueError(f"The count grid in {self.path} does not fit the edges.")
+        # Every event is counted once in the grid, so its total tells whether
+        # the stored grid was modified
+        if int(counts.sum()) != state["num_events"]:
+            raise ValueError(
+                f"The count grid in {self.path} does not match its state, "
+                "the accumulation must be started again."
+            )
+        self._counts = counts
+        self._state = state
+        self._saved_state = json.loads(json.dumps(state))
+        num_complete = sum(progress["complete"] for progress in state["files"].values())
+        log.info(
+            f"Resuming the accumulator in {self.path}, "
+            f"{num_complete} files already added."
+        )
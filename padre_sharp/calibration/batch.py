@@ -0,0 +1,318 @@
+"""
+A module to run the processing pipeline over many files in parallel.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+from padre_sharp import log
+from padre_sharp.calibration.calibration import PIPELINE_LEVELS, process_file
+from padre_sharp.io import dedup, file_tools
+from padre_sharp.util.lazy import LazyModule
+
+# swxsoc is slow to import, it is imported on first use
+util = LazyModule("swxsoc.util.util")
+
+__all__ = ["BatchResult", "process_files"]
+
+
+@dataclass
+class BatchResult:
+    """
+    The outcome of `process_files`.
+
+    Attributes
+    ----------
+    outputs: `dict`
+        Maps each successfully processed input file to its output files, in input
+        order.
+    errors: `dict`
+        Maps each input file that failed to its error message, in input order.
+    merged: `dict`
+        Maps each raw input file merged with others by ``deduplicate`` to the
+        merged file processed in its place, which is the key of its outputs.
+    elapsed: `float`
+        Wall clock time of the batch in seconds.
+    num_bytes: `int`
+        Total size of the input files in bytes.
+    """
+
+    outputs: dict = field(default_factory=dict)
+    errors: dict = field(default_factory=dict)
+    merged: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+    num_bytes: int = 0
+
+    @property
+    def num_files(self) -> int:
+        return len(self.outputs) + len(self.errors)
+
+    @property
+    def files_per_second(self) -> float:
+        return self.num_files / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.num_bytes / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"Processed {self.num_files} files ({len(self.errors)} failed) in "
+            f"{self.elapsed:.2f} s: {self.files_per_second:.1f} files/s, "
+            f"{self.bytes_per_second / 1e6:.1f} MB/s"
+        )
+
+
+def process_files(
+    data_filenames: Union[str, Path, Iterable],
+    max_workers: int = None,
+    deduplicate: bool = False,
+    **kwargs,
+) -> BatchResult:
+    """
+    Run `~padre_sharp.calibration.process_file` on many files in parallel.
+
+    A failure on one file is recorded in the result and does not abort the
+    batch. The result does not depend on the number of workers.
+
+    The output filename of a file is derived from its instrument, time and
+    level, so two inputs with the same time would write the same output. Only
+    the first of such inputs is processed, the others are recorded as errors.
+
+    Parameters
+    ----------
+    data_filenames: `str | Path | list`
+        A list of files, a directory (all the files it contains) or a glob
+        pattern such as ``"raw/**/*.DAT"``.
+    max_workers: `int`, optional
+        Number of worker processes. Defaults to the number of CPUs. With 1 the
+        files are processed in the calling process.
+    deduplicate: `bool`, optional
+        If True, the raw files that overlap in time are first merged into one
+        raw file per group without duplicate packets, which is processed in
+        their place, see `~padre_sharp.io.dedup.group_raw_files` and
+        `~padre_sharp.io.dedup.merge_raw_files`.
+    **kwargs
+        Passed on to `~padre_sharp.calibration.process_file`, e.g. ``to_level``.
+
+    Returns
+    -------
+    `BatchResult`
+    """
+    data_filenames = _expand_filenames(data_filenames)
+    merged = {}
+    if deduplicate:
+        data_filenames, merged = _merge_raw_files(data_filenames)
+    inputs = data_filenames
+    data_filenames, collisions = _drop_output_collisions(
+        data_filenames, kwargs.get("to_level")
+    )
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    log.info(f"Processing {len(data_filenames)} files with {max_workers} workers.")
+
+    process_one = partial(_process_one, **kwargs)
+    result = BatchResult(merged=merged)
+    start = time.perf_counter()
+    if max_workers == 1 or len(data_filenames) <= 1:
+        results = map(process_one, data_filenames)
+        _collect(result, data_filenames, results)
+    else:
+        chunksize = max(1, len(data_filenames) // (4 * max_workers))
+        # With asynchronous logging, the workers log through this process
+        with log.worker_logging() as (initializer, initargs):
+            with ProcessPoolExecutor(
+                max_workers=max_workers, initializer=initializer, initargs=initargs
+            ) as executor:
+                results = executor.map(process_one, data_filenames, chunksize=chunksize)
+                _collect(result, data_filenames, results)
+    for data_filename, error in collisions.items():
+        log.error(f"Could not process {data_filename}: {error}")
+    errors = {**result.errors, **collisions}
+    result.errors = {path: errors[path] for path in inputs if path in errors}
+    result.elapsed = time.perf_counter() - start
+    result.num_bytes = sum(
+        path.stat().st_size for path in data_filenames if path.is_file()
+    )
+
+    log.info(result.summary())
+    return result
+
+
+def _expand_filenames(data_filenames) -> List[Path]:
+    """
+    Turn a directory, glob pattern or list of files into a list of paths.
+    """
+    if isinstance(data_filenames, (str, Path)):
+        pattern = str(data_filenames)
+        if Path(pattern).is_dir():
+            return sorted(path for path in Path(pattern).iterdir() if path.is_file())
+        if glob.has_magic(pattern):
+            return [Path(path) for path in sorted(glob.glob(pattern, recursive=True))]
+        data_filenames = [data_filenames]
+    return [Path(path) for path in data_filenames]
+
+
+def _merge_raw_files(data_filenames: List[Path]) -> Tuple[List[Path], Dict]:
+    """
+    Replace each group of raw files that overlap in time by one merged raw file,
+    in the place of the first of the group.
+
+    Returns the new list of files and the merged file of each merged input.
+    """
+    raw_filenames = [
+        path
+        for path in data_filenames
+        if path.suffix.lower() in file_tools.RAW_SUFFIXES
+    ]
+    merged = {}
+    for group in dedup.group_raw_files(raw_filenames):
+        if len(group) > 1:
+            merged_filename = dedup.merge_raw_files(group)
+            merged.update((path, merged_filename) for path in group)
+    filenames = []
+    for path in data_filenames:
+        if path not in merged:
+            filenames.append(path)
+        elif merged[path] not in filenames:
+            filenames.append(merged[path])
+    return filenames, merged
+
+
+def _output_key(data_filename: Path, to_level: str = None):
+    """
+    Return what the output filenames of a file are derived from, None if the
+    filename cannot be parsed (the file then fails on its own).
+    """
+    try:
+        file_metadata = util.parse_science_filename(data_filename)
+    except Exception:
+        return None
+    level = file_metadata["level"]
+    if to_level is None and level in PIPELINE_LEVELS[:-1]:
+        to_level = PIPELINE_LEVELS[PIPELINE_LEVELS.index(level) + 1]
+    return (
+        file_metadata["instrument"],
+        file_metadata["time"].isot,
+        to_level,
+        file_metadata["mode"] or "",
+    )
+
+
+def _drop_output_collisions(
+    data_filenames: List[Path], to_level: str = None
+) -> Tuple[List[Path], Dict]:
+    """
+    Keep the first of the files that would be processed to the same output.
+
+    Returns the files to process and the error message of each dropped file. A
+    file listed several times is processed once, without an error.
+    """
+    inputs = {}
+    for data_filename in data_filenames:
+        key = _output_key(data_filename, to_level)
+        if key is None:
+            key = data_filename
+        paths = inputs.setdefault(key, [])
+        if data_filename not in paths:
+            paths.append(data_filename)
+    collisions = {}
+    for first, *others in inputs.values():
+        for data_filename in others:
+            collisions[data_filename] = (
+                f"Would be processed to the same output file as {first}, which is "
+                "processed instead. Remove the duplicates or merge raw files with "
+                "deduplicate=True."
+            )
+    return [paths[0] for paths in inputs.values()], collisions
+
+
+def _process_one(data_filename: Path, **kwargs):
+    """
+    Process a file in a worker, returning its outputs or an error message.
+    """
+    try:
+        return process_file(data_filename, **kwargs), None
+    except Exception as e:
+        # Exceptions are not all picklable, send back the message only
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _collect(result: BatchResult, data_filenames: List[Path], results):
+    for data_filename, (outputs, error) in zip(data_filenames, results):
+        if error is None:
+            result.outputs[data_filename] = outputs
+        else:
+            log.error(f"Could not process {data_filename}: {error}")
+            result.errors[data_filename] = error
+
+
+def main(argv: List[str] = None) -> int:
+    """
+    Command line entry point, see ``sharp-process --help``.
+    """
+    parser = argparse.ArgumentParser(
+        prog="sharp-process",
+        description="Run the PADRE SHARP processing pipeline on many files.",
+    )
+    parser.add_argument(
+        "data_filenames",
+        nargs="+",
+        help="Files, directories or glob patterns of the files to process.",
+    )
+    parser.add_argument(
+        "--to-level",
+        default=None,
+        help="Data level to process up to (default: the next level).",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Process the files even if they are unchanged since the last run.",
+    )
+    parser.add_argument(
+        "--deduplicate",
+        action="store_true",
+        help="Merge the raw files that overlap in time, without duplicate packets.",
+    )
+    parser.add_argument(
+        "-j",
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs).",
+    )
+    args = parser.parse_args(argv)
+
+    data_filenames = []
+    for data_filename in args.data_filenames:
+        data_filenames.extend(_expand_filenames(data_filename))
+    result = process_files(
+        data_filenames,
+        max_workers=args.max_workers,
+        deduplicate=args.deduplicate,
+        to_level=args.to_level,
+        force=args.force,
+    )
+
+    for data_filename, merged_filename in result.merged.items():
+        print(f"{data_filename} merged into {merged_filename}")
+    for data_filename, outputs in result.outputs.items():
+        for output in outputs:
+            print(f"{data_filename} -> {output}")
+    for data_filename, error in result.errors.items():
+        print(f"{data_filename} FAILED {error}", file=sys.stderr)
+    print(result.summary())
+    return 1 if result.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+"""
+A module to bin event lists into count spectra and spectrograms.
+
+Events are turned into integer bin indices, with an underflow and an overflow
+bin for the events outside of the edges, and counted with `np.bincount`.
+Several time and energy resolutions are derived in one pass over the events by
+binning at the finest resolution and summing neighbouring bins.
+"""
+
+from dataclasses import dataclass
+from math import lcm
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from padre_sharp.io import decode
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DEFAULT_CADENCES",
+    "DEFAULT_ENERGY_EDGES",
+    "DEFAULT_ADC_EDGES",
+    "Spectrogram",
+    "bin_indices",
+    "spectrum",
+    "spectrogram",
+    "add_counts",
+    "energy_bins_table",
+    "rebin",
+    "spectrograms",
+    "spectral_tables",
+]
+
+#: Default number of events binned at a time, small enough for the temporary
+#: arrays of a chunk to stay in the CPU cache
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+#: Number of chunks whose bin indices are counted together in a spectrogram
+BLOCK_NUM_CHUNKS = 64
+
+#: Default spectrogram time resolutions, in seconds
+DEFAULT_CADENCES = (1.0, 10.0, 60.0)
+
+#: Default energy bin edges, in keV
+DEFAULT_ENERGY_EDGES = np.arange(0.0, 100.5, 0.5)
+
+#: Default bin edges of uncalibrated events, in ADC channels
+DEFAULT_ADC_EDGES = np.arange(0, 2**decode.ADC_NUM_BITS + 1, 16)
+
+
+@dataclass
+class Spectrogram:
+    """
+    Counts binned in time and energy.
+
+    Attributes
+    ----------
+    time_edges: `np.ndarray`
+        The time bin edges, ``num_times + 1`` values.
+    energy_edges: `np.ndarray`
+        The energy bin edges, ``num_energies + 1`` values.
+    counts: `np.ndarray`
+        The counts, of shape ``(num_times, num_energies)``.
+    """
+
+    time_edges: np.ndarray
+    energy_edges: np.ndarray
+    counts: np.ndarray
+
+    @property
+    def cadence(self) -> float:
+        return float(self.time_edges[1] - self.time_edges[0])
+
+    def to_table(self) -> np.ndarray:
+        """
+        Return the spectrogram as a table with one row per time bin.
+        """
+        table = np.empty(
+            len(self.counts),
+            dtype=[
+                ("time", np.float64),
+                ("counts", np.int64, (self.counts.shape[1],)),
+            ],
+        )
+        table["time"] = self.time_edges[:-1]
+        table["counts"] = self.counts
+        return table
+
+
+def bin_indices(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Find the bin of each value, bins include their lower edge only.
+
+    Parameters
+    ----------
+    values: `np.ndarray`
+        The values to bin.
+    edges: `np.ndarray`
+        The increasing bin edges, ``num_bins + 1`` values.
+
+    Returns
+    -------
+    indices: `np.ndarray`
+        The ``int64`` bin index of each value, ``num_bins`` for the values
+        outside of the edges or NaN.
+    """
+    indices = _shifted_bin_indices(np.asarray(values), edges) - 1
+    indices[indices < 0] = len(edges) - 1
+    return indices
+
+
+def spectrum(
+    values: np.ndarray, edges: np.ndarray, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> np.ndarray:
+    """
+    Count the events in each energy bin.
+
+    Parameters
+    ----------
+    values: `np.ndarray`
+        The energy (or ADC value) of each event.
+    edges: `np.ndarray`
+        The energy bin edges.
+    chunk_size: int, optional
+        The number of events binned at a time.
+
+    Returns
+    -------
+    counts: `np.ndarray`
+        The ``int64`` counts of each bin.
+    """
+    num_bins = len(edges) - 1
+    # With an underflow and an overflow bin
+    counts = np.zeros(num_bins + 2, dtype=np.int64)
+    buffer = np.empty(min(chunk_size, len(values)))
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start : start + chunk_size]
+        indices = _shifted_bin_indices(chunk, edges, buffer[: len(chunk)])
+        counts += np.bincount(indices, minlength=num_bins + 2)
+    return counts[1:-1]
+
+
+def spectrogram(
+    times: np.ndarray,
+    values: np.ndarray,
+    time_edges: np.ndarray,
+    energy_edges: np.ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Spectrogram:
+    """
+    Count the events in each time and energy bin.
+
+    Parameters
+    ----------
+    times: `np.ndarray`
+        The time of each event.
+    values: `np.ndarray`
+        The energy (or ADC value) of each event.
+    time_edges: `np.ndarray`
+        The time bin edges.
+    energy_edges: `np.ndarray`
+        The energy bin edges.
+    chunk_size: int, optional
+        The number of events binned at a time.
+
+    Returns
+    -------
+    `Spectrogram`
+    """
+    num_times, num_energies = len(time_edges) - 1, len(energy_edges) - 1
+    # With underflow and overflow bins on both axes
+    counts = np.zeros((num_times + 2, num_energies + 2), dtype=np.int64)
+    add_counts(counts, times, values, time_edges, energy_edges, chunk_size)
+    return Spectrogram(
+        np.asarray(time_edges), np.asarray(energy_edges), counts[1:-1, 1:-1]
+    )
+
+
+def add_counts(
+    counts: np.ndarray,
+    times: np.ndarray,
+    values: np.ndarray,
+    time_edges: np.ndarray,
+    energy_edges: np.ndarray,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    Add the counts of events to a time and energy count grid, in place.
+
+    Parameters
+    ----------
+    counts: `np.ndarray`
+        The contiguous count grid of shape ``(num_times + 2, num_energies + 2)``,
+        the first and last row and column count the events below and above the
+        edges. May be a `np.memmap`.
+    times: `np.ndarray`
+        The time of each event.
+    values: `np.ndarray`
+        The energy (or ADC value) of each event.
+    time_edges: `np.ndarray`
+        The time bin edges.
+    energy_edges: `np.ndarray`
+        The energy bin edges.
+    chunk_size: int, optional
+        The number of events binned at a time.
+
+    Returns
+    -------
+    counts: `np.ndarray`
+        The same count grid.
+    """
+    num_energies = len(energy_edges) - 1
+    if counts.shape != (len(time_edges) + 1, num_energies + 2):
+        raise ValueError(f"The count grid shape {counts.shape} does not fit the edges.")
+    # Row major flat indices over the grid
+    flat_counts = counts.reshape(-1)
+    # The grid can be much larger than a chunk, so the indices of many chunks
+    # are counted at once over the range of bins they fall in
+    block_size = chunk_size * BLOCK_NUM_CHUNKS
+    buffer = np.empty(min(chunk_size, len(times)))
+    indices = np.empty(min(block_size, len(times)), dtype=np.int64)
+    for block_start in range(0, len(times), block_size):
+        block_stop = min(block_start + block_size, len(times))
+        for start in range(block_start, block_stop, chunk_size):
+            stop = min(start + chunk_size, block_stop)
+            chunk_indices = indices[start - block_start : stop - block_start]
+            chunk_buffer = buffer[: stop - start]
+            chunk_indices[:] = _shifted_bin_indices(
+                times[start:stop], time_edges, chunk_buffer
+            )
+            chunk_indices *= num_energies + 2
+            chunk_indices += _shifted_bin_indices(
+                values[start:stop], energy_edges, chunk_buffer
+            )
+        block_indices = indices[: block_stop - block_start]
+        low = block_indices.min()
+        block_counts = np.bincount(block_indices - low)
+        flat_counts[low : low + len(block_counts)] += block_counts
+    return counts
+
+
+def energy_bins_table(edges: np.ndarray, name: str = "energy") -> np.ndarray:
+    """
+    Return a table of the lower and upper edge of each energy bin.
+
+    Parameters
+    ----------
+    edges: `np.ndarray`
+        The energy bin edges.
+    name: str, optional
+        The binned quantity, the columns are ``<name>_min`` and ``<name>_max``.
+
+    Returns
+    -------
+    energy_bins: `np.ndarray`
+    """
+    energy_bins = np.empty(
+        len(edges) - 1,
+        dtype=[(f"{name}_min", np.float64), (f"{name}_max", np.float64)],
+    )
+    energy_bins[f"{name}_min"] = edges[:-1]
+    energy_bins[f"{name}_max"] = edges[1:]
+    return energy_bins
+
+
+def rebin(
+    counts: np.ndarray, edges: np.ndarray, new_edges: np.ndarray, axis: int = -1
+) -> np.ndarray:
+    """
+    Sum counts into coarser bins whose edges are a subset of the original edges.
+
+    Parameters
+    ----------
+    counts: `np.ndarray`
+        The counts.
+    edges: `np.ndarray`
+        The bin edges along ``axis``.
+    new_edges: `np.ndarray`
+        The coarser bin edges, each one also in ``edges``.
+    axis: int, optional
+        The axis to rebin.
+
+    Returns
+    -------
+    counts: `np.ndarray`
+        The counts in the coarser bins.
+    """
+    edges = np.asarray(edges)
+    positions = np.searchsorted(edges, new_edges)
+    found = (positions < len(edges)) & np.isclose(
+        edges[np.minimum(positions, len(edges) - 1)], new_edges
+    )
+    if not np.all(found):
+        raise ValueError("The new bin edges must be a subset of the bin edges.")
+    return np.add.reduceat(counts, positions[:-1], axis=axis)
+
+
+def spectrograms(
+    times: np.ndarray,
+    values: np.ndarray,
+    cadences: Sequence[float] = DEFAULT_CADENCES,
+    energy_edges: List[np.ndarray] = (DEFAULT_ENERGY_EDGES,),
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[Tuple[float, int], Spectrogram]:
+    """
+    Make spectrograms at several time and energy resolutions in one pass.
+
+    The events are binned once at the finest cadence and energy resolution, the
+    other resolutions are sums of these bins. All the time grids start at a
+    multiple of the coarsest cadence so that their bins line up.
+
+    Parameters
+    ----------
+    times: `np.ndarray`
+        The time of each event.
+    values: `np.ndarray`
+        The energy (or ADC value) of each event.
+    cadences: list, optional
+        The time resolutions, each an integer multiple of the finest one.
+    energy_edges: list, optional
+        The energy bin edges of each energy resolution. The first one is the
+        finest, the others a subset of its edges.
+    chunk_size: int, optional
+        The number of events binned at a time.
+
+    Returns
+    -------
+    `dict`
+        The `Spectrogram` of each cadence and index in ``energy_edges``.
+    """
+    finest = min(cadences)
+    factors = [round(cadence / finest) for cadence in cadences]
+    if not np.allclose(np.multiply(factors, finest), cadences):
+        raise ValueError(
+            f"The cadences {cadences} must be multiples of the finest cadence."
+        )
+    if len(times) == 0:
+        start, num_times = 0.0, 0
+    else:
+        # Cover the events with a whole number of bins of every cadence
+        period = finest * lcm(*factors)
+        start = np.floor(np.min(times) / period) * period
+        num_periods = np.floor((np.max(times) - start) / period) + 1
+        num_times = int(num_periods) * lcm(*factors)
+    time_edges = start + finest * np.arange(num_times + 1)
+
+    finest_spectrogram = spectrogram(
+        times, values, time_edges, energy_edges[0], chunk_size=chunk_size
+    )
+    result = {}
+    for cadence, factor in zip(cadences, factors):
+        counts = finest_spectrogram.counts
+        counts = counts.reshape(-1, factor, counts.shape[1]).sum(axis=1)
+        for i, edges in enumerate(energy_edges):
+            result[(cadence, i)] = Spectrogram(
+                time_edges[::factor],
+                np.asarray(edges),
+                rebin(counts, energy_edges[0], edges, axis=1) if i else counts,
+            )
+    return result
+
+
+def spectral_tables(
+    events: np.ndarray,
+    cadences: Sequence[float] = DEFAULT_CADENCES,
+    energy_edges: np.ndarray = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[str, np.ndarray]:
+    """
+    Bin an event table into the tables of a ``spec`` product.
+
+    Calibrated events are binned by energy, uncalibrated ones by ADC value.
+
+    Parameters
+    ----------
+    events: `np.ndarray`
+        An event table, see `~padre_sharp.io.decode.EVENT_DTYPE`.
+    cadences: list, optional
+        The time resolutions of the spectrograms, in seconds.
+    energy_edges: `np.ndarray`, optional
+        The energy (or ADC) bin edges. Defaults to `DEFAULT_ENERGY_EDGES`, or
+        `DEFAULT_ADC_EDGES` for uncalibrated events.
+    chunk_size: int, optional
+        The number of events binned at a time.
+
+    Returns
+    -------
+    `dict`
+        ``"energy_bins"``, the bin edges, ``"spectrum"``, the counts of the whole
+        event list, and a ``"spectrogram_<cadence>s"`` table per cadence.
+    """
+    calibrated = bool(np.isfinite(events["energy"]).any())
+    name = "energy" if calibrated else "adc"
+    if energy_edges is None:
+        energy_edges = DEFAULT_ENERGY_EDGES if calibrated else DEFAULT_ADC_EDGES
+    values = events[name]
+
+    all_spectrograms = spectrograms(
+        decode.event_times(events),
+        values,
+        cadences=cadences,
+        energy_edges=[energy_edges],
+        chunk_size=chunk_size,
+    )
+    counts = next(iter(all_spectrograms.values())).counts.sum(axis=0)
+
+    energy_bins = energy_bins_table(energy_edges, name)
+    spectrum_table = np.empty(len(counts), dtype=[("counts", np.int64)])
+    spectrum_table["counts"] = counts
+
+    tables = {"energy_bins": energy_bins, "spectrum": spectrum_table}
+    for (cadence, _), cadence_spectrogram in all_spectrograms.items():
+        tables[f"spectrogram_{cadence:g}s"] = cadence_spectrogram.to_table()
+    return tables
+
+
+def _shifted_bin_indices(values, edges, buffer=None):
+    """
+    Bin index plus one of each value, 0 below the edges and ``num_bins + 1`` above.
+
+    Values that are NaN go to one of the two out of range bins.
+    """
+    edges = np.asarray(edges, dtype=np.float64)
+    num_bins = len(edges) - 1
+    widths = np.diff(edges)
+    if not np.allclose(widths, widths[0]):
+        return np.searchsorted(edges, values, side="right")
+
+    # Uniform bins, arithmetic is much faster than a binary search. The steps
+    # are done in place in a buffer small enough to stay in the CPU cache.
+    if buffer is None:
+        buffer = np.empty(len(values))
+    np.subtract(values, edges[0] - widths[0], out=buffer, dtype=np.float64)
+    buffer *= 1 / widths[0]
+    np.floor(buffer, out=buffer)
+    # fmax and fmin also replace NaN
+    np.fmax(buffer, 0, out=buffer)
+    np.fmin(buffer, num_bins + 1, out=buffer)
+    return buffer.astype(np.int64)
@@ -2,55 +2,257 @@
 A module for all things calibration.
 """
 
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-import random
-import tempfile
-
 
+import numpy as np
+from astropy.io import fits
+from astropy.table import Table
 from astropy.time import Time
 
-from swxsoc.util import util
 from padre_sharp import log
-from padre_sharp.util import validation
+from padre_sharp.calibration import binning, despiking, energy, manifest, registry
+from padre_sharp.io import decode, decode_cache, staging
+from padre_sharp.util import packets, time_conversion, validation
+from padre_sharp.util.lazy import LazyModule
+
+# swxsoc is slow to import, it is imported on first use
+util = LazyModule("swxsoc.util.util")
 
 __all__ = [
+    "PIPELINE_LEVELS",
+    "DataProduct",
     "process_file",
     "calibrate_file",
+    "calibrate_product",
+    "bin_product",
     "get_calibration_file",
     "read_calibration_file",
 ]
 
+#: The data levels produced by the pipeline, in processing order
+PIPELINE_LEVELS = ["raw", "l0", "l1", "ql"]
+
 
-def process_file(data_filename: Path) -> list:
+@dataclass
+class DataProduct:
+    """
+    A data product held in memory while it moves through the pipeline levels.
+
+    Attributes
+    ----------
+    instrument: str
+        The instrument name.
+    time: ~astropy.time.Time
+        The time of the data, used in the filename.
+    level: str
+        The data level, one of `PIPELINE_LEVELS`.
+    version: str
+        The file version, given as X.Y.Z.
+    descriptor: str
+        An optional file descriptor.
+    mode: str
+        An optional instrument mode.
+    data: dict
+        The data tables of the product, structured arrays by name.
+    source: Path
+        The file the pipeline started from.
+    epoch: str
+        The UTC epoch of the instrument clock the event times count from, see
+        `~padre_sharp.util.time_conversion.clock_epoch`. Empty until the raw
+        file is decoded.
+    """
+
+    instrument: str
+    time: Time
+    level: str
+    version: str = "0.0.0"
+    descriptor: str = ""
+    mode: str = ""
+    data: dict = field(default_factory=dict)
+    source: Path = None
+    epoch: str = ""
+
+    @classmethod
+    def from_file(cls, data_filename: Path) -> "DataProduct":
+        """
+        Read a product from a raw or pipeline file.
+
+        The tables of a FITS file written by `write` are loaded into ``data``,
+        raw files are only decoded by `calibrate_product`.
+
+        Parameters
+        ----------
+        data_filename: str
+            Fully specificied filename of an input file
+
+        Returns
+        -------
+        product: DataProduct
+        """
+        file_metadata = util.parse_science_filename(data_filename)
+        log.debug(f"File metadata: {file_metadata}")
+        data = {}
+        epoch = ""
+        data_filename = Path(data_filename)
+        if data_filename.suffix == ".fits" and data_filename.stat().st_size > 0:
+            with fits.open(data_filename) as hdul:
+                epoch = hdul[0].header.get("CLKEPOCH", "")
+                for hdu in hdul[1:]:
+                    data[hdu.name.lower()] = Table.read(
+                        hdu, mask_invalid=False
+                    ).as_array()
+        return cls(
+            instrument=file_metadata["instrument"],
+            time=file_metadata["time"],
+            level=file_metadata["level"],
+            # If the version is not specified, set it to 0.0.0
+            version=file_metadata["version"] or "0.0.0",
+            descriptor=file_metadata["descriptor"] or "",
+            mode=file_metadata["mode"] or "",
+            data=data,
+            source=data_filename,
+            epoch=epoch,
+        )
+
+    @property
+    def filename(self) -> str:
+        """The standard filename of the product."""
+        return util.create_science_filename(
+            instrument=self.instrument,
+            time=self.time,
+            version=self.version,
+            level=self.level,
+            descriptor=self.descriptor,
+            mode=self.mode,
+        )
+
+    def primary_hdu(self) -> fits.PrimaryHDU:
+        """
+        Return the primary HDU of the product file, the product metadata.
+        """
+        primary_hdu = fits.PrimaryHDU()
+        primary_hdu.header["INSTRUME"] = self.instrument.upper()
+        primary_hdu.header["LEVEL"] = self.level
+        primary_hdu.header["VERSION"] = self.version
+        primary_hdu.header["DATE-BEG"] = self.time.isot
+        if self.epoch:
+            primary_hdu.header["CLKEPOCH"] = (self.epoch, "UTC epoch of the clock")
+        return primary_hdu
+
+    def write(self, output_dir: Path) -> Path:
+        """
+        Write the product to a file named after it.
+
+        Each table of ``data`` is written to a FITS binary table extension of
+        the same name. A product without data is written as an empty file.
+
+        Parameters
+        ----------
+        output_dir: Path
+            The directory to write into.
+
+        Returns
+        -------
+        output_filename: Path
+            Fully specificied filename of the written file.
+        """
+        output_filename = Path(output_dir) / self.filename
+        if not self.data:
+            with open(output_filename, "w"):
+                pass
+            return output_filename
+
+        primary_hdu = self.primary_hdu()
+        table_hdus = [
+            fits.BinTableHDU(np.asarray(table), name=name.upper())
+            for name, table in self.data.items()
+        ]
+        fits.HDUList([primary_hdu] + table_hdus).writeto(
+            output_filename, overwrite=True
+        )
+        return output_filename
+
+
+def process_file(
+    data_filename: Path,
+    to_level: str = None,
+    write_intermediate: bool = False,
+    force: bool = False,
+) -> list:
     """
     This is the entry point for the pipeline processing.
     It runs all of the various processing steps required.
 
+    When ``to_level`` is more than one level above the input, the data is carried
+    in memory from level to level and only the final level is written, unless
+    ``write_intermediate`` is set.
+
+    Processed files are recorded in the processing manifest, see
+    `~padre_sharp.calibration.manifest.ProcessingManifest`. A file whose
+    contents, calibration file and outputs are unchanged since it was processed
+    by the same version is not processed again, its recorded outputs are
+    returned instead.
+
     Parameters
     ----------
     data_filename: str
         Fully specificied filename of an input file
+    to_level: str, optional
+        The data level to process up to, one of `PIPELINE_LEVELS`. Defaults to
+        the level after the level of the input file.
+    write_intermediate: bool, optional
+        If True, also write the levels between the input and ``to_level``.
+    force: bool, optional
+        If True, process the file even if it is unchanged since it was last
+        processed.
 
     Returns
     -------
     output_filenames: list
         Fully specificied filenames for the output files.
     """
+    data_filename = Path(data_filename)
+    processing_manifest = manifest.ProcessingManifest()
+    request = f"{to_level or 'next'}{'+intermediate' if write_intermediate else ''}"
+    calibration = _calibration_identity(data_filename, to_level)
+    if not force:
+        output_files = processing_manifest.is_current(
+            data_filename, request, calibration
+        )
+        if output_files is not None:
+            log.info(f"Skipping unchanged file {data_filename}.")
+            return output_files
+
     log.info(f"Processing file {data_filename}.")
     output_files = []
-    data_filename = Path(data_filename)
 
-    if data_filename.suffix in [".bin", ".dat"]:
+    if data_filename.suffix.lower() in [".bin", ".dat"]:
         # Before we process, validate the file with CCSDS
-        custom_validators = [validation.validate_packet_checksums]
+        # The packet index is cached so repeated runs on a file do not rescan it
+        packet_view = packets.open_packets(data_filename)
         validation_findings = validation.validate(
-            data_filename, custom_validators=custom_validators
+            packet_view, custom_validators=validation.DEFAULT_CUSTOM_VALIDATORS
         )
-        for finding in validation_findings:
+        for finding in validation_findings.summary():
             log.warning(f"Validation Finding for File : {data_filename} : {finding}")
 
-    calibrated_file = calibrate_file(data_filename)
-    output_files.append(calibrated_file)
+    product = DataProduct.from_file(data_filename)
+    if to_level is not None and (
+        to_level not in PIPELINE_LEVELS
+        or PIPELINE_LEVELS.index(to_level) <= PIPELINE_LEVELS.index(product.level)
+    ):
+        raise ValueError(f"Cannot process {data_filename} to level {to_level}.")
+
+    with staging.ScratchDirectory() as scratch:
+        while True:
+            product = calibrate_product(product)
+            if to_level is None or product.level == to_level:
+                output_files.append(scratch.publish(product.write(scratch.path)))
+                break
+            if write_intermediate:
+                output_files.append(scratch.publish(product.write(scratch.path)))
+    processing_manifest.record(data_filename, output_files, request, calibration)
     #  data_plot_files = plot_file(data_filename)
     #  calib_plot_files = plot_file(calibrated_file)
 
@@ -58,130 +260,201 @@ def process_file(data_filename: Path) -> list:
     return output_files
 
 
-def calibrate_file(data_filename: Path, output_level=2) -> Path:
+def _calibration_identity(data_filename: Path, to_level: str = None) -> str:
     """
-    Given an input file, calibrate it and return a new file.
+    Identify the calibration file used to process a file up to a level, an
+    empty string if the processing does not calibrate energies.
+    """
+    file_metadata = util.parse_science_filename(data_filename)
+    level = file_metadata["level"]
+    if level not in PIPELINE_LEVELS[:-1] or to_level not in PIPELINE_LEVELS + [None]:
+        return ""
+    to_level = to_level or PIPELINE_LEVELS[PIPELINE_LEVELS.index(level) + 1]
+    calibrated_level = PIPELINE_LEVELS.index("l1")
+    if not (
+        PIPELINE_LEVELS.index(level)
+        < calibrated_level
+        <= PIPELINE_LEVELS.index(to_level)
+    ):
+        return ""
+    entry = registry.get_calibration_registry().lookup(file_metadata["time"])
+    return manifest.calibration_identity(entry and entry.path)
+
+
+def calibrate_file(data_filename: Path) -> Path:
+    """
+    Given an input file, calibrate it to the next level and return a new file.
+
+    Use `process_file` to process a file to a given level.
 
     Parameters
     ----------
     data_filename: str
-        Fully specificied filename of the non-calibrated file (data level < 2)
-    output_level: int
-        The requested data level of the output file.
+        Fully specificied filename of the non-calibrated file
 
     Returns
     -------
     output_filename: str
-        Fully specificied filename of the non-calibrated file (data level < 2)
+        Fully specificied filename of the calibrated file
 
     Examples
     --------
     """
+    product = calibrate_product(DataProduct.from_file(data_filename))
+    with staging.ScratchDirectory() as scratch:
+        return scratch.publish(product.write(scratch.path))
 
-    log.info(
-        "Despiking removing {num_spikes} spikes".format(
-            num_spikes=random.randint(0, 10)
-        )
-    )
-    log.warning(
-        "Despiking could not remove {num_spikes}".format(
-            num_spikes=random.randint(1, 5)
-        )
-    )
-
-    file_metadata = util.parse_science_filename(data_filename)
 
-    # Temporary directory
-    tmp_dir = Path(tempfile.gettempdir())
-
-    if file_metadata is None:
-        log.error(f"Could not parse filename {data_filename}.")
-        return None
+def calibrate_product(product: DataProduct) -> DataProduct:
+    """
+    Given a product, calibrate it to the next level without writing any file.
+
+    Calibrating a raw product decodes its packets into the ``eventlist`` product,
+    see `~padre_sharp.io.decode.decode_packets`, through the decode cache, see
+    `~padre_sharp.io.decode_cache.DecodeCache`. The epoch of the instrument
+    clock is derived from the time of the file and its first coarse time, see
+    `~padre_sharp.util.time_conversion.clock_epoch`. Calibrating an l0 product sorts
+    the events by time and fills in their energies, see
+    `~padre_sharp.calibration.energy.calibrate_energy`, and adds the despiked
+    count rate, see `~padre_sharp.calibration.despiking.despike_count_rate`.
+    Calibrating an l1 event list bins it into the ``spec`` product, see
+    `bin_product`.
 
-    print(f"File metadata: {file_metadata}")
+    Parameters
+    ----------
+    product: DataProduct
+        The product to calibrate.
 
-    if file_metadata["level"] == "raw":
-        if not file_metadata["version"]:
-            # If the version is not specified, set it to 0.0.0
-            file_metadata["version"] = "0"
-        new_filename = tmp_dir / util.create_science_filename(
-            instrument=file_metadata["instrument"],
-            time=file_metadata["time"],
-            version="0.0.0",
-            level="l0",
+    Returns
+    -------
+    product: DataProduct
+        A new product at the next level of `PIPELINE_LEVELS`.
+    """
+    if product.level not in PIPELINE_LEVELS[:-1]:
+        log.error(f"Could not calibrate file {product.source}.")
+        raise ValueError(f"Cannot find calibration for file {product.source}.")
+
+    if product.level == "raw":
+        # Reprocessing a raw file loads its decoded tables from the cache
+        data = decode_cache.DecodeCache().decode_file(product.source)
+        log.info(
+            f"Decoded {len(data['events'])} events from "
+            f"{len(data['packets'])} packets of {product.source}."
         )
-        with open(new_filename, "w"):
-            pass
-
-    elif file_metadata["level"] == "l0":
-        if not file_metadata["version"]:
-            # If the version is not specified, set it to 0.0.0
-            file_metadata["version"] = "0"
-        new_filename = tmp_dir / util.create_science_filename(
-            instrument=file_metadata["instrument"],
-            time=file_metadata["time"],
-            version=file_metadata["version"],
-            level="l1",
+        epoch = product.epoch
+        if len(data["packets"]):
+            epoch = time_conversion.clock_epoch(
+                product.time, data["packets"]["coarse_time"].min()
+            )
+        return replace(
+            product, level="l0", descriptor="eventlist", data=data, epoch=epoch
         )
-        with open(new_filename, "w"):
-            pass
 
-    elif file_metadata["level"] == "l1":
-        new_filename = tmp_dir / util.create_science_filename(
-            instrument=file_metadata["instrument"],
-            time=file_metadata["time"],
-            version=file_metadata["version"],
-            level="ql",
-        )
+    if product.level == "l0" and "events" in product.data:
+        # l1 event lists are time sorted, so that they can be merged by streaming
+        events = decode.sort_events(product.data["events"])
+        product = replace(product, data={**product.data, "events": events})
+        calib_filename = get_calibration_file(product.time)
+        calibration = calib_filename and read_calibration_file(calib_filename)
+        if calibration is None:
+            log.warning(f"Event energies of {product.source} are not calibrated.")
+        else:
+            # In place, the l0 event table becomes the l1 event table
+            energy.calibrate_energy(product.data["events"], calibration)
+            log.info(f"Calibrated event energies with {calib_filename}.")
+
+        lightcurve, result = despiking.despike_count_rate(product.data["events"])
+        product = replace(product, data={**product.data, "lightcurve": lightcurve})
+        log.info(f"Despiking removing {result.num_corrected} spikes")
+        if result.num_uncorrected:
+            log.warning(f"Despiking could not remove {result.num_uncorrected}")
+
+    if product.level == "l1" and "events" in product.data:
+        return replace(bin_product(product), level="ql")
+
+    next_level = PIPELINE_LEVELS[PIPELINE_LEVELS.index(product.level) + 1]
+    return replace(product, level=next_level)
+
+
+def bin_product(product: DataProduct, keep_events: bool = False, **kwargs):
+    """
+    Bin the event list of a product into a spectrum and spectrograms.
 
-        with open(new_filename, "w"):
-            pass
-    else:
-        log.error(f"Could not calibrate file {data_filename}.")
-        raise ValueError(f"Cannot find calibration for file {data_filename}.")
+    Parameters
+    ----------
+    product: DataProduct
+        A product with an ``events`` table.
+    keep_events: bool, optional
+        If True the event list is kept and the result is a ``spec-eventlist``
+        product, otherwise a ``spec`` product.
+    **kwargs
+        Passed on to `~padre_sharp.calibration.binning.spectral_tables`.
 
-    return new_filename
+    Returns
+    -------
+    product: DataProduct
+        A new product at the same level.
+    """
+    events = product.data["events"]
+    data = dict(product.data)
+    if not keep_events:
+        del data["events"]
+    data.update(binning.spectral_tables(events, **kwargs))
+    log.info(f"Binned {len(events)} events of {product.source}.")
+    descriptor = "spec-eventlist" if keep_events else "spec"
+    return replace(product, descriptor=descriptor, data=data)
 
 
 def get_calibration_file(time: Time) -> Path:
     """
     Given a time, return the appropriate calibration file.
 
+    The calibration directories are indexed once per process, see
+    `~padre_sharp.calibration.registry.CalibrationRegistry`.
+
     Parameters
     ----------
-    data_filename: str
-        Fully specificied filename of the non-calibrated file (data level < 2)
     time: ~astropy.time.Time
 
     Returns
     -------
     calib_filename: str
-        Fully specificied filename for the appropriate calibration file.
+        Fully specificied filename for the appropriate calibration file, or None
+        if no calibration file is valid at ``time``.
 
     Examples
     --------
     """
-    return None
+    entry = registry.get_calibration_registry().lookup(time)
+    if entry is None:
+        log.warning(f"No calibration file found for {Time(time).isot}.")
+        return None
+    return entry.path
 
 
 def read_calibration_file(calib_filename: Path):
     """
     Given a calibration, return the calibration structure.
 
+    Parsed calibration files are cached, the returned table is shared and must
+    not be modified.
+
     Parameters
     ----------
     calib_filename: str
-        Fully specificied filename of the non-calibrated file (data level < 2)
+        Fully specificied filename of the calibration file.
 
     Returns
     -------
-    output_filename: str
-        Fully specificied filename of the appropriate calibration file.
+    calibration: ~astropy.table.Table
+        The calibration table, or None if the file could not be read.
 
     Examples
     --------
     """
-
-    # if can't read the file
-
-    return None
+    try:
+        return registry.get_calibration_registry().read(calib_filename)
+    except Exception as e:
+        # if can't read the file
+        log.warning(f"Could not read calibration file {calib_filename}: {e}")
+        return None
@@ -0,0 +1,285 @@
+"""
+A module to find and remove spikes from count-rate time series and spectra.
+
+Spikes are found with a Hampel filter: a sample is a spike when it is further
+than ``threshold`` robust standard deviations from the median of the window
+centered on it, the robust standard deviation being 1.4826 times the median
+absolute deviation (MAD) of the window. Spikes are replaced by the window median.
+
+The rolling medians are computed with a sorting network over shifted copies of
+the data, so the work is a fixed number of `np.minimum` and `np.maximum` calls
+per chunk rather than a Python loop over samples.
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "LIGHTCURVE_DTYPE",
+    "DespikeResult",
+    "rolling_median",
+    "despike",
+    "despike_count_rate",
+]
+
+#: Default number of samples processed at a time, small enough for the shifted
+#: copies of a chunk to stay in the CPU cache
+DEFAULT_CHUNK_SIZE = 16 * 1024
+
+#: Structured dtype of the count-rate light curve of an event table
+LIGHTCURVE_DTYPE = np.dtype(
+    [
+        ("coarse_time", np.uint64),
+        ("counts", np.int64),
+        ("corrected_counts", np.int64),
+        ("spike", np.bool_),
+    ]
+)
+
+#: Ratio of the standard deviation to the MAD of a normal distribution
+MAD_TO_STD = 1.4826
+
+
+@dataclass
+class DespikeResult:
+    """
+    The outcome of `despike`.
+
+    Attributes
+    ----------
+    data: `np.ndarray`
+        The data with the spikes replaced by the window median.
+    mask: `np.ndarray`
+        True for the samples found to be spikes.
+    num_spikes: int
+        The number of spikes found.
+    num_corrected: int
+        The number of spikes replaced. A spike is left as it is when more than
+        half of its window are spikes too, as the window median is then not a
+        reliable replacement.
+    """
+
+    data: np.ndarray
+    mask: np.ndarray
+    num_spikes: int
+    num_corrected: int
+
+    @property
+    def num_uncorrected(self) -> int:
+        return self.num_spikes - self.num_corrected
+
+
+def rolling_median(
+    data: np.ndarray, window: int, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> np.ndarray:
+    """
+    Compute the median of the window centered on each sample along the first axis.
+
+    The data is extended at both ends by reflection about the first and last
+    samples.
+
+    Parameters
+    ----------
+    data: `np.ndarray`
+        The data, a time series or a stack of spectra with time as first axis.
+    window: int
+        The odd number of samples in a window.
+    chunk_size: int, optional
+        The number of samples processed at a time.
+
+    Returns
+    -------
+    median: `np.ndarray`
+        Array of the same shape as ``data``.
+    """
+    data = np.asarray(data)
+    _check_window(window)
+    half_window = window // 2
+    median = np.empty(data.shape, dtype=np.result_type(data, np.float32))
+    for start, stop in _chunks(len(data), chunk_size):
+        segment = _padded_segment(data, start - half_window, stop + half_window)
+        median[start:stop] = _rolling_median(segment, window)
+    return median
+
+
+def despike(
+    data: np.ndarray,
+    window: int = 9,
+    threshold: float = 5.0,
+    count_data: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> DespikeResult:
+    """
+    Find and replace spikes along the first axis of the data.
+
+    Parameters
+    ----------
+    data: `np.ndarray`
+        A count-rate time series, or a stack of spectra with time as first axis.
+    window: int, optional
+        The odd number of samples in the rolling window.
+    threshold: float, optional
+        The number of robust standard deviations from the median beyond which a
+        sample is a spike.
+    count_data: bool, optional
+        If True the data are counts and the robust standard deviation is at
+        least the Poisson error of the median, ``sqrt(max(median, 1))``. The MAD
+        of a low, quiet count rate is often 0 and would flag any fluctuation.
+    chunk_size: int, optional
+        The number of samples processed at a time, bounding the size of the
+        temporary arrays.
+
+    Returns
+    -------
+    `DespikeResult`
+    """
+    data = np.asarray(data)
+    _check_window(window)
+    half_window = window // 2
+    corrected = data.copy()
+    mask = np.zeros(data.shape, dtype=bool)
+
+    for start, stop in _chunks(len(data), chunk_size):
+        # The MAD of a sample needs the medians of the samples around it
+        segment = _padded_segment(data, start - 2 * half_window, stop + 2 * half_window)
+        segment = segment.astype(np.result_type(segment, np.float32))
+        median = _rolling_median(segment, window)
+        deviation = np.abs(segment[half_window:-half_window] - median)
+        scale = MAD_TO_STD * _rolling_median(deviation, window)
+        median = median[half_window:-half_window]
+        deviation = deviation[half_window:-half_window]
+        if count_data:
+            np.maximum(scale, np.sqrt(np.maximum(median, 1)), out=scale)
+        spikes = deviation > threshold * scale
+        mask[start:stop] = spikes
+        corrected[start:stop][spikes] = median[spikes]
+
+    num_spikes = int(np.count_nonzero(mask))
+    num_corrected = num_spikes
+    if num_spikes:
+        # More than half of the window are spikes, the median is one of them
+        spikes, num_spikes_around = _count_spikes_around(mask, half_window)
+        uncorrected = tuple(index[num_spikes_around > half_window] for index in spikes)
+        corrected[uncorrected] = data[uncorrected]
+        num_corrected -= len(uncorrected[0])
+    return DespikeResult(corrected, mask, num_spikes, num_corrected)
+
+
+def despike_count_rate(events: np.ndarray, **kwargs):
+    """
+    Despike the count rate of an event table.
+
+    The count rate is the number of events per coarse time tick, over the ticks
+    that have events.
+
+    Parameters
+    ----------
+    events: `np.ndarray`
+        An event table, see `~padre_sharp.io.decode.EVENT_DTYPE`.
+    **kwargs
+        Passed on to `despike`.
+
+    Returns
+    -------
+    lightcurve: `np.ndarray`
+        The count rate, with dtype `LIGHTCURVE_DTYPE`.
+    result: `DespikeResult`
+    """
+    coarse_time, counts = np.unique(events["coarse_time"], return_counts=True)
+    result = despike(counts, **kwargs)
+    lightcurve = np.empty(len(counts), dtype=LIGHTCURVE_DTYPE)
+    lightcurve["coarse_time"] = coarse_time
+    lightcurve["counts"] = counts
+    lightcurve["corrected_counts"] = result.data
+    lightcurve["spike"] = result.mask
+    return lightcurve, result
+
+
+def _check_window(window: int):
+    if window < 3 or window % 2 == 0:
+        raise ValueError(f"The window must be an odd number of at least 3, {window}.")
+
+
+def _chunks(length: int, chunk_size: int):
+    return [
+        (start, min(start + chunk_size, length))
+        for start in range(0, length, chunk_size)
+    ]
+
+
+def _padded_segment(data: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """
+    Return ``data[start:stop]``, reflected about the first or last sample.
+    """
+    segment = data[max(start, 0) : min(stop, len(data))]
+    pad_before, pad_after = max(-start, 0), max(stop - len(data), 0)
+    if pad_before or pad_after:
+        pad_width = [(pad_before, pad_after)] + [(0, 0)] * (data.ndim - 1)
+        segment = np.pad(segment, pad_width, mode="reflect")
+    return segment
+
+
+def _rolling_median(segment: np.ndarray, window: int) -> np.ndarray:
+    """
+    Median of each full window of ``segment``, ``window - 1`` fewer samples.
+    """
+    length = len(segment) - window + 1
+    lanes = [segment[i : i + length].copy() for i in range(window)]
+    low = np.empty_like(lanes[0])
+    for i, j in _median_network(window):
+        np.minimum(lanes[i], lanes[j], out=low)
+        np.maximum(lanes[i], lanes[j], out=lanes[j])
+        lanes[i], low = low, lanes[i]
+    return lanes[window // 2]
+
+
+def _count_spikes_around(mask: np.ndarray, half_window: int):
+    """
+    Count the spikes in the window centered on each spike.
+
+    Returns the indices of the spikes, as `np.nonzero`, and their counts.
+    """
+    spikes = np.nonzero(mask)
+    column = 0
+    if mask.ndim > 1:
+        column = np.ravel_multi_index(spikes[1:], mask.shape[1:])
+    # Sort key keeping the windows of different columns apart
+    key = np.asarray(column, dtype=np.int64) * (len(mask) + 2 * half_window + 1)
+    key = key + spikes[0]
+    sorted_key = np.sort(key)
+    counts = np.searchsorted(sorted_key, key + half_window, side="right")
+    counts -= np.searchsorted(sorted_key, key - half_window, side="left")
+    return spikes, counts
+
+
+@lru_cache
+def _median_network(size: int) -> List[Tuple[int, int]]:
+    """
+    The comparators of a sorting network of ``size`` inputs needed for the median.
+
+    The network is Batcher's odd-even merge sort, keeping only the comparators
+    the middle output depends on.
+    """
+    comparators = []
+    p = 1
+    while p < size:
+        k = p
+        while k >= 1:
+            for j in range(k % p, size - k, 2 * k):
+                for i in range(min(k, size - j - k)):
+                    if (i + j) // (2 * p) == (i + j + k) // (2 * p):
+                        comparators.append((i + j, i + j + k))
+            k //= 2
+        p *= 2
+
+    needed = {size // 2}
+    median_comparators = []
+    for i, j in reversed(comparators):
+        if i in needed or j in needed:
+            needed.update((i, j))
+            median_comparators.append((i, j))
+    return median_comparators[::-1]
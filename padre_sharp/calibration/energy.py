@@ -0,0 +1,147 @@
+"""
+A module to convert event ADC values to energies.
+
+The energy calibration is a polynomial in the ADC value for each channel,
+
+    energy = offset + gain * adc + c2 * adc**2 + c3 * adc**3 + ...
+
+read from a calibration table with a ``channel``, an ``offset`` and a ``gain``
+column and optional ``c2``, ``c3``, ... non-linearity columns, one row per
+channel. Channels missing from the table get a NaN energy.
+"""
+
+import re
+
+import numpy as np
+from astropy.table import Table
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "energy_coefficients",
+    "adc_to_energy",
+    "calibrate_energy",
+]
+
+#: Default number of events calibrated at a time
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+#: Columns every energy calibration table has
+REQUIRED_COLUMNS = ("channel", "offset", "gain")
+
+#: Names of the non-linearity columns, c<power>
+NONLINEARITY_COLUMN = re.compile(r"^c(?P<power>\d+)$")
+
+
+def energy_coefficients(calibration: Table) -> np.ndarray:
+    """
+    Build the per channel polynomial coefficients from a calibration table.
+
+    Parameters
+    ----------
+    calibration: ~astropy.table.Table
+        A calibration table, see the module documentation.
+
+    Returns
+    -------
+    coefficients: `np.ndarray`
+        Array of shape ``(num_channels, degree + 1)``, highest power first as for
+        `np.polyval`, indexed by channel number. Rows of channels missing from
+        the table are NaN.
+    """
+    missing_columns = set(REQUIRED_COLUMNS) - set(calibration.colnames)
+    if missing_columns:
+        raise ValueError(
+            f"Not an energy calibration table, missing {sorted(missing_columns)}."
+        )
+
+    powers = {0: "offset", 1: "gain"}
+    for name in calibration.colnames:
+        match = NONLINEARITY_COLUMN.match(name)
+        if match is not None:
+            powers[int(match["power"])] = name
+    degree = max(powers)
+
+    channels = np.asarray(calibration["channel"], dtype=np.int64)
+    # At least all the channels an event table can hold
+    num_channels = max(256, int(channels.max(initial=-1)) + 1)
+    coefficients = np.full((num_channels, degree + 1), np.nan)
+    coefficients[channels] = 0.0
+    for power, name in powers.items():
+        coefficients[channels, degree - power] = calibration[name]
+    return coefficients
+
+
+def adc_to_energy(
+    channel: np.ndarray,
+    adc: np.ndarray,
+    coefficients: np.ndarray,
+    out: np.ndarray = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> np.ndarray:
+    """
+    Evaluate the energy calibration polynomials of the events.
+
+    The polynomials are evaluated with Horner's method on ``chunk_size`` events
+    at a time, so the temporary arrays do not grow with the number of events.
+
+    Parameters
+    ----------
+    channel: `np.ndarray`
+        The channel of each event.
+    adc: `np.ndarray`
+        The ADC value of each event.
+    coefficients: `np.ndarray`
+        The polynomial coefficients of each channel, see `energy_coefficients`.
+    out: `np.ndarray`, optional
+        The array to write the energies into, e.g. the ``energy`` column of the
+        event table. A new ``float32`` array is allocated if not given.
+    chunk_size: `int`, optional
+        The number of events evaluated at a time.
+
+    Returns
+    -------
+    energy: `np.ndarray`
+        ``out``, or the new array of energies.
+    """
+    if out is None:
+        out = np.empty(len(adc), dtype=np.float32)
+    for start in range(0, len(adc), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_coefficients = coefficients[channel[chunk]]
+        x = adc[chunk].astype(np.float64)
+        energy = chunk_coefficients[:, 0].copy()
+        for power in range(1, coefficients.shape[1]):
+            energy *= x
+            energy += chunk_coefficients[:, power]
+        out[chunk] = energy
+    return out
+
+
+def calibrate_energy(
+    events: np.ndarray, calibration: Table, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> np.ndarray:
+    """
+    Fill in the ``energy`` column of an event table, in place.
+
+    Parameters
+    ----------
+    events: `np.ndarray`
+        An event table, see `~padre_sharp.io.decode.EVENT_DTYPE`.
+    calibration: ~astropy.table.Table
+        The energy calibration table.
+    chunk_size: `int`, optional
+        The number of events calibrated at a time.
+
+    Returns
+    -------
+    events: `np.ndarray`
+        The same event table.
+    """
+    adc_to_energy(
+        events["channel"],
+        events["adc"],
+        energy_coefficients(calibration),
+        out=events["energy"],
+        chunk_size=chunk_size,
+    )
+    return events
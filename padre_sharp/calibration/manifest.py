@@ -0,0 +1,262 @@
+"""
+A module to record the files processed by the pipeline, to skip unchanged work.
+
+The manifest is a SQLite database in the cache directory with one row per input
+file and processing request. A row holds the content hash of the input, the
+software version, the identity of the calibration file used and the output
+files. A file is processed again only when one of these changed or an output
+is missing.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import padre_sharp
+from padre_sharp import log
+from padre_sharp.util import config
+
+__all__ = [
+    "MANIFEST_FILENAME",
+    "ManifestEntry",
+    "ProcessingManifest",
+    "file_hash",
+    "calibration_identity",
+]
+
+#: Name of the manifest database in the cache directory
+MANIFEST_FILENAME = "manifest.sqlite"
+
+#: Number of bytes hashed at a time
+HASH_BLOCK_SIZE = 1024 * 1024
+
+#: Seconds to wait for another process holding the database lock
+LOCK_TIMEOUT = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed (
+    input_path TEXT NOT NULL,
+    request TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    input_hash TEXT NOT NULL,
+    version TEXT NOT NULL,
+    calibration TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    processed_at REAL NOT NULL,
+    PRIMARY KEY (input_path, request)
+)
+"""
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """
+    The record of an input file processed by the pipeline.
+
+    Attributes
+    ----------
+    input_path: str
+        The resolved path of the input file.
+    request: str
+        The processing options, e.g. the level processed up to.
+    size: int
+        The size of the input file when it was processed.
+    mtime_ns: int
+        The modification time of the input file when it was processed.
+    input_hash: str
+        The content hash of the input file, see `file_hash`.
+    version: str
+        The ``padre_sharp`` version that processed the file.
+    calibration: str
+        The identity of the calibration file used, empty if none.
+    outputs: list
+        The output files.
+    processed_at: float
+        When the file was processed, as a unix time.
+    """
+
+    input_path: str
+    request: str
+    size: int
+    mtime_ns: int
+    input_hash: str
+    version: str
+    calibration: str
+    outputs: List[str]
+    processed_at: float
+
+
+class ProcessingManifest:
+    """
+    The record of the files processed by the pipeline.
+
+    A lookup is a primary key query. The input file is only hashed again when
+    its size or modification time differ from the record, so that an
+    unchanged file is recognised without reading it.
+
+    Parameters
+    ----------
+    path: Path, optional
+        The database file. Defaults to `MANIFEST_FILENAME` in the cache
+        directory, see `~padre_sharp.util.config.get_and_create_cache_dir`.
+    """
+
+    def __init__(self, path: Path = None) -> None:
+        if path is None:
+            path = config.get_and_create_cache_dir() / MANIFEST_FILENAME
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A short lived connection per operation, the database is shared by the
+        # worker processes of a batch
+        with closing(sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+
+    def get(self, input_path: Path, request: str = "") -> ManifestEntry:
+        """
+        Return the record of an input file, or None if it was never processed.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM processed WHERE input_path = ? AND request = ?",
+                (str(Path(input_path).resolve()), request),
+            ).fetchone()
+        if row is None:
+            return None
+        *fields, outputs, processed_at = row
+        return ManifestEntry(*fields, json.loads(outputs), processed_at)
+
+    def is_current(
+        self, input_path: Path, request: str = "", calibration: str = ""
+    ) -> List[Path]:
+        """
+        Check whether the record of an input file is up to date.
+
+        Parameters
+        ----------
+        input_path: Path
+            The input file.
+        request: str, optional
+            The processing options.
+        calibration: str, optional
+            The identity of the calibration file the processing would use.
+
+        Returns
+        -------
+        outputs: list
+            The recorded output files if the input, the software version and the
+            calibration are unchanged and all the outputs exist, otherwise None.
+        """
+        entry = self.get(input_path, request)
+        if (
+            entry is None
+            or entry.version != padre_sharp.__version__
+            or entry.calibration != calibration
+        ):
+            return None
+        outputs = [Path(output) for output in entry.outputs]
+        if not all(output.exists() for output in outputs):
+            return None
+
+        stat = Path(input_path).stat()
+        if (stat.st_size, stat.st_mtime_ns) != (entry.size, entry.mtime_ns):
+            if stat.st_size != entry.size or file_hash(input_path) != entry.input_hash:
+                return None
+            # Touched or copied but unchanged, no need to hash it next time
+            self.record(
+                input_path, outputs, request, calibration, input_hash=entry.input_hash
+            )
+        return outputs
+
+    def record(
+        self,
+        input_path: Path,
+        outputs: List[Path],
+        request: str = "",
+        calibration: str = "",
+        input_hash: str = None,
+    ) -> None:
+        """
+        Record that an input file was processed into outputs.
+
+        Parameters
+        ----------
+        input_path: Path
+            The input file.
+        outputs: list
+            The output files.
+        request: str, optional
+            The processing options.
+        calibration: str, optional
+            The identity of the calibration file used.
+        input_hash: str, optional
+            The content hash of the input, computed if not given.
+        """
+        input_path = Path(input_path).resolve()
+        stat = input_path.stat()
+        if input_hash is None:
+            input_hash = file_hash(input_path)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(input_path),
+                    request,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    input_hash,
+                    padre_sharp.__version__,
+                    calibration,
+                    json.dumps([str(output) for output in outputs]),
+                    time.time(),
+                ),
+            )
+        log.debug(f"Recorded {input_path} in the processing manifest.")
+
+    def forget(self, input_path: Path = None) -> None:
+        """
+        Remove the records of an input file, or of all files.
+        """
+        with self._connect() as connection:
+            if input_path is None:
+                connection.execute("DELETE FROM processed")
+            else:
+                connection.execute(
+                    "DELETE FROM processed WHERE input_path = ?",
+                    (str(Path(input_path).resolve()),),
+                )
+
+
+def file_hash(path: Path) -> str:
+    """
+    Return the content hash of a file, a hex digest of its bytes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        while block := fh.read(HASH_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def calibration_identity(calib_filename: Path) -> str:
+    """
+    Return the identity of a calibration file, its path, size and modification
+    time, or an empty string for no file.
+    """
+    if calib_filename is None:
+        return ""
+    stat = os.stat(calib_filename)
+    return f"{Path(calib_filename).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
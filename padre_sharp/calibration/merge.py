@@ -0,0 +1,507 @@
+"""
+A module to merge many l1 event list files into time ordered daily products.
+
+The events of each input file are time sorted (see
+`~padre_sharp.calibration.calibrate_product`), so the files are merged by
+streaming them chunk by chunk. The inputs can come from different power cycles
+of the instrument, the events are moved onto the clock of the earliest clock
+epoch as they are read, so that they are merged in the order of their UTC time. All the buffered events earlier than the last
+buffered event of every unfinished input cannot be preceded by an event not
+read yet, they are sorted together, freed of the events repeated by another
+input and appended to the output file. The memory used is proportional to the
+number of inputs times the chunk size.
+"""
+
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+from astropy.io import fits
+from astropy.time import Time
+
+from padre_sharp import log
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode, staging
+from padre_sharp.util import time_conversion
+from padre_sharp.util.lazy import LazyModule
+
+# swxsoc is slow to import, it is imported on first use
+util = LazyModule("swxsoc.util.util")
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DUPLICATE_COLUMNS",
+    "EventListWriter",
+    "merge_eventlists",
+    "merge_daily",
+]
+
+#: Default number of events read from each input at a time
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+#: Columns that are equal for the same event seen in overlapping downlinks
+DUPLICATE_COLUMNS = ("coarse_time", "fine_time", "channel", "adc", "flags")
+
+#: Size of a FITS block in bytes
+FITS_BLOCK_SIZE = 2880
+
+#: Nanoseconds per day
+NS_PER_DAY = time_conversion.S_PER_DAY * time_conversion.NS_PER_S
+
+
+class EventListWriter:
+    """
+    Write an event table to a FITS file a chunk of events at a time.
+
+    The file has the layout written by `~padre_sharp.calibration.DataProduct`, a
+    primary HDU and an ``EVENTS`` binary table. The row count in the table
+    header is filled in when the writer is closed.
+
+    Parameters
+    ----------
+    filename: Path
+        The file to write.
+    primary_hdu: ~astropy.io.fits.PrimaryHDU
+        The primary HDU, see `~padre_sharp.calibration.DataProduct.primary_hdu`.
+    dtype: `np.dtype`, optional
+        The dtype of the event tables written.
+    """
+
+    def __init__(
+        self,
+        filename: Path,
+        primary_hdu: fits.PrimaryHDU,
+        dtype: np.dtype = decode.EVENT_DTYPE,
+    ) -> None:
+        self.filename = Path(filename)
+        self.dtype = np.dtype(dtype)
+        self.num_rows = 0
+        self._primary_header = primary_hdu.header
+        self._header = fits.BinTableHDU(
+            np.empty(0, dtype=self.dtype), name="EVENTS"
+        ).header
+        self._disk_dtype = np.dtype(
+            [(name, _disk_type(self.dtype[name])) for name in self.dtype.names]
+        )
+        self._file = None
+        self._header_offset = None
+
+    def __enter__(self) -> "EventListWriter":
+        self._file = open(self.filename, "wb")
+        self._file.write(self._primary_header.tostring().encode("ascii"))
+        self._header_offset = self._file.tell()
+        self._file.write(self._header.tostring().encode("ascii"))
+        return self
+
+    def write(self, events: np.ndarray) -> None:
+        """
+        Append events to the table.
+        """
+        rows = np.empty(len(events), dtype=self._disk_dtype)
+        for name in self.dtype.names:
+            column = events[name]
+            if column.dtype.kind == "u" and column.dtype.itemsize > 1:
+                # Unsigned integers are stored with an offset of half their range,
+                # which flips the sign bit
+                sign_bit = column.dtype.type(1 << (8 * column.dtype.itemsize - 1))
+                column = (column ^ sign_bit).view(column.dtype.str.replace("u", "i"))
+            rows[name] = column
+        self._file.write(rows.tobytes())
+        self.num_rows += len(events)
+
+    def __exit__(self, *exc_info) -> None:
+        num_bytes = self.num_rows * self._disk_dtype.itemsize
+        self._file.write(b"\0" * (-num_bytes % FITS_BLOCK_SIZE))
+        # The header has a fixed size, it is rewritten in place
+        self._header["NAXIS2"] = self.num_rows
+        self._file.seek(self._header_offset)
+        self._file.write(self._header.tostring().encode("ascii"))
+        self._file.close()
+        self._file = None
+
+
+def merge_eventlists(
+    data_filenames: Iterable[Path],
+    time: Time = None,
+    output_dir: Path = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Path:
+    """
+    Merge l1 event list files into one time sorted event list product.
+
+    Events that are in several inputs, from overlapping downlinks, are written
+    once, see `DUPLICATE_COLUMNS`, equal events of one input are all kept. Only
+    the event table is merged, the ``packet_index`` of an event still refers to
+    the packets of its input file.
+
+    The product has the earliest clock epoch of the inputs, the coarse and fine
+    times of the events of an input with a later epoch are moved onto that
+    clock. A fraction of a second between two epochs is rounded to the fine
+    time. Inputs without a clock epoch are only merged together, taken to share
+    one clock.
+
+    Parameters
+    ----------
+    data_filenames: list
+        The l1 ``eventlist`` files, each time sorted.
+    time: ~astropy.time.Time, optional
+        The time of the merged product. Defaults to the earliest input time.
+    output_dir: Path, optional
+        The directory to publish the product to, see
+        `~padre_sharp.io.staging.ScratchDirectory`.
+    chunk_size: int, optional
+        The number of events read from each input at a time.
+
+    Returns
+    -------
+    output_filename: Path
+        The merged product.
+    """
+    data_filenames = [Path(data_filename) for data_filename in data_filenames]
+    product, first = _merged_product(data_filenames)
+    if time is not None:
+        product.time = Time(time)
+
+    readers = []
+    try:
+        for data_filename in data_filenames:
+            readers.append(_EventListReader(data_filename, chunk_size))
+        product.epoch = _common_epoch(readers)
+        with staging.ScratchDirectory(output_dir) as scratch:
+            scratch_filename = scratch.path / product.filename
+            with EventListWriter(scratch_filename, product.primary_hdu()) as writer:
+                num_read = _merge(readers, writer)
+            output_filename = scratch.publish(scratch_filename)
+    finally:
+        for reader in readers:
+            reader.close()
+    log.info(
+        f"Merged {len(data_filenames)} event lists into {output_filename}, "
+        f"{writer.num_rows} events, {num_read - writer.num_rows} duplicates."
+    )
+    return output_filename
+
+
+def merge_daily(
+    data_filenames: Iterable[Path],
+    output_dir: Path = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Path]:
+    """
+    Merge l1 event list files into one product per day.
+
+    The files are merged as by `merge_eventlists` and the stream of events is
+    split at each UTC midnight, using the event times and the clock epoch of the
+    products (see `~padre_sharp.io.decode.event_times`), so the events of a
+    file spanning midnight go to two products. Every input needs a clock epoch.
+
+    Parameters
+    ----------
+    data_filenames: list
+        The l1 ``eventlist`` files, each time sorted.
+    output_dir: Path, optional
+        The directory to publish the products to.
+    chunk_size: int, optional
+        The number of events read from each input at a time.
+
+    Returns
+    -------
+    output_filenames: list
+        The daily products, in time order.
+    """
+    data_filenames = [Path(data_filename) for data_filename in data_filenames]
+    product, first = _merged_product(data_filenames)
+
+    readers = []
+    try:
+        for data_filename in data_filenames:
+            readers.append(_EventListReader(data_filename, chunk_size))
+        product.epoch = _common_epoch(readers)
+        if not product.epoch:
+            raise ValueError(
+                f"{data_filenames[first]} has no clock epoch, its events cannot be "
+                "split into days."
+            )
+        with staging.ScratchDirectory(output_dir) as scratch:
+            with _DailyWriter(scratch.path, product) as writer:
+                num_read = _merge(readers, writer)
+            output_filenames = [
+                scratch.publish(scratch_filename)
+                for scratch_filename in writer.filenames
+            ]
+    finally:
+        for reader in readers:
+            reader.close()
+    log.info(
+        f"Merged {len(data_filenames)} event lists into {len(output_filenames)} "
+        f"daily products, {writer.num_rows} events, "
+        f"{num_read - writer.num_rows} duplicates."
+    )
+    return output_filenames
+
+
+def _merged_product(data_filenames: List[Path]):
+    """
+    Return the product merging event list files, without data, and the index
+    of the earliest file.
+    """
+    if not data_filenames:
+        raise ValueError("No event list files to merge.")
+    all_metadata = [util.parse_science_filename(name) for name in data_filenames]
+    for data_filename, file_metadata in zip(data_filenames, all_metadata):
+        if file_metadata["level"] != "l1" or file_metadata["descriptor"] != "eventlist":
+            raise ValueError(f"{data_filename} is not an l1 event list file.")
+    first = min(range(len(all_metadata)), key=lambda i: all_metadata[i]["time"])
+    first_metadata = all_metadata[first]
+    product = DataProduct(
+        instrument=first_metadata["instrument"],
+        time=first_metadata["time"],
+        level="l1",
+        version=first_metadata["version"] or "0.0.0",
+        descriptor="eventlist",
+        mode=first_metadata["mode"] or "",
+    )
+    return product, first
+
+
+class _DailyWriter:
+    """
+    Write time sorted events to one event list file per UTC day.
+    """
+
+    def __init__(self, output_dir: Path, product: DataProduct) -> None:
+        self.output_dir = Path(output_dir)
+        self.product = product
+        self.filenames = []
+        self.num_rows = 0
+        self._day = None
+        self._writer = None
+
+    def __enter__(self) -> "_DailyWriter":
+        return self
+
+    def write(self, events: np.ndarray) -> None:
+        """
+        Append events to the file of their day, starting new days as needed.
+        """
+        unix_ns = time_conversion.spacecraft_to_unix(
+            self.product.epoch, events["coarse_time"], events["fine_time"], as_ns=True
+        )
+        days = unix_ns // NS_PER_DAY
+        starts = np.flatnonzero(np.concatenate([[True], days[1:] != days[:-1]]))
+        for start, stop in zip(starts, np.append(starts[1:], len(events))):
+            if days[start] != self._day:
+                self._start_day(days[start])
+            self._writer.write(events[start:stop])
+        self.num_rows += len(events)
+
+    def _start_day(self, day: int) -> None:
+        self._close()
+        product = replace(self.product, time=Time(np.datetime64(int(day), "D")))
+        filename = self.output_dir / product.filename
+        self._writer = EventListWriter(filename, product.primary_hdu()).__enter__()
+        self.filenames.append(filename)
+        self._day = day
+
+    def _close(self) -> None:
+        if self._writer is not None:
+            self._writer.__exit__(None, None, None)
+            self._writer = None
+
+    def __exit__(self, *exc_info) -> None:
+        self._close()
+
+
+class _EventListReader:
+    """
+    Read the time sorted event table of a file a chunk at a time.
+    """
+
+    def __init__(self, filename: Path, chunk_size: int) -> None:
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self._hdul = fits.open(filename, memmap=True)
+        self.epoch = self._hdul[0].header.get("CLKEPOCH", "")
+        #: Nanoseconds from the epoch of the merged events to the file epoch
+        self.offset_ns = 0
+        self._events = self._hdul["EVENTS"].data
+        self._position = 0
+        self._last_key = None
+
+    @property
+    def num_rows(self) -> int:
+        return 0 if self._events is None else len(self._events)
+
+    def read(self) -> np.ndarray:
+        """
+        Return the next chunk of events, or None at the end of the file.
+        """
+        if self._position >= self.num_rows:
+            return None
+        rows = self._events[self._position : self._position + self.chunk_size]
+        self._position += len(rows)
+        events = np.empty(len(rows), dtype=decode.EVENT_DTYPE)
+        for name in events.dtype.names:
+            events[name] = rows[name]
+        if self.offset_ns:
+            _shift_clock(events, self.offset_ns)
+
+        keys = decode.event_keys(events)
+        if np.any(keys[1:] < keys[:-1]) or (
+            self._last_key is not None and keys[0] < self._last_key
+        ):
+            raise ValueError(f"The events of {self.filename} are not time sorted.")
+        self._last_key = keys[-1]
+        return events
+
+    def close(self) -> None:
+        self._events = None
+        self._hdul.close()
+
+
+def _common_epoch(readers: List[_EventListReader]) -> str:
+    """
+    Return the earliest clock epoch of the readers and set the offset of each
+    reader to it, an empty string if no reader has an epoch.
+    """
+    epochs = {reader.epoch for reader in readers}
+    if epochs == {""}:
+        return ""
+    for reader in readers:
+        if not reader.epoch:
+            raise ValueError(
+                f"{reader.filename} has no clock epoch, its events cannot be merged "
+                "with the events of other clocks."
+            )
+    tai = {epoch: int(time_conversion.spacecraft_to_tai(epoch, 0)) for epoch in epochs}
+    epoch = min(epochs, key=tai.get)
+    for reader in readers:
+        reader.offset_ns = tai[reader.epoch] - tai[epoch]
+    return epoch
+
+
+def _shift_clock(events: np.ndarray, offset_ns: int) -> None:
+    """
+    Move events onto a clock started ``offset_ns`` nanoseconds earlier, rounding
+    the fraction of a second to the fine time.
+    """
+    offset_s, offset_ns = divmod(offset_ns, time_conversion.NS_PER_S)
+    offset_fine = (
+        offset_ns * decode.FINE_TIME_PER_COARSE_TIME + time_conversion.NS_PER_S // 2
+    ) // time_conversion.NS_PER_S
+    fine_time = events["fine_time"].astype(np.int64) + offset_fine
+    events["coarse_time"] += np.uint64(offset_s) + (
+        fine_time // decode.FINE_TIME_PER_COARSE_TIME
+    ).astype(np.uint64)
+    events["fine_time"] = fine_time % decode.FINE_TIME_PER_COARSE_TIME
+
+
+def _merge(readers: List[_EventListReader], writer) -> int:
+    """
+    Stream the events of the readers into the writer, returning the number of
+    events read.
+    """
+    buffers = [reader.read() for reader in readers]
+    active = [buffer is not None for buffer in buffers]
+    buffers = [
+        buffer if buffer is not None else np.empty(0, dtype=decode.EVENT_DTYPE)
+        for buffer in buffers
+    ]
+    keys = [decode.event_keys(buffer) for buffer in buffers]
+    num_read = sum(len(buffer) for buffer in buffers)
+    while True:
+        # Unread events of an active input are no earlier than its last buffered
+        # event, so the buffered events before the earliest of these are final
+        last_keys = [key[-1] for key, is_active in zip(keys, active) if is_active]
+        bound = min(last_keys) if last_keys else None
+        batch = []
+        sources = []
+        for i, key in enumerate(keys):
+            stop = len(key) if bound is None else np.searchsorted(key, bound)
+            batch.append(buffers[i][:stop])
+            sources.append(np.full(stop, i, dtype=np.intp))
+            buffers[i], keys[i] = buffers[i][stop:], key[stop:]
+        batch = np.concatenate(batch)
+        if len(batch):
+            writer.write(
+                _sorted_unique(batch, decode.event_keys(batch), np.concatenate(sources))
+            )
+        if bound is None:
+            return num_read
+
+        # Extend the buffers holding only events at the bound
+        for i, key in enumerate(keys):
+            if active[i] and key[-1] == bound:
+                events = readers[i].read()
+                if events is None:
+                    active[i] = False
+                    continue
+                num_read += len(events)
+                buffers[i] = np.concatenate([buffers[i], events])
+                keys[i] = np.concatenate([key, decode.event_keys(events)])
+
+
+def _sorted_unique(
+    events: np.ndarray, keys: np.ndarray, sources: np.ndarray
+) -> np.ndarray:
+    """
+    Sort events by time and drop the duplicates, see `DUPLICATE_COLUMNS`.
+
+    Only events repeated by another input are duplicates: an event is kept as
+    many times as the input holding it most often has it.
+    """
+    # The batch is a few sorted runs, which a stable sort (timsort) merges fast
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    # The other columns of an event, so that duplicates of equal time are
+    # adjacent once the few events of equal time are also sorted by them
+    others = events["channel"].astype(np.uint64) << np.uint64(32)
+    others |= events["adc"].astype(np.uint64) << np.uint64(16)
+    others |= events["flags"].astype(np.uint64)
+    equal_time = keys[1:] == keys[:-1]
+    if not np.any(equal_time):
+        return events[order]
+    ties = np.flatnonzero(
+        np.concatenate([[False], equal_time]) | np.concatenate([equal_time, [False]])
+    )
+    tie_order = order[ties]
+    tie_order = tie_order[
+        np.lexsort([sources[tie_order], others[tie_order], keys[ties]])
+    ]
+    order[ties] = tie_order
+
+    # Among the tied events, number the copies of an event in each input
+    tie_keys, tie_others = keys[ties], others[tie_order]
+    tie_sources = sources[tie_order]
+    new_event = np.concatenate(
+        [[True], (tie_keys[1:] != tie_keys[:-1]) | (tie_others[1:] != tie_others[:-1])]
+    )
+    new_run = new_event | np.concatenate([[True], tie_sources[1:] != tie_sources[:-1]])
+    run_starts = np.flatnonzero(new_run)
+    copy = np.arange(len(ties)) - np.repeat(
+        run_starts, np.diff(np.append(run_starts, len(ties)))
+    )
+    # The n-th copy of an event is kept from the first input that has one
+    event = np.cumsum(new_event)
+    by_copy = np.lexsort([copy, event])
+    first = np.concatenate(
+        [
+            [True],
+            (event[by_copy][1:] != event[by_copy][:-1])
+            | (copy[by_copy][1:] != copy[by_copy][:-1]),
+        ]
+    )
+    keep = np.ones(len(order), dtype=bool)
+    keep[ties] = False
+    keep[ties[by_copy[first]]] = True
+    return events[order[keep]]
+
+
+def _disk_type(dtype: np.dtype) -> str:
+    """
+    Return the big endian type a column of ``dtype`` is stored as in FITS.
+    """
+    if dtype.kind == "u" and dtype.itemsize > 1:
+        return f">i{dtype.itemsize}"
+    return dtype.newbyteorder(">").str
@@ -0,0 +1,230 @@
+"""
+A module to find and read calibration files by time.
+"""
+
+import re
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from astropy.table import Table
+from astropy.time import Time
+
+from padre_sharp import log
+from padre_sharp.util import config, resources
+
+__all__ = [
+    "CALIBRATION_CACHE_SIZE",
+    "CalibrationEntry",
+    "CalibrationRegistry",
+    "get_calibration_registry",
+]
+
+#: Maximum number of parsed calibration files kept in memory
+CALIBRATION_CACHE_SIZE = 16
+
+#: Calibration filenames, <prefix>_calib_<start time>_<end time>[.<extension>]
+CALIBRATION_FILENAME = re.compile(
+    r"^(?P<prefix>\w+?)_calib_(?P<start>\d{8}(?:T\d{6})?)_(?P<end>\d{8}(?:T\d{6})?)"
+    r"(?P<extension>\..+)?$"
+)
+
+
+@dataclass(frozen=True)
+class CalibrationEntry:
+    """
+    A calibration file and the time range it is valid for.
+
+    Attributes
+    ----------
+    path: Path
+        The calibration file.
+    start: float
+        Start of the validity range, as a unix time.
+    end: float
+        End of the validity range (exclusive), as a unix time.
+    """
+
+    path: Path
+    start: float
+    end: float
+
+    @classmethod
+    def from_path(cls, path: Path) -> "CalibrationEntry":
+        """
+        Make an entry from a calibration filename, or None if it is not one.
+        """
+        match = CALIBRATION_FILENAME.match(Path(path).name)
+        if match is None:
+            return None
+        start = _parse_filename_time(match["start"])
+        end = _parse_filename_time(match["end"])
+        if end <= start:
+            log.warning(f"Ignoring calibration file {path} with an empty time range.")
+            return None
+        return cls(Path(path), start, end)
+
+
+class CalibrationRegistry:
+    """
+    An index of the calibration files by validity range.
+
+    The calibration directories are scanned on the first lookup into a list
+    sorted by start time so that a lookup is a binary search, and scanned again
+    after `clear`. The shared registry (see `get_calibration_registry`) is
+    replaced when a calibration file is added, removed or renamed, or the
+    directories change. Parsed calibration
+    files are kept in a least recently used cache of at most ``cache_size``
+    files, keyed on the path and modification time of the file.
+
+    When validity ranges overlap, the file with the latest start wins, and for
+    equal starts the file from the later directory in ``calibration_dirs``.
+
+    Parameters
+    ----------
+    calibration_dirs: list, optional
+        The directories to scan, in increasing priority. Defaults to
+        `~padre_sharp.util.config.get_calibration_dirs`.
+    cache_size: int, optional
+        The maximum number of parsed calibration files to keep in memory.
+    """
+
+    def __init__(
+        self, calibration_dirs: List[Path] = None, cache_size: int = None
+    ) -> None:
+        self._calibration_dirs = calibration_dirs
+        self.cache_size = CALIBRATION_CACHE_SIZE if cache_size is None else cache_size
+        self._entries = None
+        self._starts = None
+        self._max_ends = None
+        self._cache = OrderedDict()
+        self.num_scans = 0
+        self.num_reads = 0
+        self.num_hits = 0
+
+    @property
+    def calibration_dirs(self) -> List[Path]:
+        if self._calibration_dirs is None:
+            return config.get_calibration_dirs()
+        return [Path(calibration_dir) for calibration_dir in self._calibration_dirs]
+
+    @property
+    def entries(self) -> List[CalibrationEntry]:
+        """The calibration files, sorted by start time and priority."""
+        if self._entries is None:
+            self.scan()
+        return self._entries
+
+    def scan(self) -> None:
+        """
+        Scan the calibration directories and rebuild the index.
+        """
+        calibration_dirs = self.calibration_dirs
+        keyed_entries = []
+        for priority, calibration_dir in enumerate(calibration_dirs):
+            if not calibration_dir.is_dir():
+                log.debug(f"Calibration directory {calibration_dir} does not exist.")
+                continue
+            for path in sorted(calibration_dir.iterdir()):
+                entry = CalibrationEntry.from_path(path) if path.is_file() else None
+                if entry is not None:
+                    keyed_entries.append(((entry.start, priority), entry))
+        keyed_entries.sort(key=lambda keyed_entry: keyed_entry[0])
+
+        self._entries = [entry for _, entry in keyed_entries]
+        self._starts = [entry.start for entry in self._entries]
+        # The latest end of all the entries up to each one, lets a lookup stop
+        # walking back as soon as no earlier entry can contain the time
+        self._max_ends = np.maximum.accumulate(
+            [entry.end for entry in self._entries] or [-np.inf]
+        ).tolist()
+        self.num_scans += 1
+        log.debug(f"Found {len(self._entries)} calibration files.")
+
+    def lookup(self, time) -> CalibrationEntry:
+        """
+        Find the calibration file valid at a time.
+
+        Parameters
+        ----------
+        time: ~astropy.time.Time
+            The time of the data, or anything `~astropy.time.Time` accepts.
+
+        Returns
+        -------
+        entry: CalibrationEntry
+            The calibration file valid at ``time``, or None if there is none.
+        """
+        entries = self.entries
+        unix_time = float(Time(time).unix)
+        index = bisect_right(self._starts, unix_time) - 1
+        while index >= 0 and self._max_ends[index] > unix_time:
+            if entries[index].end > unix_time:
+                return entries[index]
+            index -= 1
+        return None
+
+    def read(self, calib_filename: Path) -> Table:
+        """
+        Read a calibration file, through the cache.
+
+        The returned table is shared between callers and must not be modified.
+
+        Parameters
+        ----------
+        calib_filename: Path
+            The calibration file.
+
+        Returns
+        -------
+        calibration: ~astropy.table.Table
+        """
+        path = Path(calib_filename).resolve()
+        key = (path, path.stat().st_mtime_ns)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.num_hits += 1
+            return self._cache[key]
+
+        calibration = Table.read(path)
+        self.num_reads += 1
+        self._cache[key] = calibration
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return calibration
+
+    def clear(self) -> None:
+        """
+        Forget the index and the parsed files, the next lookup scans again.
+        """
+        self._entries = None
+        self._starts = None
+        self._max_ends = None
+        self._cache.clear()
+
+
+def get_calibration_registry() -> CalibrationRegistry:
+    """
+    Return the calibration registry shared by the whole process, see
+    `~padre_sharp.util.resources.get_resource_cache`.
+
+    The registry is built again when the calibration directories change, a
+    file added during a scan is found by the next registry.
+    """
+    token = resources.path_token(config.get_calibration_dirs())
+    return resources.get_resource_cache().get(
+        "calibration_registry", CalibrationRegistry, token=token
+    )
+
+
+def _parse_filename_time(time_string: str) -> float:
+    """
+    Turn a filename time, ``YYYYMMDD`` or ``YYYYMMDDThhmmss``, into a unix time.
+    """
+    time_format = "%Y%m%dT%H%M%S" if "T" in time_string else "%Y%m%d"
+    time = datetime.strptime(time_string, time_format)
+    return time.replace(tzinfo=timezone.utc).timestamp()
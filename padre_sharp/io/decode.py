@@ -0,0 +1,318 @@
+"""
+This module provides a vectorized decoder for SHARP science packets.
+
+There is no interface control document for the SHARP packet contents yet, the
+layout below was derived from flight data and is provisional. It is defined by
+the constants and dtypes of this module only, so that it can be corrected in one
+place.
+
+* The 6 byte primary header is followed by a 6 byte secondary header holding a
+  48 bit big-endian coarse time counter.
+* The rest of the packet is a stream of 6 byte event records, each made of
+  three little-endian 16 bit words: the fine time, the channel and ADC value
+  (top 4 and low 12 bits), and the event flags.
+* A packet that starts a frame begins its data with the sync word `FRAME_SYNC`
+  followed by a `FRAME_HEADER_NUM_BYTES` byte frame header, which holds the
+  number of event records in the frame.
+* Bytes after the last complete event record are ignored.
+* The coarse time counts seconds and the fine time counts 1/65536 s, see
+  `event_times`.
+
+The event table has an ``energy`` column which is NaN until the events are
+calibrated, see `~padre_sharp.calibration.energy.calibrate_energy`.
+"""
+
+from typing import Dict
+
+import numpy as np
+
+from padre_sharp.util import packets
+from padre_sharp.util.lazy import LazyModule
+
+# The time conversions import astropy, they are imported on first use
+time_conversion = LazyModule("padre_sharp.util.time_conversion")
+
+__all__ = [
+    "DECODER_VERSION",
+    "SCIENCE_APID",
+    "FRAME_SYNC",
+    "FRAME_HEADER_NUM_BYTES",
+    "EVENT_RECORD_DTYPE",
+    "EVENT_DTYPE",
+    "PACKET_DTYPE",
+    "decode_packets",
+    "decode_file",
+    "read_coarse_times",
+    "event_times",
+    "event_keys",
+    "sort_events",
+]
+
+#: Version of the decoder, bump when the decoded tables change
+DECODER_VERSION = 2
+
+#: APID of the SHARP science (event) packets
+SCIENCE_APID = 19
+
+#: Number of bytes in the secondary header (coarse time)
+SECONDARY_HEADER_NUM_BYTES = 6
+
+#: Sync word, read as little-endian, at the start of a frame
+FRAME_SYNC = 0xBB55
+
+#: Number of bytes in a frame header, including the sync word
+FRAME_HEADER_NUM_BYTES = 32
+
+#: Byte offset in the frame header of the number of event records (uint16 LE)
+FRAME_NUM_EVENTS_OFFSET = 8
+
+#: Structured dtype of an event record as stored in a packet
+EVENT_RECORD_DTYPE = np.dtype(
+    [("fine_time", "<u2"), ("channel_adc", "<u2"), ("flags", "<u2")]
+)
+
+#: Number of bits of the ADC value in the ``channel_adc`` word
+ADC_NUM_BITS = 12
+
+#: Number of fine time ticks per coarse time tick
+FINE_TIME_PER_COARSE_TIME = 2**16
+
+#: Structured dtype of the decoded event table
+EVENT_DTYPE = np.dtype(
+    [
+        ("packet_index", np.uint32),
+        ("coarse_time", np.uint64),
+        ("fine_time", np.uint16),
+        ("channel", np.uint8),
+        ("adc", np.uint16),
+        ("flags", np.uint16),
+        ("energy", np.float32),
+    ]
+)
+
+#: Structured dtype of the decoded packet (housekeeping) table
+PACKET_DTYPE = np.dtype(
+    [
+        ("apid", np.uint16),
+        ("sequence_count", np.uint16),
+        ("coarse_time", np.uint64),
+        ("frame_start", np.bool_),
+        ("first_event", np.int64),
+        ("num_events", np.uint32),
+        ("num_trailing_bytes", np.uint32),
+    ]
+)
+
+
+def decode_packets(packet_view, apid: int = SCIENCE_APID) -> Dict[str, np.ndarray]:
+    """
+    Decode all the science packets of a raw file in bulk.
+
+    All the packets of ``apid`` are decoded at once with array operations on the
+    file buffer, no Python object is created per packet or per event.
+
+    Parameters
+    ----------
+    packet_view: `~padre_sharp.util.packets.PacketView` or path
+        The packets to decode, or a raw file to open with
+        `~padre_sharp.util.packets.open_packets`.
+    apid: `int`, optional
+        The APID of the packets to decode.
+
+    Returns
+    -------
+    `dict`
+        ``"events"``, a table of dtype `EVENT_DTYPE` with one row per event in
+        packet order, and ``"packets"``, a table of dtype `PACKET_DTYPE` with one
+        row per decoded packet. ``packet_index`` of an event is its row in
+        ``"packets"``.
+    """
+    if not isinstance(packet_view, packets.PacketView):
+        packet_view = packets.open_packets(packet_view)
+    file_bytes = packet_view.file_bytes
+    headers = packet_view.headers[packet_view.headers["apid"] == apid]
+    offsets = headers["offset"]
+    ends = offsets + headers["length"]
+
+    data_start = offsets + packets.PRIMARY_HEADER_NUM_BYTES + SECONDARY_HEADER_NUM_BYTES
+    packet_table = np.zeros(len(headers), dtype=PACKET_DTYPE)
+    packet_table["apid"] = headers["apid"]
+    packet_table["sequence_count"] = headers["sequence_count"]
+    packet_table["coarse_time"] = read_coarse_times(file_bytes, headers)
+
+    # Frame headers
+    has_frame_header = data_start + FRAME_HEADER_NUM_BYTES <= ends
+    sync = _read_uint(file_bytes, data_start, 2, valid=has_frame_header)
+    frame_start = has_frame_header & (sync == FRAME_SYNC)
+    frame_num_events = _read_uint(
+        file_bytes, data_start + FRAME_NUM_EVENTS_OFFSET, 2, valid=frame_start
+    )
+    # A packet too short for its headers has no events, which start at its end
+    events_start = np.minimum(
+        data_start + np.where(frame_start, FRAME_HEADER_NUM_BYTES, 0), ends
+    ).astype(np.int64)
+
+    record_size = EVENT_RECORD_DTYPE.itemsize
+    num_records = (ends - events_start) // record_size
+    num_events = np.where(
+        frame_start, np.minimum(frame_num_events, num_records), num_records
+    ).astype(np.int64)
+    events_end = events_start + num_events * record_size
+    first_event = np.cumsum(num_events) - num_events
+    packet_table["frame_start"] = frame_start
+    packet_table["first_event"] = first_event
+    packet_table["num_events"] = num_events
+    # A frame can declare fewer events than its packet holds
+    packet_table["num_trailing_bytes"] = np.maximum(ends - events_end, 0)
+
+    # Select the bytes of all the event records with one mask over the file. The
+    # records of a packet are contiguous, so the mask alternates between runs of
+    # False (headers, trailing bytes, other APIDs) and runs of True (events).
+    run_lengths = np.empty(2 * len(headers) + 1, dtype=np.int64)
+    run_lengths[0:-1:2] = events_start - np.concatenate([[0], events_end[:-1]])
+    run_lengths[1::2] = num_events * record_size
+    run_lengths[-1] = max(
+        len(file_bytes) - (int(events_end[-1]) if len(headers) else 0), 0
+    )
+    run_values = np.arange(len(run_lengths)) % 2 == 1
+    mask = np.repeat(run_values, run_lengths)
+    records = file_bytes[mask].view(EVENT_RECORD_DTYPE)
+    packet_index = np.repeat(np.arange(len(headers), dtype=np.uint32), num_events)
+
+    events = np.empty(len(records), dtype=EVENT_DTYPE)
+    events["packet_index"] = packet_index
+    events["coarse_time"] = packet_table["coarse_time"][packet_index]
+    events["fine_time"] = records["fine_time"]
+    events["channel"] = records["channel_adc"] >> ADC_NUM_BITS
+    events["adc"] = records["channel_adc"] & ((1 << ADC_NUM_BITS) - 1)
+    events["flags"] = records["flags"]
+    events["energy"] = np.nan
+    return {"events": events, "packets": packet_table}
+
+
+def decode_file(data_filename) -> Dict[str, np.ndarray]:
+    """
+    Decode the science packets of a raw file.
+
+    Parameters
+    ----------
+    data_filename: str
+        Fully specificied filename of a raw file.
+
+    Returns
+    -------
+    `dict`
+        The event and packet tables, see `decode_packets`.
+    """
+    return decode_packets(packets.open_packets(data_filename))
+
+
+def read_coarse_times(file_bytes: np.ndarray, headers: np.ndarray) -> np.ndarray:
+    """
+    Read the coarse time of packets from their secondary header.
+
+    Parameters
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents, see `~padre_sharp.util.packets.PacketView`.
+    headers: `np.ndarray`
+        The primary headers of the packets, see
+        `~padre_sharp.util.packets.HEADER_DTYPE`.
+
+    Returns
+    -------
+    coarse_times: `np.ndarray`
+        The ``int64`` coarse times, 0 for packets too short to hold one.
+    """
+    offsets = headers["offset"]
+    data_start = offsets + packets.PRIMARY_HEADER_NUM_BYTES + SECONDARY_HEADER_NUM_BYTES
+    return _read_uint(
+        file_bytes,
+        offsets + packets.PRIMARY_HEADER_NUM_BYTES,
+        SECONDARY_HEADER_NUM_BYTES,
+        valid=data_start <= offsets + headers["length"],
+        byteorder="big",
+    )
+
+
+def event_times(events: np.ndarray, epoch: str = None) -> np.ndarray:
+    """
+    Return the time of each event in seconds of the instrument clock.
+
+    Parameters
+    ----------
+    events: `np.ndarray`
+        An event table, see `EVENT_DTYPE`.
+    epoch: str, optional
+        The UTC epoch of the clock, see
+        `~padre_sharp.util.time_conversion.clock_epoch`. If given, the times are
+        unix times instead, UTC seconds since 1970.
+
+    Returns
+    -------
+    times: `np.ndarray`
+        The ``float64`` event times.
+    """
+    if epoch:
+        return time_conversion.spacecraft_to_unix(
+            epoch, events["coarse_time"], events["fine_time"]
+        )
+    times = events["coarse_time"].astype(np.float64)
+    times += events["fine_time"] / FINE_TIME_PER_COARSE_TIME
+    return times
+
+
+def event_keys(events: np.ndarray) -> np.ndarray:
+    """
+    Return an integer key of each event that orders the events by time.
+
+    The key is the coarse time in the high 48 bits and the fine time in the low
+    16 bits, it is exact where the float event times are not.
+
+    Parameters
+    ----------
+    events: `np.ndarray`
+        An event table, see `EVENT_DTYPE`.
+
+    Returns
+    -------
+    keys: `np.ndarray`
+        The ``uint64`` event keys.
+    """
+    keys = events["coarse_time"].astype(np.uint64) << np.uint64(16)
+    keys |= events["fine_time"].astype(np.uint64)
+    return keys
+
+
+def sort_events(events: np.ndarray) -> np.ndarray:
+    """
+    Return the events sorted by time, events of equal time keep their order.
+
+    Parameters
+    ----------
+    events: `np.ndarray`
+        An event table, see `EVENT_DTYPE`.
+
+    Returns
+    -------
+    events: `np.ndarray`
+        The sorted event table, ``events`` itself if it is already sorted.
+    """
+    keys = event_keys(events)
+    if np.all(keys[1:] >= keys[:-1]):
+        return events
+    return events[np.argsort(keys, kind="stable")]
+
+
+def _read_uint(file_bytes, starts, num_bytes, valid, byteorder="little"):
+    """
+    Read one unsigned integer at each of ``starts``, zero where not ``valid``.
+    """
+    byte_index = np.where(valid, starts, 0)[:, None] + np.arange(num_bytes)
+    fields = np.zeros(byte_index.shape, dtype=np.uint64)
+    fields[valid] = file_bytes[byte_index[valid]]
+    shifts = 8 * np.arange(num_bytes, dtype=np.uint64)
+    if byteorder == "big":
+        shifts = shifts[::-1]
+    # At most 6 bytes are read, the values fit in a signed 64 bit integer
+    return np.bitwise_or.reduce(fields << shifts, axis=1).astype(np.int64)
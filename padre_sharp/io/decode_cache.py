@@ -0,0 +1,250 @@
+"""
+This module provides an on-disk cache of the decoded tables of raw files.
+
+Decoding is the most expensive step repeated when a raw file is processed
+again, e.g. after a change of the l1 calibration. The ``events`` and ``packets``
+tables decoded from a raw file (see `~padre_sharp.io.decode.decode_packets`)
+are saved as ``.npy`` files in the cache directory (see
+`~padre_sharp.util.config.get_and_create_cache_dir`) and loaded memory mapped
+later on.
+
+An entry is named by the content hash of the raw file and
+`~padre_sharp.io.decode.DECODER_VERSION`, so a renamed or copied file still hits
+and a new decoder never reads stale tables. The cache is bounded in size, the
+least recently used entries are removed when it grows beyond its limit (see
+`~padre_sharp.util.config.get_decode_cache_size`).
+
+Worker processes can share the cache without locks. An entry is written into a
+temporary directory and renamed into place, and is renamed away before it is
+removed, so readers see a whole entry or none. Tables already memory mapped
+stay readable after their entry is removed.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from padre_sharp import log
+from padre_sharp.io import decode
+from padre_sharp.util import config, packets
+
+__all__ = ["DECODE_CACHE_DIRNAME", "TABLE_NAMES", "DecodeCache"]
+
+#: Name of the decode cache directory in the cache directory
+DECODE_CACHE_DIRNAME = "decoded"
+
+#: The decoded tables saved in an entry
+TABLE_NAMES = ("events", "packets")
+
+#: Age in seconds after which a temporary directory of a writer is abandoned
+TMP_MAX_AGE = 60 * 60.0
+
+
+class DecodeCache:
+    """
+    A size bounded, content addressed cache of decoded raw files.
+
+    Parameters
+    ----------
+    path: Path, optional
+        The cache directory. Defaults to the ``decoded`` directory in
+        `~padre_sharp.util.config.get_and_create_cache_dir`.
+    max_size: int, optional
+        The size limit of the cache in bytes. Defaults to
+        `~padre_sharp.util.config.get_decode_cache_size`.
+
+    Examples
+    --------
+    >>> data = DecodeCache().decode_file("PADRESP13_250503042550.DAT")  # doctest: +SKIP
+    """
+
+    def __init__(self, path: Path = None, max_size: int = None) -> None:
+        if path is None:
+            path = config.get_and_create_cache_dir() / DECODE_CACHE_DIRNAME
+        if max_size is None:
+            max_size = config.get_decode_cache_size()
+        self.path = Path(path)
+        self.max_size = max_size
+
+    def key(self, packet_view: packets.PacketView) -> str:
+        """
+        Return the key of the entry of decoded packets.
+        """
+        return f"{packet_view.content_hash}-v{decode.DECODER_VERSION}"
+
+    def decode_file(self, data_filename: Path) -> Dict[str, np.ndarray]:
+        """
+        Decode a raw file, or load its decoded tables from the cache.
+
+        Parameters
+        ----------
+        data_filename: Path
+            A raw file.
+
+        Returns
+        -------
+        `dict`
+            The event and packet tables, see
+            `~padre_sharp.io.decode.decode_packets`. Tables loaded from the
+            cache are copy-on-write memory maps, changes are not saved.
+        """
+        packet_view = packets.open_packets(data_filename)
+        key = self.key(packet_view)
+        data = self.get(key)
+        if data is not None:
+            log.debug(f"Loaded the decoded tables of {data_filename} from the cache.")
+            return data
+        data = decode.decode_packets(packet_view)
+        self.put(key, data)
+        return data
+
+    def get(self, key: str) -> Dict[str, np.ndarray]:
+        """
+        Return the tables of an entry, None if it is not in the cache.
+
+        The entry becomes the most recently used.
+        """
+        entry = self.path / key
+        try:
+            data = {
+                name: np.load(entry / f"{name}.npy", mmap_mode="c")
+                for name in TABLE_NAMES
+            }
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning(f"Removing unreadable decode cache entry {entry}: {e}")
+            self._remove(entry)
+            return None
+        return data
+
+    def put(self, key: str, data: Dict[str, np.ndarray]) -> None:
+        """
+        Add the tables of an entry, then remove the least recently used entries
+        beyond the size limit.
+        """
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.path))
+            for name in TABLE_NAMES:
+                np.save(tmp_dir / f"{name}.npy", data[name])
+            try:
+                os.rename(tmp_dir, self.path / key)
+            except OSError:
+                # Added by another process in the meantime
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except OSError as e:
+            log.warning(f"Could not add {key} to the decode cache: {e}")
+            return
+        self.evict(keep=key)
+
+    def entries(self) -> List[os.DirEntry]:
+        """
+        Return the entries of the cache, least recently used first.
+        """
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.path)
+                if entry.is_dir() and not entry.name.startswith(".")
+            ]
+        except FileNotFoundError:
+            return []
+        return sorted(entries, key=_mtime)
+
+    def size(self) -> int:
+        """
+        Return the size of the cache in bytes.
+        """
+        return sum(_entry_size(entry.path) for entry in self.entries())
+
+    def evict(self, max_size: int = None, keep: str = None) -> List[str]:
+        """
+        Remove the least recently used entries until the cache fits in a size.
+
+        Parameters
+        ----------
+        max_size: int, optional
+            The size in bytes, defaults to ``self.max_size``.
+        keep: str, optional
+            The key of an entry to keep whatever its size.
+
+        Returns
+        -------
+        removed: list
+            The keys of the removed entries.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.entries()
+        sizes = [_entry_size(entry.path) for entry in entries]
+        total = sum(sizes)
+        removed = []
+        for entry, size in zip(entries, sizes):
+            if total <= max_size:
+                break
+            if entry.name == keep:
+                continue
+            if self._remove(Path(entry.path)):
+                removed.append(entry.name)
+            total -= size
+        if removed:
+            log.debug(f"Removed {len(removed)} entries from the decode cache.")
+        self._remove_abandoned()
+        return removed
+
+    def clear(self) -> None:
+        """
+        Remove every entry.
+        """
+        self.evict(max_size=0)
+
+    def _remove(self, entry: Path) -> bool:
+        """
+        Remove an entry, returning False if another process removed it first.
+        """
+        # Out of sight of readers first, the rename succeeds in one process only
+        trash = entry.with_name(f".removed-{entry.name}-{os.getpid()}")
+        try:
+            os.rename(entry, trash)
+        except OSError:
+            return False
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def _remove_abandoned(self) -> None:
+        """
+        Remove the temporary directories of writers that died.
+        """
+        try:
+            hidden = [
+                entry for entry in os.scandir(self.path) if entry.name.startswith(".")
+            ]
+        except FileNotFoundError:
+            return
+        now = time.time()
+        for entry in hidden:
+            if now - _mtime(entry) > TMP_MAX_AGE:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _mtime(entry: os.DirEntry) -> float:
+    try:
+        return entry.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _entry_size(path: str) -> int:
+    """
+    Return the size in bytes of the files of an entry.
+    """
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path))
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,380 @@
+"""
+A module to merge the packets of raw files that were received more than once.
+
+The same packets often arrive in several raw files, from repeated passes or
+several ground stations. Every packet of a batch of raw files is fingerprinted
+by its primary header fields, its coarse time and a hash of its payload (see
+`~padre_sharp.util.packets.packet_hashes`), all computed in bulk. Packets of
+equal fingerprint are kept once, and the unique packets are put in time and
+sequence order into a single stream that can be decoded like one raw file, so
+that decoding scales with the unique packets rather than the received ones.
+
+Only files that overlap in time can share packets, `group_raw_files` groups a
+batch of raw files by the time range of their packets so that each group is
+merged on its own. The instrument clock restarts at every power cycle, so the
+coarse times of a file are put on a common time line with the clock epoch of
+the file, derived from the time in its filename and its first coarse time (see
+`~padre_sharp.util.time_conversion.clock_epoch`).
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+
+from padre_sharp import log
+from padre_sharp.io import decode, staging
+from padre_sharp.util import packets, time_conversion
+from padre_sharp.util.lazy import LazyModule
+
+# swxsoc is slow to import, it is imported on first use
+util = LazyModule("swxsoc.util.util")
+
+__all__ = [
+    "FINGERPRINT_DTYPE",
+    "PacketStream",
+    "fingerprint_packets",
+    "deduplicate_packets",
+    "group_raw_files",
+    "merge_raw_files",
+]
+
+#: Structured dtype of a packet fingerprint, equal for copies of a packet
+FINGERPRINT_DTYPE = np.dtype(
+    [
+        ("coarse_time", np.int64),
+        ("apid", np.uint16),
+        ("sequence_count", np.uint16),
+        ("length", np.int64),
+        ("payload_hash", np.uint64),
+    ]
+)
+
+#: Modulus of the CCSDS packet sequence count
+SEQUENCE_COUNT_MODULUS = 2**14
+
+
+@dataclass
+class PacketStream:
+    """
+    The unique packets of several raw files, in time and sequence order.
+
+    Attributes
+    ----------
+    view: `~padre_sharp.util.packets.PacketView`
+        The unique packets, copied into one buffer.
+    sources: list
+        The raw files the packets were read from.
+    source_index: `np.ndarray`
+        The index in ``sources`` of the file of each packet of ``view``.
+    packet_index: `np.ndarray`
+        The index of each packet of ``view`` in its file.
+    num_received: int
+        The number of packets in all the files, duplicates included.
+    """
+
+    view: packets.PacketView
+    sources: List[Path]
+    source_index: np.ndarray
+    packet_index: np.ndarray
+    num_received: int
+
+    @property
+    def num_duplicates(self) -> int:
+        return self.num_received - len(self.view)
+
+
+def fingerprint_packets(packet_view: packets.PacketView) -> np.ndarray:
+    """
+    Fingerprint every packet of a view.
+
+    Parameters
+    ----------
+    packet_view: `~padre_sharp.util.packets.PacketView`
+        The packets.
+
+    Returns
+    -------
+    fingerprints: `np.ndarray`
+        A table of dtype `FINGERPRINT_DTYPE` with one row per packet.
+    """
+    headers = packet_view.headers
+    fingerprints = np.empty(len(headers), dtype=FINGERPRINT_DTYPE)
+    fingerprints["coarse_time"] = decode.read_coarse_times(
+        packet_view.file_bytes, headers
+    )
+    fingerprints["apid"] = headers["apid"]
+    fingerprints["sequence_count"] = headers["sequence_count"]
+    fingerprints["length"] = headers["length"]
+    fingerprints["payload_hash"] = packet_view.hashes
+    return fingerprints
+
+
+def deduplicate_packets(data_filenames: Iterable[Path]) -> PacketStream:
+    """
+    Merge the packets of raw files into one stream without duplicates.
+
+    The packets are ordered by time, APID and sequence count, a sequence count
+    that wraps around within a second is ordered after the wrap. The time of a
+    packet is its coarse time moved onto the clock of the earliest clock epoch
+    of the files, so that the packets of different power cycles are not
+    interleaved. Of the copies of a packet the one of the earliest file in
+    ``data_filenames`` is kept.
+
+    Parameters
+    ----------
+    data_filenames: list
+        The raw files, see `~padre_sharp.util.packets.open_packets`.
+
+    Returns
+    -------
+    `PacketStream`
+    """
+    sources = [Path(data_filename) for data_filename in data_filenames]
+    views = [packets.open_packets(source) for source in sources]
+    fingerprints = [fingerprint_packets(view) for view in views]
+    # On the clock of the earliest epoch, whole seconds apart
+    epochs_tai = [
+        _epoch_tai(source, fingerprint["coarse_time"])
+        for source, fingerprint in zip(sources, fingerprints)
+    ]
+    known = [epoch_tai for epoch_tai in epochs_tai if epoch_tai is not None]
+    for fingerprint, epoch_tai in zip(fingerprints, epochs_tai):
+        if epoch_tai is not None:
+            fingerprint["coarse_time"] += (
+                epoch_tai - min(known)
+            ) // time_conversion.NS_PER_S
+    fingerprints = np.concatenate(fingerprints + [np.empty(0, dtype=FINGERPRINT_DTYPE)])
+    source_index = np.repeat(
+        np.arange(len(views), dtype=np.int64), [len(view) for view in views]
+    )
+    packet_index = np.concatenate(
+        [np.arange(len(view), dtype=np.int64) for view in views]
+        + [np.empty(0, dtype=np.int64)]
+    )
+
+    # Stable, so the copy of the earliest file comes first among equal packets
+    order = np.lexsort(
+        (
+            fingerprints["payload_hash"],
+            fingerprints["length"],
+            _unwrapped_sequence_counts(fingerprints),
+            fingerprints["apid"],
+            fingerprints["coarse_time"],
+        )
+    )
+    fingerprints = fingerprints[order]
+    unique = np.concatenate([[True], fingerprints[1:] != fingerprints[:-1]])
+    order = order[unique[: len(order)]]
+
+    stream = PacketStream(
+        view=_gather_packets(views, source_index[order], packet_index[order]),
+        sources=sources,
+        source_index=source_index[order],
+        packet_index=packet_index[order],
+        num_received=len(fingerprints),
+    )
+    log.info(
+        f"Kept {len(stream.view)} of {stream.num_received} packets from "
+        f"{len(sources)} files, {stream.num_duplicates} duplicates."
+    )
+    return stream
+
+
+def group_raw_files(data_filenames: Iterable[Path]) -> List[List[Path]]:
+    """
+    Group raw files whose packets overlap in time.
+
+    Two files are in the same group if the time ranges of their packets
+    overlap, directly or through other files of the group, so that all the
+    copies of a packet are in one group. The times are the coarse times on the
+    clock epoch of each file, so files of different power cycles whose coarse
+    times overlap are not grouped. A file without packets, or whose filename
+    has no time, is a group of its own.
+
+    Parameters
+    ----------
+    data_filenames: list
+        The raw files, see `~padre_sharp.util.packets.open_packets`.
+
+    Returns
+    -------
+    groups: list
+        The groups in time order, each a list of files in the order given.
+    """
+    data_filenames = [Path(data_filename) for data_filename in data_filenames]
+    spans = []
+    for data_filename in data_filenames:
+        view = packets.open_packets(data_filename)
+        coarse_times = decode.read_coarse_times(view.file_bytes, view.headers)
+        epoch_tai = _epoch_tai(data_filename, coarse_times)
+        if epoch_tai is None:
+            spans.append(None)
+        else:
+            spans.append(
+                (
+                    epoch_tai + int(coarse_times.min()) * time_conversion.NS_PER_S,
+                    epoch_tai + int(coarse_times.max()) * time_conversion.NS_PER_S,
+                )
+            )
+
+    groups = []
+    end = None
+    order = sorted(
+        range(len(data_filenames)), key=lambda i: (spans[i] is not None, spans[i])
+    )
+    for i in order:
+        if spans[i] is None or end is None or spans[i][0] > end:
+            groups.append([])
+            end = None
+        groups[-1].append(i)
+        if spans[i] is not None:
+            end = spans[i][1] if end is None else max(end, spans[i][1])
+    return [[data_filenames[i] for i in sorted(group)] for group in groups]
+
+
+def merge_raw_files(data_filenames: Iterable[Path], output_dir: Path = None) -> Path:
+    """
+    Write the unique packets of raw files to one raw file.
+
+    The file is named after the earliest input file, see `deduplicate_packets`.
+    The files must be of one power cycle, a raw file has one clock epoch.
+
+    Parameters
+    ----------
+    data_filenames: list
+        The raw files.
+    output_dir: Path, optional
+        The directory to publish the file to, see
+        `~padre_sharp.io.staging.ScratchDirectory`. It must not hold any of the
+        input files.
+
+    Returns
+    -------
+    output_filename: Path
+        The merged raw file.
+    """
+    data_filenames = [Path(data_filename) for data_filename in data_filenames]
+    if not data_filenames:
+        raise ValueError("No raw files to merge.")
+    first = min(
+        data_filenames,
+        key=lambda name: util.parse_science_filename(name)["time"],
+    )
+    with staging.ScratchDirectory(output_dir) as scratch:
+        output_filename = scratch.output_dir / first.name
+        if any(
+            output_filename.resolve() == data_filename.resolve()
+            for data_filename in data_filenames
+        ):
+            raise ValueError(f"Merging would overwrite the input {output_filename}.")
+        epochs = set()
+        for data_filename in data_filenames:
+            view = packets.open_packets(data_filename)
+            epoch_tai = _epoch_tai(
+                data_filename, decode.read_coarse_times(view.file_bytes, view.headers)
+            )
+            if epoch_tai is not None:
+                epochs.add(epoch_tai)
+        if len(epochs) > 1:
+            raise ValueError(
+                "The raw files are from different power cycles of the instrument, "
+                "their packets cannot be merged into one raw file."
+            )
+        stream = deduplicate_packets(data_filenames)
+        scratch_filename = scratch.path / first.name
+        stream.view.file_bytes.tofile(scratch_filename)
+        return scratch.publish(scratch_filename)
+
+
+def _epoch_tai(data_filename: Path, coarse_times: np.ndarray) -> int:
+    """
+    Return the TAI nanoseconds of the clock epoch of a raw file, None if it has
+    no packets or its filename has no time.
+    """
+    if not len(coarse_times):
+        return None
+    try:
+        time = util.parse_science_filename(Path(data_filename).name)["time"]
+    except Exception:
+        return None
+    epoch = time_conversion.clock_epoch(time, int(coarse_times.min()))
+    return int(time_conversion.spacecraft_to_tai(epoch, 0))
+
+
+def _unwrapped_sequence_counts(fingerprints: np.ndarray) -> np.ndarray:
+    """
+    Return sequence counts that order the packets of each second and APID.
+
+    The counts of a second that spans the wrap around of the counter are
+    shifted by half the modulus, so those before the wrap come first.
+    """
+    order = np.lexsort(
+        (
+            fingerprints["sequence_count"],
+            fingerprints["apid"],
+            fingerprints["coarse_time"],
+        )
+    )
+    ordered = fingerprints[order]
+    sequence_counts = ordered["sequence_count"].astype(np.int64)
+    group_start = np.flatnonzero(
+        np.concatenate(
+            [
+                [True],
+                (ordered["coarse_time"][1:] != ordered["coarse_time"][:-1])
+                | (ordered["apid"][1:] != ordered["apid"][:-1]),
+            ]
+        )[: len(ordered)]
+    )
+    group_sizes = np.diff(group_start, append=len(ordered))
+    group_end = group_start + group_sizes - 1
+    # Sorted counts, a group spanning more than half of them has wrapped
+    wrapped = sequence_counts[group_end] - sequence_counts[group_start]
+    wrapped = np.repeat(wrapped >= SEQUENCE_COUNT_MODULUS // 2, group_sizes)
+    shifted = (sequence_counts + SEQUENCE_COUNT_MODULUS // 2) % SEQUENCE_COUNT_MODULUS
+    unwrapped = np.empty(len(ordered), dtype=np.int64)
+    unwrapped[order] = np.where(wrapped, shifted, sequence_counts)
+    return unwrapped
+
+
+def _gather_packets(
+    views: List[packets.PacketView],
+    source_index: np.ndarray,
+    packet_index: np.ndarray,
+) -> packets.PacketView:
+    """
+    Copy packets of several views into the buffer of a new view.
+    """
+    headers = np.concatenate(
+        [views[i].headers[packet_index[source_index == i]] for i in range(len(views))]
+        + [np.empty(0, dtype=packets.HEADER_DTYPE)]
+    )
+    # Back to the given order, the per-view selections above are grouped by view
+    group_order = np.argsort(source_index, kind="stable")
+    headers[group_order] = headers.copy()
+    source_offsets = headers["offset"].copy()
+    headers["offset"] = np.cumsum(headers["length"]) - headers["length"]
+    file_bytes = np.empty(int(headers["length"].sum()), dtype=np.uint8)
+
+    # Packets that follow each other in both a file and the stream are copied
+    # in one slice, a whole file at once when it has no duplicates
+    run_start = np.flatnonzero(
+        np.concatenate(
+            [
+                [True],
+                (source_index[1:] != source_index[:-1])
+                | (packet_index[1:] != packet_index[:-1] + 1),
+            ]
+        )[: len(headers)]
+    )
+    run_end = np.append(run_start[1:], len(headers)) - 1
+    for start, end in zip(run_start, run_end):
+        num_bytes = headers["offset"][end] + headers["length"][end]
+        num_bytes -= headers["offset"][start]
+        source = source_offsets[start]
+        file_bytes[headers["offset"][start] :][:num_bytes] = views[
+            source_index[start]
+        ].file_bytes[source : source + num_bytes]
+    return packets.PacketView(file_bytes, headers=headers)
@@ -1,24 +1,484 @@
 """
 This module provides a generic file reader.
+
+`read_file` opens raw files and the FITS products of the pipeline alike, as a
+`Dataset` of lazily read, memory mapped tables that can also be streamed a
+chunk of rows at a time.
+
+Event lists can be read for a time range only. The time sorted event table of
+an l1 event list file is indexed by the event time of every `INDEX_STRIDE`-th
+row, a query binary searches this index and reads only the rows it needs from
+the memory mapped file. The index is kept in a sidecar file in the cache
+directory, so its cost is paid once per file.
 """
 
-__all__ = ["read_file"]
+import os
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Tuple, Union
+
+import numpy as np
+from astropy.io import fits
+from astropy.table import Table
+
+from padre_sharp import log
+from padre_sharp.io import decode, decode_cache
+from padre_sharp.util import packets, sidecar
+from padre_sharp.util.lazy import LazyModule
+
+# swxsoc is slow to import, it is imported on first use
+util = LazyModule("swxsoc.util.util")
+
+__all__ = [
+    "RAW_SUFFIXES",
+    "INDEX_STRIDE",
+    "Dataset",
+    "TimeIndex",
+    "get_time_index",
+    "read_file",
+]
+
+#: Suffixes of raw files
+RAW_SUFFIXES = [".bin", ".dat"]
+
+#: Number of event rows per entry of a time index
+INDEX_STRIDE = 4096
+
+#: Version of the time index sidecar format
+INDEX_VERSION = 1
+
+
+@dataclass
+class TimeIndex:
+    """
+    A sparse index of a time sorted event table.
+
+    Attributes
+    ----------
+    keys: `np.ndarray`
+        The event key (see `~padre_sharp.io.decode.event_keys`) of the rows
+        ``0, stride, 2 * stride, ...``.
+    num_rows: int
+        The number of rows of the event table.
+    stride: int
+        The number of rows between two index entries.
+    """
+
+    keys: np.ndarray
+    num_rows: int
+    stride: int = INDEX_STRIDE
+
+    @classmethod
+    def from_events(cls, events, stride: int = INDEX_STRIDE) -> "TimeIndex":
+        """
+        Index an event table, reading only the indexed rows.
+
+        Parameters
+        ----------
+        events: `np.ndarray`
+            A time sorted event table, may be a memory mapped FITS table.
+        stride: int, optional
+            The number of rows between two index entries.
+        """
+        num_rows = 0 if events is None else len(events)
+        keys = decode.event_keys(events[::stride]) if num_rows else np.empty(0, "u8")
+        return cls(keys, num_rows, stride)
+
+    def row_window(self, key: int) -> Tuple[int, int]:
+        """
+        Return the rows between which the first event at or after ``key`` is.
+        """
+        i = int(np.searchsorted(self.keys, key, side="left"))
+        return max(i - 1, 0) * self.stride, min(i * self.stride, self.num_rows)
+
+    def find_row(self, events, key: int) -> int:
+        """
+        Return the first row of an event table whose key is at least ``key``.
+
+        Parameters
+        ----------
+        events: `np.ndarray`
+            The indexed event table.
+        key: int
+            An event key.
+        """
+        start, stop = self.row_window(key)
+        window_keys = decode.event_keys(events[start:stop])
+        return start + int(np.searchsorted(window_keys, key, side="left"))
+
+
+def get_time_index(data_filename: Path, events=None) -> TimeIndex:
+    """
+    Return the time index of an event list file.
+
+    The index is loaded from its sidecar file in the cache directory (see
+    `~padre_sharp.util.config.get_and_create_cache_dir`) while the size and
+    modification time of the file are unchanged, otherwise it is built and
+    saved.
+
+    Parameters
+    ----------
+    data_filename: Path
+        A file with a time sorted ``EVENTS`` table.
+    events: `np.ndarray`, optional
+        The event table of the file, if already open.
+
+    Returns
+    -------
+    `TimeIndex`
+    """
+    path = Path(data_filename).resolve()
+    stat = path.stat()
+    sidecar_file = sidecar.sidecar_path(path, "time_index")
+    index = _load_index(sidecar_file, stat)
+    if index is None:
+        if events is None:
+            with fits.open(path, memmap=True) as hdul:
+                index = TimeIndex.from_events(hdul["EVENTS"].data)
+        else:
+            index = TimeIndex.from_events(events)
+        _save_index(sidecar_file, index, stat)
+    return index
+
+
+class Dataset(Mapping):
+    """
+    The tables of a data file, read lazily.
+
+    A dataset maps table names to tables, like
+    `~padre_sharp.calibration.DataProduct.data`. Nothing is read when it is
+    created. A FITS product is memory mapped when a table is first accessed, a
+    table is a `~astropy.io.fits.FITS_rec` view of the file: slicing rows does
+    not copy, and a column is a view of the memory map unless it is stored with
+    an offset, such as unsigned integers, when only the rows sliced are
+    converted. The packets of a raw file are memory mapped and decoded in bulk
+    when a table is first accessed, see `~padre_sharp.io.decode.decode_packets`,
+    into the ``events`` and ``packets`` tables of an l0 event list, or loaded
+    memory mapped from the decode cache, see
+    `~padre_sharp.io.decode_cache.DecodeCache`.
+
+    Use `iter_chunks` to stream the tables of a file of any size in constant
+    memory.
+
+    Parameters
+    ----------
+    data_filename: Path
+        A raw file or a FITS file named by
+        `~swxsoc.util.util.create_science_filename`.
+    time_range: tuple, optional
+        The start and end (exclusive) of the events to read, in seconds of the
+        instrument clock (see `~padre_sharp.io.decode.event_times`). The dataset
+        then only holds the ``events`` table, and for an l1 or later event list
+        only the rows in the range are read from disk.
+
+    Attributes
+    ----------
+    filename: Path
+        The file.
+    format: str
+        ``"raw"`` or ``"fits"``.
+    level: str
+        The data level in the filename, None if it cannot be parsed.
+    """
+
+    def __init__(
+        self, data_filename: Path, time_range: Tuple[float, float] = None
+    ) -> None:
+        self.filename = Path(data_filename)
+        self.format = "raw" if self.filename.suffix.lower() in RAW_SUFFIXES else "fits"
+        try:
+            self.level = util.parse_science_filename(self.filename)["level"]
+        except ValueError:
+            self.level = None
+        self.time_range = time_range
+        self._hdul = None
+        self._decoded = None
+        self._rows = None
+
+    def __repr__(self) -> str:
+        return f"<Dataset {self.filename} ({self.format}, {self.level})>"
+
+    def __enter__(self) -> "Dataset":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the memory map of a FITS file, the tables read become invalid.
+        """
+        if self._hdul is not None:
+            self._hdul.close()
+            self._hdul = None
 
+    def __iter__(self) -> Iterator[str]:
+        if self.time_range is not None:
+            return iter(["events"])
+        if self.format == "raw":
+            return iter(["events", "packets"])
+        return iter([hdu.name.lower() for hdu in self._open()[1:]])
 
-def read_file(data_filename):
+    def __len__(self) -> int:
+        return len(list(iter(self)))
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in list(iter(self)):
+            raise KeyError(name)
+        if self.format == "raw":
+            table = self._decode()[name]
+        else:
+            table = self._fits_table(name)
+        if self.time_range is None:
+            return table
+        if self._rows is None:
+            self._rows = self._event_rows(table)
+        return table[self._rows]
+
+    def num_rows(self, name: str = "events") -> int:
+        """
+        Return the number of rows of a table.
+        """
+        if self.format == "fits" and self.time_range is None:
+            # From the header, without mapping the table
+            return self._open()[name.upper()].header["NAXIS2"]
+        return len(self[name])
+
+    def read(self, name: str) -> np.ndarray:
+        """
+        Read a whole table into memory.
+
+        Returns
+        -------
+        table: `np.ndarray`
+            A structured array of native byte order, e.g. of dtype
+            `~padre_sharp.io.decode.EVENT_DTYPE` for an event table.
+        """
+        return _to_array(self[name])
+
+    def iter_chunks(self, n_rows: int, name: str = "events") -> Iterator[np.ndarray]:
+        """
+        Read a table ``n_rows`` rows at a time.
+
+        Only one chunk is held in memory at a time, the packets of a raw file
+        are decoded a few at a time.
+
+        Parameters
+        ----------
+        n_rows: int
+            The number of rows of each chunk, the last one may have fewer.
+        name: str, optional
+            The table to read.
+
+        Yields
+        ------
+        chunk: `np.ndarray`
+            The rows, as returned by `read`.
+        """
+        if n_rows < 1:
+            raise ValueError(f"Cannot read chunks of {n_rows} rows.")
+        if self.format == "raw" and self.time_range is None:
+            yield from _rechunk(_iter_decoded(self.filename, n_rows, name), n_rows)
+            return
+        table = self[name]
+        for start in range(0, len(table), n_rows):
+            yield _to_array(table[start : start + n_rows])
+
+    def _open(self) -> fits.HDUList:
+        if self._hdul is None:
+            self._hdul = fits.open(self.filename, memmap=True)
+        return self._hdul
+
+    def _decode(self) -> Dict[str, np.ndarray]:
+        if self._decoded is None:
+            self._decoded = decode_cache.DecodeCache().decode_file(self.filename)
+        return self._decoded
+
+    def _fits_table(self, name: str) -> np.ndarray:
+        hdu = self._open()[name.upper()]
+        if hdu.data is None:
+            # A table without rows has no data to map
+            if name == "events":
+                return np.empty(0, dtype=decode.EVENT_DTYPE)
+            return Table.read(hdu, mask_invalid=False).as_array()
+        return hdu.data
+
+    def _event_rows(self, events) -> Union[slice, np.ndarray]:
+        """
+        Return the rows of the event table in the time range.
+        """
+        start_key, end_key = (_time_key(time) for time in self.time_range)
+        if self.format == "fits" and _is_time_sorted(self.filename):
+            index = get_time_index(self.filename, events)
+            start = index.find_row(events, start_key)
+            stop = max(index.find_row(events, end_key), start)
+            log.debug(f"Reading rows {start} to {stop} of {self.filename}.")
+            return slice(start, stop)
+        # Unsorted, every event is read
+        keys = decode.event_keys(events)
+        return np.flatnonzero((keys >= start_key) & (keys < end_key))
+
+
+def read_file(data_filename: Path, time_range: Tuple[float, float] = None) -> Dataset:
     """
-    Read a file.
+    Open a raw or FITS data file for reading.
+
+    The format is chosen by the file extension, ``.fits`` for the products of
+    the pipeline and ``.dat`` or ``.bin`` for raw files, the level is read from
+    the filename. Nothing is read until a table is accessed, see `Dataset`.
 
     Parameters
     ----------
     data_filename: str
         A file to read.
+    time_range: tuple, optional
+        The start and end (exclusive) of the events to read, in seconds of the
+        instrument clock (see `~padre_sharp.io.decode.event_times`).
 
     Returns
     -------
-    data: str
+    dataset: `Dataset`
+        The tables of the file, None for a missing file or another format. An
+        empty file has no tables.
 
     Examples
     --------
+    >>> dataset = read_file("padre_sharp_l1_eventlist_20250503T042550_v0.0.0.fits",
+    ...                     time_range=(969, 999))  # doctest: +SKIP
+    >>> dataset["events"]["energy"]  # doctest: +SKIP
+    array([...], dtype='>f4')
+    >>> for events in dataset.iter_chunks(100_000):  # doctest: +SKIP
+    ...     ...
+    """
+    data_filename = Path(data_filename)
+    if (
+        data_filename.suffix.lower() not in [".fits"] + RAW_SUFFIXES
+        or not data_filename.exists()
+    ):
+        return None
+    if data_filename.stat().st_size == 0:
+        return _EmptyDataset(data_filename)
+    return Dataset(data_filename, time_range=time_range)
+
+
+def _time_key(time: float) -> np.uint64:
+    """
+    Return the smallest event key at or after a time in seconds.
+    """
+    max_key = np.iinfo(np.uint64).max
+    if not time < max_key / decode.FINE_TIME_PER_COARSE_TIME:
+        return np.uint64(max_key)
+    return np.uint64(np.ceil(max(time, 0) * decode.FINE_TIME_PER_COARSE_TIME))
+
+
+def _is_time_sorted(data_filename: Path) -> bool:
+    """
+    Whether the event table of a file is time sorted, true from level l1 on.
+    """
+    try:
+        level = util.parse_science_filename(data_filename)["level"]
+    except ValueError:
+        return False
+    return level not in ["raw", "l0"]
+
+
+class _EmptyDataset(Dataset):
+    """
+    The dataset of an empty file, which has no tables.
+    """
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([])
+
+
+def _to_array(rows) -> np.ndarray:
+    """
+    Copy rows of a table into a structured array of native byte order.
+    """
+    columns = {name: rows[name] for name in rows.dtype.names}
+    dtype = [
+        (name, column.dtype.newbyteorder("="), column.shape[1:])
+        for name, column in columns.items()
+    ]
+    table = np.empty(len(rows), dtype=dtype)
+    for name, column in columns.items():
+        table[name] = column
+    return table
+
+
+def _iter_decoded(data_filename: Path, n_rows: int, name: str) -> Iterator[np.ndarray]:
+    """
+    Decode the science packets of a raw file a group at a time, each group
+    holding at most about ``n_rows`` events.
+    """
+    view = packets.open_packets(data_filename)
+    headers = view.headers[view.headers["apid"] == decode.SCIENCE_APID]
+    # An upper bound of the number of events of each packet
+    max_events = np.maximum(headers["length"] // decode.EVENT_RECORD_DTYPE.itemsize, 1)
+    group_ends = np.cumsum(max_events)
+    first = num_events = 0
+    while first < len(headers):
+        last = np.searchsorted(
+            group_ends, group_ends[first] - max_events[first] + n_rows, side="right"
+        )
+        last = max(int(last), first + 1)
+        group = headers[first:last].copy()
+        start, end = group["offset"][0], group["offset"][-1] + group["length"][-1]
+        group["offset"] -= start
+        data = decode.decode_packets(
+            packets.PacketView(view.file_bytes[start:end], headers=group)
+        )
+        # Rows of the whole file
+        data["events"]["packet_index"] += first
+        data["packets"]["first_event"] += num_events
+        num_events += len(data["events"])
+        first = last
+        yield data[name]
+
+
+def _rechunk(tables: Iterator[np.ndarray], n_rows: int) -> Iterator[np.ndarray]:
+    """
+    Regroup the rows of tables into chunks of ``n_rows`` rows.
+    """
+    buffer = []
+    num_buffered = 0
+    for table in tables:
+        buffer.append(table)
+        num_buffered += len(table)
+        if num_buffered < n_rows:
+            continue
+        rows = np.concatenate(buffer)
+        stop = len(rows) - len(rows) % n_rows
+        for start in range(0, stop, n_rows):
+            yield rows[start : start + n_rows]
+        buffer = [rows[stop:]]
+        num_buffered = len(rows) - stop
+    if num_buffered:
+        yield np.concatenate(buffer)
+
+
+def _load_index(sidecar_file: Path, stat: os.stat_result) -> TimeIndex:
+    """
+    Load a time index, returning None if it is missing or stale.
+    """
+    index = sidecar.load_sidecar(
+        sidecar_file, INDEX_VERSION, stat, ["keys", "num_rows", "stride"]
+    )
+    if index is None:
+        return None
+    return TimeIndex(index["keys"], int(index["num_rows"]), int(index["stride"]))
+
+
+def _save_index(sidecar_file: Path, index: TimeIndex, stat: os.stat_result):
+    """
+    Atomically write a time index to its sidecar file.
     """
-    return None
+    sidecar.save_sidecar(
+        sidecar_file,
+        INDEX_VERSION,
+        stat,
+        keys=index.keys,
+        num_rows=index.num_rows,
+        stride=index.stride,
+    )
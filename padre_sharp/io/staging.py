@@ -0,0 +1,164 @@
+"""
+This module provides private scratch directories to stage output files in.
+
+Each pipeline run writes its files into its own scratch directory under the
+``.staging`` directory of the output directory and publishes each finished file
+with an atomic rename, so that concurrent runs writing files of the same name
+never see or publish a partly written file. The staging directory is on the
+same filesystem as the output directory, which a rename requires.
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+from padre_sharp import log
+from padre_sharp.util import config
+
+__all__ = [
+    "STAGING_DIRNAME",
+    "DEFAULT_MAX_AGE",
+    "ScratchDirectory",
+    "clean_stale_scratch",
+]
+
+#: Name of the directory holding the scratch directories in an output directory
+STAGING_DIRNAME = ".staging"
+
+#: Age in seconds after which a scratch directory is stale whatever its owner
+DEFAULT_MAX_AGE = 24 * 60 * 60.0
+
+
+class ScratchDirectory:
+    """
+    A private scratch directory to write output files into before publishing.
+
+    Used as a context manager, the scratch directory is created on entry and
+    removed with any file left unpublished on exit, also on an exception. Stale
+    scratch directories of other runs are removed on entry, see
+    `clean_stale_scratch`.
+
+    Parameters
+    ----------
+    output_dir: Path, optional
+        The directory to publish to. Defaults to
+        `~padre_sharp.util.config.get_and_create_output_dir`.
+    max_age: float, optional
+        The age in seconds after which the scratch directories of other runs are
+        removed.
+
+    Examples
+    --------
+    >>> with ScratchDirectory() as scratch:  # doctest: +SKIP
+    ...     output_filename = scratch.publish(product.write(scratch.path))
+    """
+
+    def __init__(self, output_dir: Path = None, max_age: float = DEFAULT_MAX_AGE):
+        if output_dir is None:
+            output_dir = config.get_and_create_output_dir()
+        self.output_dir = Path(output_dir)
+        self.max_age = max_age
+        self.path = None
+
+    def __enter__(self) -> "ScratchDirectory":
+        staging_dir = self.output_dir / STAGING_DIRNAME
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        clean_stale_scratch(self.output_dir, self.max_age)
+        # The owner is part of the name so that other runs can tell it is stale
+        self.path = Path(tempfile.mkdtemp(prefix=_owner_prefix(), dir=staging_dir))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.path = None
+
+    def publish(self, scratch_filename: Path) -> Path:
+        """
+        Move a finished file from the scratch directory to the output directory.
+
+        The file is flushed to disk and renamed over any file of the same name,
+        readers of the output directory see either the previous file or the
+        whole new one.
+
+        Parameters
+        ----------
+        scratch_filename: Path
+            A file in the scratch directory.
+
+        Returns
+        -------
+        output_filename: Path
+            The published file.
+        """
+        scratch_filename = Path(scratch_filename)
+        if scratch_filename.parent != self.path:
+            raise ValueError(f"{scratch_filename} is not in {self.path}.")
+        with open(scratch_filename, "rb") as fh:
+            os.fsync(fh.fileno())
+        output_filename = self.output_dir / scratch_filename.name
+        os.replace(scratch_filename, output_filename)
+        log.debug(f"Published {output_filename}.")
+        return output_filename
+
+
+def clean_stale_scratch(output_dir: Path, max_age: float = DEFAULT_MAX_AGE) -> list:
+    """
+    Remove the scratch directories left behind by runs that died.
+
+    A scratch directory is stale when the process that created it on this host
+    no longer exists, or when it was not modified for ``max_age`` seconds,
+    which also covers runs on other hosts sharing the output directory.
+
+    Parameters
+    ----------
+    output_dir: Path
+        The output directory.
+    max_age: float, optional
+        The age in seconds after which any scratch directory is stale.
+
+    Returns
+    -------
+    removed: list
+        The removed scratch directories.
+    """
+    staging_dir = Path(output_dir) / STAGING_DIRNAME
+    if not staging_dir.is_dir():
+        return []
+    removed = []
+    now = time.time()
+    for scratch_dir in staging_dir.iterdir():
+        try:
+            age = now - scratch_dir.stat().st_mtime
+        except FileNotFoundError:
+            # Removed by its owner or another run meanwhile
+            continue
+        if age > max_age or _owner_is_dead(scratch_dir.name):
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            log.info(f"Removed stale scratch directory {scratch_dir}.")
+            removed.append(scratch_dir)
+    return removed
+
+
+def _owner_prefix() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-"
+
+
+def _owner_is_dead(scratch_dirname: str) -> bool:
+    """
+    Whether the process that made a scratch directory on this host has exited.
+    """
+    # <host>-<pid>-<random>, the host name may contain dashes
+    host, _, pid = scratch_dirname.rpartition("-")[0].rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        # Exists but belongs to another user
+        return False
+    return False
@@ -0,0 +1,74 @@
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """Keep the package cache of every test out of the user's cache directory."""
+    cache_dir = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("SHARP_CACHEDIR", str(cache_dir))
+    return cache_dir
+
+
+@pytest.fixture(autouse=True)
+def resource_cache(monkeypatch):
+    """Give every test fresh process level resources, e.g. calibration registry."""
+    from padre_sharp.util import resources
+
+    monkeypatch.setattr(resources, "_resource_cache", None)
+
+
+def _write_log_config(config_dir):
+    """Write the configurations of padre_sharp and swxsoc to log to ``config_dir``."""
+    (config_dir / "configrc").write_text(
+        f"[logger]\nlog_file_path = {config_dir / 'padre_sharp.log'}\n"
+    )
+    # Without importing swxsoc, which sets up its logger
+    swxsoc_dir = Path(importlib.util.find_spec("swxsoc").origin).parent
+    default_config = swxsoc_dir / "data" / "config.yml"
+    config = yaml.safe_load(default_config.read_text())
+    config["logger"]["log_file_path"] = str(config_dir / "swxsoc.log")
+    (config_dir / "config.yml").write_text(yaml.safe_dump(config))
+
+
+def pytest_configure(config):
+    # Before padre_sharp or swxsoc set up their loggers, which open the log file
+    config.log_config_dir = Path(tempfile.mkdtemp(prefix="padre_sharp-log-"))
+    _write_log_config(config.log_config_dir)
+    os.environ["SHARP_CONFIGDIR"] = str(config.log_config_dir)
+    os.environ["SWXSOC_CONFIGDIR"] = str(config.log_config_dir)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(config.log_config_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def log_dir(tmp_path_factory, monkeypatch):
+    """Write the logs of every test and its subprocesses to a temporary directory."""
+    import padre_sharp
+
+    log_dir = tmp_path_factory.mktemp("log")
+    _write_log_config(log_dir)
+    monkeypatch.setenv("SHARP_CONFIGDIR", str(log_dir))
+    monkeypatch.setenv("SWXSOC_CONFIGDIR", str(log_dir))
+    padre_sharp.log.name
+    for name in ["padre_sharp", "swxsoc"]:
+        # Not getLogger, which would create the swxsoc logger before swxsoc does
+        logger = logging.root.manager.loggerDict.get(name)
+        for handler in list(getattr(logger, "handlers", [])):
+            if isinstance(handler, logging.FileHandler):
+                file_handler = logging.FileHandler(log_dir / f"{name}.log", delay=True)
+                file_handler.setLevel(handler.level)
+                file_handler.setFormatter(handler.formatter)
+                logger.removeHandler(handler)
+                handler.close()
+                logger.addHandler(file_handler)
+    return log_dir
@@ -0,0 +1,233 @@
+import signal
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import astropy.units as u
+from astropy.io import fits
+from astropy.time import Time
+
+from padre_sharp.calibration import accumulator, binning
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode
+
+ENERGY_EDGES = np.array([0.0, 2.0, 5.0, 10.0])
+#: Unix time of the first file
+START = float(Time("2025-05-01").unix)
+#: Grid covering the first two files
+TIME_RANGE = (START, START + 3700)
+
+
+def make_eventlist_file(output_dir, hour, num_events, seed=0):
+    """An event list of 100 s, its clock restarted at the start of the file."""
+    rng = np.random.default_rng(seed)
+    events = np.zeros(num_events, dtype=decode.EVENT_DTYPE)
+    events["coarse_time"] = np.sort(rng.integers(0, 100, num_events))
+    events["fine_time"] = rng.integers(0, 2**16, num_events)
+    events["energy"] = rng.uniform(-1, 11, num_events)
+    time = Time("2025-05-01") + hour * u.hour
+    product = DataProduct(
+        instrument="sharp",
+        time=time,
+        level="l1",
+        descriptor="eventlist",
+        data={"events": events},
+        epoch=time.strftime("%Y-%m-%dT%H:%M:%S.000000000"),
+    )
+    return product.write(output_dir), events
+
+
+def expected_counts(files, time_edges):
+    times = np.concatenate(
+        [
+            decode.event_times(events, fits.getval(filename, "CLKEPOCH"))
+            for filename, events in files
+        ]
+    )
+    values = np.concatenate([events["energy"] for _, events in files])
+    return np.histogram2d(times, values, [time_edges, ENERGY_EDGES])[0]
+
+
+def test_accumulate_files(tmp_path):
+    # The clock of each file restarts, their coarse times overlap
+    files = [make_eventlist_file(tmp_path, hour, 500, seed=hour) for hour in range(3)]
+    # The grid does not cover all of the events
+    acc = accumulator.SpectrogramAccumulator(
+        (START + 50, START + 7280), 10.0, ENERGY_EDGES, read_size=64
+    )
+    assert acc.add_files([filename for filename, _ in files]) == 1500
+    assert acc.num_events == 1500
+    expected = expected_counts(files, acc.time_edges)
+    np.testing.assert_array_equal(acc.counts, expected)
+    assert acc.num_outside == 1500 - expected.sum()
+    # Each file is in its own hour
+    for hour in range(3):
+        in_hour = (acc.time_edges[:-1] >= START + hour * 3600) & (
+            acc.time_edges[:-1] < START + hour * 3600 + 100
+        )
+        assert acc.counts[in_hour].sum() == expected[in_hour].sum() > 0
+    assert acc.counts.sum() == expected.sum()
+
+    product = acc.to_product()
+    assert product.filename == "padre_sharp_ql_spec_20250501T000000_v0.0.0.fits"
+    assert product.epoch == ""
+    table = product.data["spectrogram_10s"]
+    np.testing.assert_array_equal(table["counts"], expected)
+    np.testing.assert_array_equal(table["time"], acc.time_edges[:-1])
+
+
+def test_accumulate_resume(tmp_path):
+    files = [make_eventlist_file(tmp_path, hour, 1000, seed=hour) for hour in range(2)]
+    path = tmp_path / "accumulator"
+
+    class Interrupted(Exception):
+        pass
+
+    class InterruptedAccumulator(accumulator.SpectrogramAccumulator):
+        def add_events(self, events, epoch):
+            if self.num_events >= 1300:
+                raise Interrupted()
+            super().add_events(events, epoch)
+
+    acc = InterruptedAccumulator(
+        TIME_RANGE, 1.0, ENERGY_EDGES, path=path, read_size=100, checkpoint_interval=0
+    )
+    with pytest.raises(Interrupted):
+        acc.add_files([filename for filename, _ in files])
+    del acc
+
+    acc = accumulator.SpectrogramAccumulator(
+        TIME_RANGE, 1.0, ENERGY_EDGES, path=path, read_size=100
+    )
+    assert acc.num_events == 1300
+    # The first file is skipped, the second continues where it stopped
+    assert acc.add_files([filename for filename, _ in files]) == 700
+    expected = expected_counts(files, acc.time_edges)
+    np.testing.assert_array_equal(acc.counts, expected)
+    assert isinstance(acc._counts, np.memmap)
+
+
+def test_accumulate_resume_mismatch(tmp_path):
+    filename, _ = make_eventlist_file(tmp_path, 0, 10)
+    path = tmp_path / "accumulator"
+    acc = accumulator.SpectrogramAccumulator(
+        (START, START + 100), 1.0, ENERGY_EDGES, path=path
+    )
+    acc.add_file(filename)
+    with pytest.raises(ValueError, match="time_edges"):
+        accumulator.SpectrogramAccumulator(
+            (START, START + 100), 2.0, ENERGY_EDGES, path=path
+        )
+
+    # Only checkpoints are stored
+    acc._counts[1, 1] += 1
+    acc._counts.flush()
+    acc = accumulator.SpectrogramAccumulator(
+        (START, START + 100), 1.0, ENERGY_EDGES, path=path
+    )
+    assert acc.num_events == 10
+
+    # A modified stored grid is detected
+    (counts_filename,) = path.glob("counts.*.npy")
+    counts = np.load(counts_filename)
+    counts[1, 1] += 1
+    np.save(counts_filename, counts)
+    with pytest.raises(ValueError, match="started again"):
+        accumulator.SpectrogramAccumulator(
+            (START, START + 100), 1.0, ENERGY_EDGES, path=path
+        )
+
+
+def test_accumulate_resume_after_kill(tmp_path):
+    files = [make_eventlist_file(tmp_path, hour, 1000, seed=hour) for hour in range(2)]
+    path = tmp_path / "accumulator"
+    # Events are added after the last checkpoint, then the process is killed
+    script = f"""
+import os, signal
+from astropy.io import fits
+from padre_sharp.calibration import accumulator
+acc = accumulator.SpectrogramAccumulator(
+    {TIME_RANGE}, 1.0, {ENERGY_EDGES.tolist()}, path={str(path)!r}
+)
+acc.add_file({str(files[0][0])!r})
+acc.add_events(
+    fits.getdata({str(files[1][0])!r}, "EVENTS"),
+    fits.getval({str(files[1][0])!r}, "CLKEPOCH"),
+)
+acc._counts.flush()
+os.kill(os.getpid(), signal.SIGKILL)
+"""
+    process = subprocess.run([sys.executable, "-c", script])
+    assert process.returncode == -signal.SIGKILL
+
+    acc = accumulator.SpectrogramAccumulator(
+        TIME_RANGE, 1.0, ENERGY_EDGES, path=path, read_size=100
+    )
+    assert acc.num_events == 1000
+    expected = expected_counts(files[:1], acc.time_edges)
+    np.testing.assert_array_equal(acc.counts, expected)
+    assert acc.add_files([filename for filename, _ in files]) == 1000
+    expected = expected_counts(files, acc.time_edges)
+    np.testing.assert_array_equal(acc.counts, expected)
+    assert len(list(path.glob("counts.*.npy"))) == 1
+
+
+def test_accumulate_checkpoints(tmp_path):
+    files = [make_eventlist_file(tmp_path, hour, 100, seed=hour) for hour in range(3)]
+    path = tmp_path / "accumulator"
+    acc = accumulator.SpectrogramAccumulator(
+        TIME_RANGE, 1.0, ENERGY_EDGES, path=path, read_size=10
+    )
+    assert acc._state["checkpoint"] == 1
+    # The grid is written once for the files, not after each file or chunk
+    acc.add_files([filename for filename, _ in files])
+    assert acc._state["checkpoint"] == 2
+    # Nothing new to write
+    assert acc.add_files([filename for filename, _ in files]) == 0
+    assert acc._state["checkpoint"] == 2
+    # Also every checkpoint_interval seconds
+    acc = accumulator.SpectrogramAccumulator(
+        TIME_RANGE,
+        1.0,
+        ENERGY_EDGES,
+        path=tmp_path / "other",
+        read_size=10,
+        checkpoint_interval=0,
+    )
+    acc.add_file(files[0][0])
+    # After each chunk, then to mark the file complete
+    assert acc._state["checkpoint"] == 12
+
+
+def test_accumulate_no_epoch(tmp_path):
+    product = DataProduct(
+        instrument="sharp",
+        time=Time("2025-05-01"),
+        level="l1",
+        descriptor="eventlist",
+        data={"events": np.zeros(10, dtype=decode.EVENT_DTYPE)},
+    )
+    filename = product.write(tmp_path)
+    acc = accumulator.SpectrogramAccumulator(TIME_RANGE, 1.0)
+    with pytest.raises(ValueError, match="no clock epoch"):
+        acc.add_file(filename)
+    assert acc.num_events == 0
+
+
+def test_accumulate_not_eventlist(tmp_path):
+    product = DataProduct(
+        instrument="sharp", time=Time("2025-05-01"), level="l1", descriptor="spec"
+    )
+    filename = product.write(tmp_path)
+    acc = accumulator.SpectrogramAccumulator((START, START + 100), 1.0)
+    with pytest.raises(ValueError, match="l1 event list"):
+        acc.add_file(filename)
+    with pytest.raises(ValueError, match="No file"):
+        acc.to_product()
+
+
+def test_add_counts_shape():
+    counts = np.zeros((3, 3), dtype=np.int64)
+    with pytest.raises(ValueError, match="shape"):
+        binning.add_counts(counts, [0.5], [0.5], [0, 1], [0, 1, 2])
@@ -0,0 +1,122 @@
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import padre_sharp.calibration as calib
+from padre_sharp.calibration import binning
+from padre_sharp.io import decode
+
+
+@pytest.mark.parametrize(
+    "edges", [np.arange(0.0, 11.0), np.array([0.0, 1.0, 2.5, 3.0, 7.0, 10.0])]
+)
+def test_bin_indices(edges):
+    values = np.array([-1.0, 0.0, 0.5, 2.5, 9.99, 10.0, np.nan])
+    indices = binning.bin_indices(values, edges)
+    num_bins = len(edges) - 1
+    expected = np.searchsorted(edges, values, side="right") - 1
+    expected[(expected < 0) | (expected >= num_bins)] = num_bins
+    np.testing.assert_array_equal(indices, expected)
+
+
+@pytest.mark.parametrize("chunk_size", [3, binning.DEFAULT_CHUNK_SIZE])
+def test_spectrum(chunk_size):
+    values = np.random.default_rng(0).uniform(-5, 105, 1000)
+    edges = np.array([0.0, 3.0, 10.0, 50.0, 100.0])
+    counts = binning.spectrum(values, edges, chunk_size=chunk_size)
+    np.testing.assert_array_equal(counts, np.histogram(values, edges)[0])
+
+
+def test_spectrogram():
+    rng = np.random.default_rng(0)
+    times = rng.uniform(0, 100, 5000)
+    values = rng.uniform(0, 20, 5000)
+    time_edges = np.arange(0.0, 101.0, 10.0)
+    energy_edges = np.array([0.0, 1.0, 5.0, 20.0])
+    result = binning.spectrogram(times, values, time_edges, energy_edges, chunk_size=7)
+    expected = np.histogram2d(times, values, [time_edges, energy_edges])[0]
+    np.testing.assert_array_equal(result.counts, expected)
+    assert result.cadence == 10.0
+
+
+def test_rebin():
+    counts = np.arange(12).reshape(2, 6)
+    edges = np.arange(7.0)
+    np.testing.assert_array_equal(
+        binning.rebin(counts, edges, [0.0, 2.0, 6.0], axis=1), [[1, 14], [13, 38]]
+    )
+    with pytest.raises(ValueError, match="subset"):
+        binning.rebin(counts, edges, [0.0, 2.5, 6.0], axis=1)
+
+
+def test_spectrograms():
+    rng = np.random.default_rng(0)
+    times = rng.uniform(1003.5, 1250, 10_000)
+    values = rng.uniform(0, 10, 10_000)
+    energy_edges = [np.arange(0.0, 10.5, 0.5), np.array([0.0, 2.0, 10.0])]
+    result = binning.spectrograms(
+        times, values, cadences=[2.0, 10.0, 60.0], energy_edges=energy_edges
+    )
+    assert len(result) == 6
+    for (cadence, i), spectrogram in result.items():
+        # Every resolution matches binning the events directly
+        assert spectrogram.cadence == cadence
+        assert spectrogram.time_edges[0] == 960.0
+        assert spectrogram.time_edges[-1] >= times.max()
+        expected = binning.spectrogram(
+            times, values, spectrogram.time_edges, energy_edges[i]
+        )
+        np.testing.assert_array_equal(spectrogram.counts, expected.counts)
+        assert spectrogram.counts.sum() == len(times)
+
+    with pytest.raises(ValueError, match="multiples"):
+        binning.spectrograms(times, values, cadences=[2.0, 3.0])
+
+
+def test_spectral_tables():
+    events = np.zeros(4, dtype=decode.EVENT_DTYPE)
+    events["coarse_time"] = [100, 100, 101, 165]
+    events["fine_time"] = [0, 2**15, 0, 0]
+    events["adc"] = [0, 20, 40, 4095]
+    events["energy"] = np.nan
+
+    tables = binning.spectral_tables(events, cadences=[1.0, 60.0])
+    assert set(tables) == {
+        "energy_bins",
+        "spectrum",
+        "spectrogram_1s",
+        "spectrogram_60s",
+    }
+    # Not calibrated, binned by ADC value
+    assert tables["energy_bins"].dtype.names == ("adc_min", "adc_max")
+    assert tables["spectrum"]["counts"][[0, 1, 2, 255]].tolist() == [1, 1, 1, 1]
+    assert tables["spectrogram_60s"]["time"].tolist() == [60.0, 120.0]
+    assert tables["spectrogram_60s"]["counts"].sum(axis=1).tolist() == [3, 1]
+
+    events["energy"] = [1.0, 2.0, 3.0, 4.0]
+    tables = binning.spectral_tables(events, energy_edges=np.arange(0.0, 6.0))
+    assert tables["energy_bins"].dtype.names == ("energy_min", "energy_max")
+    assert tables["spectrum"]["counts"].tolist() == [0, 1, 1, 1, 1]
+
+
+def test_bin_product():
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    product = calib.calibrate_product(calib.DataProduct.from_file(raw_file))
+    num_events = len(product.data["events"])
+
+    spec_eventlist = calib.bin_product(product, keep_events=True)
+    assert spec_eventlist.descriptor == "spec-eventlist"
+    assert "events" in spec_eventlist.data
+
+    spec = calib.bin_product(product)
+    assert spec.descriptor == "spec"
+    assert "events" not in spec.data
+    assert spec.data["spectrum"]["counts"].sum() == num_events
+
+    read_product = calib.DataProduct.from_file(spec.write(tempfile.gettempdir()))
+    np.testing.assert_array_equal(
+        read_product.data["spectrogram_10s"]["counts"],
+        spec.data["spectrogram_10s"]["counts"],
+    )
@@ -1,8 +1,14 @@
+import numpy as np
 import pytest
 from pathlib import Path
 import tempfile
 
+from astropy.time import Time
+
 import padre_sharp.calibration as calib
+from padre_sharp.calibration import batch
+from padre_sharp.io import decode
+from padre_sharp.util import packets, time_conversion
 
 
 def test_process_file():
@@ -14,27 +20,33 @@ def test_process_file():
     )
     assert isinstance(result, list)
     assert len(result) == 1
-    assert result[0] == temp_dir / Path("padre_sharp_l0_20250503T042550_v0.0.0.fits")
+    assert result[0] == temp_dir / Path(
+        "padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits"
+    )
 
     # Test processing the l0 file to l1
     result = calib.process_file(
-        temp_dir / Path("padre_sharp_l0_20250503T042550_v0.0.0.fits")
+        temp_dir / Path("padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits")
     )
     assert isinstance(result, list)
     assert len(result) == 1
-    assert result[0] == temp_dir / Path("padre_sharp_l1_20250503T042550_v0.0.0.fits")
+    assert result[0] == temp_dir / Path(
+        "padre_sharp_l1_eventlist_20250503T042550_v0.0.0.fits"
+    )
 
     # Test processing the l1 file to ql
     result = calib.process_file(
-        temp_dir / Path("padre_sharp_l1_20250503T042550_v0.0.0.fits")
+        temp_dir / Path("padre_sharp_l1_eventlist_20250503T042550_v0.0.0.fits")
     )
     assert isinstance(result, list)
     assert len(result) == 1
-    assert result[0] == temp_dir / Path("padre_sharp_ql_20250503T042550_v0.0.0.fits")
+    assert result[0] == temp_dir / Path(
+        "padre_sharp_ql_spec_20250503T042550_v0.0.0.fits"
+    )
     # Test processing the ql and it raising a ValueError
     with pytest.raises(ValueError) as excinfo:
         calib.process_file(
-            temp_dir / Path("padre_sharp_ql_20250503T042550_v0.0.0.fits")
+            temp_dir / Path("padre_sharp_ql_spec_20250503T042550_v0.0.0.fits")
         )
 
 
@@ -55,8 +67,204 @@ def test_calibrate_file():
 
 
 def test_get_calibration_file():
-    assert calib.get_calibration_file("") is None
+    assert calib.get_calibration_file(Time("2025-05-03T04:25:50")) is None
 
 
 def test_read_calibration_file():
     assert calib.read_calibration_file("calib_file") is None
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_process_files(max_workers):
+    test_dir = Path("padre_sharp/tests/data")
+    data_filenames = [
+        test_dir / "PADRESP13_250503042550.DAT",
+        test_dir / "invalid_file.bin",
+    ]
+    result = calib.process_files(data_filenames, max_workers=max_workers)
+    assert result.num_files == 2
+    assert list(result.outputs) == [data_filenames[0]]
+    assert result.outputs[data_filenames[0]] == [
+        Path(tempfile.gettempdir())
+        / "padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits"
+    ]
+    assert result.errors == {
+        data_filenames[
+            1
+        ]: "ValueError: No valid instrument name found in invalid_file.bin"
+    }
+    assert result.num_bytes > 0
+    assert "Processed 2 files (1 failed)" in result.summary()
+
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_process_files_output_collision(tmp_path, monkeypatch, max_workers):
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    # Same time, so the same output filename, in another directory
+    copy = tmp_path / raw_file.name
+    copy.write_bytes(raw_file.read_bytes())
+    other = tmp_path / "PADRESP13_250503052550.DAT"
+    other.write_bytes(raw_file.read_bytes())
+    monkeypatch.setenv("SHARP_OUTPUTDIR", str(tmp_path / "out"))
+    result = calib.process_files([raw_file, other, copy], max_workers=max_workers)
+    # Only the first of the colliding inputs is processed, the batch goes on
+    assert list(result.outputs) == [raw_file, other]
+    assert list(result.errors) == [copy]
+    assert "same output file" in result.errors[copy]
+    assert str(raw_file) in result.errors[copy]
+    assert "Processed 3 files (1 failed)" in result.summary()
+    # A file listed twice is processed once
+    result = calib.process_files([raw_file, raw_file], max_workers=max_workers)
+    assert list(result.outputs) == [raw_file]
+    assert not result.errors
+
+
+def test_process_files_glob():
+    result = calib.process_files("padre_sharp/tests/data/*.DAT")
+    assert list(result.outputs) == [
+        Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    ]
+    result = calib.process_files(Path("padre_sharp/tests/data"), max_workers=2)
+    assert len(result.outputs) == 1
+    assert len(result.errors) == 1
+
+
+def test_batch_main(capsys):
+    assert batch.main(["padre_sharp/tests/data/*.DAT", "-j", "1"]) == 0
+    assert (
+        "padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits"
+        in capsys.readouterr().out
+    )
+    assert batch.main(["padre_sharp/tests/data"]) == 1
+
+
+def test_process_file_to_level():
+    temp_dir = Path(tempfile.gettempdir())
+    intermediate = [
+        temp_dir / "padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits",
+        temp_dir / "padre_sharp_l1_eventlist_20250503T042550_v0.0.0.fits",
+    ]
+    quicklook = temp_dir / "padre_sharp_ql_spec_20250503T042550_v0.0.0.fits"
+    for filename in intermediate:
+        filename.unlink(missing_ok=True)
+
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    # Intermediate levels stay in memory
+    assert calib.process_file(raw_file, to_level="ql") == [quicklook]
+    assert not any(filename.exists() for filename in intermediate)
+
+    result = calib.process_file(raw_file, to_level="ql", write_intermediate=True)
+    assert result == intermediate + [quicklook]
+
+    result = calib.process_files([raw_file], max_workers=1, to_level="l1")
+    assert result.outputs[raw_file] == intermediate[1:]
+
+    with pytest.raises(ValueError):
+        calib.process_file(intermediate[1], to_level="l0")
+
+
+def test_calibrate_product():
+    product = calib.DataProduct.from_file(
+        "padre_sharp/tests/data/PADRESP13_250503042550.DAT"
+    )
+    assert product.level == "raw"
+    for level, descriptor in zip(
+        calib.PIPELINE_LEVELS[1:], ["eventlist", "eventlist", "spec"]
+    ):
+        product = calib.calibrate_product(product)
+        assert product.level == level
+        assert (
+            product.filename
+            == f"padre_sharp_{level}_{descriptor}_20250503T042550_v0.0.0.fits"
+        )
+    with pytest.raises(ValueError):
+        calib.calibrate_product(product)
+
+
+def test_eventlist_product():
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    product = calib.calibrate_product(calib.DataProduct.from_file(raw_file))
+    assert product.descriptor == "eventlist"
+    assert set(product.data) == {"events", "packets"}
+
+    output_file = product.write(tempfile.gettempdir())
+    # The tables survive the round trip through the file
+    read_product = calib.DataProduct.from_file(output_file)
+    assert read_product.level == "l0"
+    for name, table in product.data.items():
+        assert read_product.data[name].dtype == table.dtype
+        for column in table.dtype.names:
+            np.testing.assert_array_equal(
+                read_product.data[name][column], table[column]
+            )
+
+
+def test_eventlist_product_times():
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    product = calib.calibrate_product(calib.DataProduct.from_file(raw_file))
+    # The clock counts from power on, the first packet is the time of the file
+    packet_table = product.data["packets"]
+    assert packet_table["coarse_time"].min() == 969
+    assert product.epoch == "2025-05-03T04:09:41.000000000"
+    first = np.argmin(packet_table["coarse_time"])
+    assert (
+        time_conversion.spacecraft_to_isot(
+            product.epoch, packet_table["coarse_time"][first], unit="s"
+        )
+        == "2025-05-03T04:25:50"
+    )
+
+    times = Time(
+        decode.event_times(product.data["events"], product.epoch), format="unix"
+    )
+    assert Time("2025-05-03T04:25:50") <= times.min()
+    assert times.max() < Time("2025-05-03T04:30:00")
+    np.testing.assert_allclose(
+        times.unix - decode.event_times(product.data["events"]),
+        Time(product.epoch).unix,
+    )
+
+    # The epoch is kept through the levels
+    l0_file = product.write(tempfile.gettempdir())
+    l1_product = calib.calibrate_product(calib.DataProduct.from_file(l0_file))
+    assert l1_product.epoch == product.epoch
+    assert calib.calibrate_product(l1_product).epoch == product.epoch
+
+
+def test_process_files_deduplicate(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_OUTPUTDIR", str(tmp_path / "out"))
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    # Another downlink of the same packets
+    copy = tmp_path / raw_file.name
+    copy.write_bytes(raw_file.read_bytes())
+    result = calib.process_files([copy, raw_file], max_workers=1, deduplicate=True)
+    merged = tmp_path / "out" / raw_file.name
+    assert list(result.outputs) == [merged]
+    assert result.outputs[merged] == [
+        tmp_path / "out" / "padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits"
+    ]
+    assert merged.read_bytes() == raw_file.read_bytes()
+
+
+def test_process_files_deduplicate_groups(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_OUTPUTDIR", str(tmp_path / "out"))
+    view = packets.open_packets(
+        Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    )
+    # Two overlapping downlinks and a later one, named after their first packet
+    filenames = []
+    for name, indices in [
+        ("PADRESP13_250503042625.DAT", range(3, 8)),
+        ("PADRESP13_250503042550.DAT", range(0, 6)),
+        ("PADRESP13_250503042755.DAT", range(9, 11)),
+    ]:
+        filenames.append(tmp_path / name)
+        np.concatenate([view.packet(i) for i in indices]).tofile(filenames[-1])
+    result = calib.process_files(filenames, max_workers=1, deduplicate=True)
+    merged = tmp_path / "out" / "PADRESP13_250503042550.DAT"
+    assert result.merged == {filenames[0]: merged, filenames[1]: merged}
+    assert list(result.outputs) == [merged, filenames[2]]
+    assert (
+        merged.read_bytes()
+        == np.concatenate([view.packet(i) for i in range(8)]).tobytes()
+    )
@@ -0,0 +1,124 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from padre_sharp.io import decode
+from padre_sharp.util import packets
+
+TEST_FILE = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+
+
+def make_science_packet(seq_count, coarse_time, records, frame=False, apid=19):
+    """Build a SHARP packet holding ``records`` of (fine_time, channel_adc, flags)."""
+    data = np.asarray(records, dtype=decode.EVENT_RECORD_DTYPE).tobytes()
+    if frame:
+        frame_header = bytearray(decode.FRAME_HEADER_NUM_BYTES)
+        frame_header[0:2] = decode.FRAME_SYNC.to_bytes(2, "little")
+        frame_header[8:10] = len(records).to_bytes(2, "little")
+        data = bytes(frame_header) + data
+    body = coarse_time.to_bytes(6, "big") + data + b"\x00"
+    header = bytearray(6)
+    header[0:2] = (0x0800 | apid).to_bytes(2, "big")
+    header[2:4] = (0xC000 | seq_count).to_bytes(2, "big")
+    header[4:6] = (len(body) - 1).to_bytes(2, "big")
+    return bytes(header) + body
+
+
+def test_decode_packets():
+    file_bytes = np.frombuffer(
+        make_science_packet(0, 1000, [(1, 0x1002, 7), (2, 0xF3FF, 8)], frame=True)
+        + make_science_packet(0, 5, [(9, 0, 0)], apid=20)
+        + make_science_packet(1, 2**40 + 1, [(3, 0x2004, 9)]),
+        dtype=np.uint8,
+    )
+    result = decode.decode_packets(packets.PacketView(file_bytes))
+
+    packet_table = result["packets"]
+    assert packet_table["sequence_count"].tolist() == [0, 1]
+    assert packet_table["coarse_time"].tolist() == [1000, 2**40 + 1]
+    assert packet_table["frame_start"].tolist() == [True, False]
+    assert packet_table["num_events"].tolist() == [2, 1]
+    assert packet_table["first_event"].tolist() == [0, 2]
+    # The trailing byte of each packet is not an event
+    assert packet_table["num_trailing_bytes"].tolist() == [1, 1]
+
+    events = result["events"]
+    assert events.dtype == decode.EVENT_DTYPE
+    assert events["packet_index"].tolist() == [0, 0, 1]
+    assert events["coarse_time"].tolist() == [1000, 1000, 2**40 + 1]
+    assert events["fine_time"].tolist() == [1, 2, 3]
+    assert events["channel"].tolist() == [1, 15, 2]
+    assert events["adc"].tolist() == [2, 0x3FF, 4]
+    assert events["flags"].tolist() == [7, 8, 9]
+
+    other = decode.decode_packets(packets.PacketView(file_bytes), apid=20)
+    assert other["events"]["fine_time"].tolist() == [9]
+
+
+def test_decode_packets_short():
+    # A frame declaring fewer events than its packet holds
+    frame = make_science_packet(0, 1000, [(i, 0, 0) for i in range(100)], frame=True)
+    num_events_offset = 12 + decode.FRAME_NUM_EVENTS_OFFSET
+    frame = (
+        frame[:num_events_offset]
+        + (1).to_bytes(2, "little")
+        + frame[num_events_offset + 2 :]
+    )
+    # A final science packet truncated before the end of its secondary header
+    truncated = bytearray(make_science_packet(1, 1001, []))[:9]
+    truncated[4:6] = (len(truncated) - 7).to_bytes(2, "big")
+    file_bytes = np.frombuffer(frame + bytes(truncated), dtype=np.uint8)
+    view = packets.PacketView(file_bytes)
+    assert len(view) == 2
+
+    result = decode.decode_packets(view)
+    packet_table = result["packets"]
+    assert packet_table["num_events"].tolist() == [1, 0]
+    assert packet_table["num_trailing_bytes"].tolist() == [
+        99 * decode.EVENT_RECORD_DTYPE.itemsize + 1,
+        0,
+    ]
+    assert packet_table["coarse_time"].tolist() == [1000, 0]
+    assert result["events"]["fine_time"].tolist() == [0]
+
+
+def test_decode_packets_empty():
+    result = decode.decode_packets(packets.PacketView(np.empty(0, dtype=np.uint8)))
+    assert len(result["events"]) == 0
+    assert len(result["packets"]) == 0
+
+
+def test_decode_file():
+    result = decode.decode_file(TEST_FILE)
+    packet_table = result["packets"]
+    assert len(packet_table) == 11
+    assert packet_table["frame_start"].sum() == 2
+    assert np.all(np.diff(packet_table["coarse_time"].astype(np.int64)) > 0)
+    assert packet_table["num_events"].sum() == len(result["events"])
+
+    # Events match a slow decode of each packet
+    view = packets.open_packets(TEST_FILE)
+    for i in [0, 5, 10]:
+        start = 12 + (
+            decode.FRAME_HEADER_NUM_BYTES if packet_table[i]["frame_start"] else 0
+        )
+        num_events = packet_table[i]["num_events"]
+        records = np.frombuffer(
+            view.packet(i)[start : start + 6 * num_events].tobytes(),
+            dtype=decode.EVENT_RECORD_DTYPE,
+        )
+        first_event = packet_table[i]["first_event"]
+        events = result["events"][first_event : first_event + num_events]
+        assert np.all(events["packet_index"] == i)
+        np.testing.assert_array_equal(events["fine_time"], records["fine_time"])
+        np.testing.assert_array_equal(events["flags"], records["flags"])
+        np.testing.assert_array_equal(
+            events["adc"] | (events["channel"].astype(np.uint16) << 12),
+            records["channel_adc"],
+        )
+
+
+def test_decode_file_missing():
+    with pytest.raises(FileNotFoundError):
+        decode.decode_file("missing_file.DAT")
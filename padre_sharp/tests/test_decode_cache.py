@@ -0,0 +1,131 @@
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import padre_sharp.calibration as calib
+from padre_sharp.io import decode, decode_cache
+from padre_sharp.util import config
+
+test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+
+
+def assert_tables_equal(data, expected):
+    for name in decode_cache.TABLE_NAMES:
+        assert data[name].dtype == expected[name].dtype
+        for column in expected[name].dtype.names:
+            np.testing.assert_array_equal(data[name][column], expected[name][column])
+
+
+def fail_to_decode(*args, **kwargs):
+    raise AssertionError("Decoded again")
+
+
+def test_decode_file(tmp_path, monkeypatch):
+    cache = decode_cache.DecodeCache(tmp_path / "decoded", max_size=10**9)
+    expected = decode.decode_file(test_file)
+    assert_tables_equal(cache.decode_file(test_file), expected)
+    assert len(cache.entries()) == 1
+    assert cache.size() > expected["events"].nbytes
+
+    # A copy of the file has the same contents
+    copy = tmp_path / "PADRESP13_250503052550.DAT"
+    shutil.copy(test_file, copy)
+    with monkeypatch.context() as m:
+        m.setattr(decode, "decode_packets", fail_to_decode)
+        data = cache.decode_file(copy)
+    assert_tables_equal(data, expected)
+    assert isinstance(data["events"], np.memmap)
+    # Changes to the tables are not saved
+    data["events"]["energy"] = 1
+    assert np.isnan(cache.decode_file(test_file)["events"]["energy"]).all()
+
+    # Nor is a new decoder version
+    monkeypatch.setattr(decode, "DECODER_VERSION", decode.DECODER_VERSION + 1)
+    assert cache.get(cache.key(decode.packets.open_packets(test_file))) is None
+
+
+def test_unreadable_entry(tmp_path):
+    cache = decode_cache.DecodeCache(tmp_path, max_size=10**9)
+    cache.decode_file(test_file)
+    entry = Path(cache.entries()[0].path)
+    (entry / "events.npy").write_bytes(b"garbage")
+    key = entry.name
+    assert cache.get(key) is None
+    assert not entry.exists()
+    assert_tables_equal(cache.decode_file(test_file), decode.decode_file(test_file))
+
+
+def test_evict(tmp_path):
+    cache = decode_cache.DecodeCache(tmp_path, max_size=10**9)
+    data = {
+        "events": np.zeros(1000, dtype=decode.EVENT_DTYPE),
+        "packets": np.zeros(10, dtype=decode.PACKET_DTYPE),
+    }
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, data)
+        os.utime(tmp_path / key, (1000 + i, 1000 + i))
+    entry_size = cache.size() // 3
+    # A hit makes an entry the most recently used
+    assert cache.get("a") is not None
+    assert [entry.name for entry in cache.entries()] == ["b", "c", "a"]
+
+    cache.max_size = 2 * entry_size
+    assert cache.evict() == ["b"]
+    assert cache.evict(max_size=entry_size, keep="c") == ["a"]
+    assert [entry.name for entry in cache.entries()] == ["c"]
+    # A writer that died leaves its temporary directory behind
+    abandoned = tmp_path / ".tmp-abandoned"
+    abandoned.mkdir()
+    os.utime(abandoned, (0, 0))
+    cache.clear()
+    assert cache.size() == 0
+    assert os.listdir(tmp_path) == []
+
+
+#: Room for two and a half entries of the test file
+MAX_SIZE = 2_600_000
+
+
+def decode_in_worker(args):
+    cache_dir, data_filename = args
+    cache = decode_cache.DecodeCache(cache_dir, max_size=MAX_SIZE)
+    return len(cache.decode_file(data_filename)["events"])
+
+
+def test_concurrent_workers(tmp_path):
+    # Different contents so that the workers add and evict different entries
+    data_filenames = []
+    file_bytes = test_file.read_bytes()
+    for i in range(6):
+        data_filename = tmp_path / "raw" / f"PADRESP13_25050304255{i}.DAT"
+        data_filename.parent.mkdir(exist_ok=True)
+        data_filename.write_bytes(file_bytes + bytes(i))
+        data_filenames.append(data_filename)
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        args = [(tmp_path / "decoded", name) for name in data_filenames * 4]
+        num_events = list(executor.map(decode_in_worker, args))
+    assert num_events == [len(decode.decode_file(test_file)["events"])] * len(args)
+    cache = decode_cache.DecodeCache(tmp_path / "decoded", max_size=MAX_SIZE)
+    entry_size = cache.size() // len(cache.entries())
+    # The entry just added is kept whatever the size
+    assert cache.size() <= MAX_SIZE + entry_size
+    for entry in cache.entries():
+        assert sorted(os.listdir(entry.path)) == ["events.npy", "packets.npy"]
+
+
+def test_reprocess_skips_decoding(monkeypatch):
+    calib.process_file(test_file, to_level="l1")
+    monkeypatch.setattr(decode, "decode_packets", fail_to_decode)
+    output_files = calib.process_file(test_file, to_level="l1", force=True)
+    assert len(calib.DataProduct.from_file(output_files[0]).data["events"]) == 41912
+
+
+def test_decode_cache_size(monkeypatch):
+    assert config.get_decode_cache_size() == 2048 * 10**6
+    monkeypatch.setenv("SHARP_DECODE_CACHE_SIZE", "0.5")
+    assert config.get_decode_cache_size() == 500_000
+    assert decode_cache.DecodeCache().max_size == 500_000
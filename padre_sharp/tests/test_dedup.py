@@ -0,0 +1,135 @@
+from pathlib import Path
+
+import astropy.units as u
+import numpy as np
+import pytest
+from astropy.time import Time
+
+from padre_sharp.io import decode, dedup
+from padre_sharp.util import packets
+
+test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+#: Clock epoch of the test file
+EPOCH = Time("2025-05-03T04:09:41")
+
+
+def write_packets(output_dir, view, indices, epoch=EPOCH):
+    """Write packets to a raw file named after the time of its first packet."""
+    indices = list(indices)
+    coarse_time = decode.read_coarse_times(view.file_bytes, view.headers[indices])
+    time = epoch + int(coarse_time.min()) * u.s
+    filename = output_dir / f"PADRESP13_{time.strftime('%y%m%d%H%M%S')}.DAT"
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    np.concatenate([view.packet(i) for i in indices]).tofile(filename)
+    return filename
+
+
+def assert_decoded_equal(data, expected):
+    for name in ["events", "packets"]:
+        for column in expected[name].dtype.names:
+            np.testing.assert_array_equal(data[name][column], expected[name][column])
+
+
+def test_deduplicate_packets(tmp_path):
+    view = packets.open_packets(test_file)
+    # Two overlapping downlinks, the second one received twice and out of order
+    filenames = [
+        write_packets(tmp_path, view, range(0, 7)),
+        write_packets(tmp_path, view, range(4, 11)),
+        write_packets(tmp_path / "other", view, range(10, 3, -1)),
+    ]
+    stream = dedup.deduplicate_packets(filenames)
+    assert stream.num_received == 21
+    assert stream.num_duplicates == 10
+    np.testing.assert_array_equal(stream.source_index, [0] * 7 + [1] * 4)
+    np.testing.assert_array_equal(stream.packet_index, list(range(7)) + [3, 4, 5, 6])
+    np.testing.assert_array_equal(stream.view.file_bytes, view.file_bytes)
+    assert_decoded_equal(
+        decode.decode_packets(stream.view), decode.decode_packets(view)
+    )
+
+
+def test_sequence_count_wrap(tmp_path):
+    view = packets.open_packets(test_file)
+    file_bytes = view.file_bytes.copy()
+    # Four packets of the same second, the sequence counter wraps between them
+    for i, sequence_count in zip(range(4), [1, 16383, 0, 16382]):
+        offset = view.offsets[i]
+        file_bytes[offset + 2 : offset + 4] = [
+            sequence_count >> 8,
+            sequence_count & 0xFF,
+        ]
+        file_bytes[offset + 6 : offset + 12] = [0, 0, 0, 0, 0x03, 0xC9]
+    filename = tmp_path / "PADRESP13_250503042550.DAT"
+    file_bytes[: view.offsets[4]].tofile(filename)
+
+    stream = dedup.deduplicate_packets([filename])
+    np.testing.assert_array_equal(stream.packet_index, [3, 1, 2, 0])
+    np.testing.assert_array_equal(
+        stream.view.headers["sequence_count"], [16382, 16383, 0, 1]
+    )
+    fingerprints = dedup.fingerprint_packets(stream.view)
+    np.testing.assert_array_equal(fingerprints["coarse_time"], 969)
+
+
+def test_group_raw_files(tmp_path):
+    view = packets.open_packets(test_file)
+    filenames = [
+        write_packets(tmp_path / "a", view, range(6, 8)),
+        write_packets(tmp_path / "b", view, range(0, 3)),
+        write_packets(tmp_path / "c", view, range(9, 11)),
+        write_packets(tmp_path / "d", view, range(2, 5)),
+        write_packets(tmp_path / "e", view, [4, 7]),
+        tmp_path / "PADRESP13_250503042550.DAT",
+        tmp_path / "no_time.DAT",
+    ]
+    filenames[5].write_bytes(b"")
+    filenames[6].write_bytes(view.file_bytes.tobytes())
+    groups = dedup.group_raw_files(filenames)
+    # d overlaps b, e overlaps d and a, c is later than all of them
+    assert groups == [
+        [filenames[5]],
+        [filenames[6]],
+        [filenames[0], filenames[1], filenames[3], filenames[4]],
+        [filenames[2]],
+    ]
+    assert dedup.group_raw_files([]) == []
+
+
+def test_power_cycles(tmp_path):
+    view = packets.open_packets(test_file)
+    # The coarse times overlap, but the clock restarted in between
+    later_epoch = EPOCH + 3 * u.h
+    filenames = [
+        write_packets(tmp_path, view, range(3, 9), epoch=later_epoch),
+        write_packets(tmp_path, view, range(0, 6)),
+    ]
+    assert filenames[0].name == "PADRESP13_250503072625.DAT"
+    assert filenames[1].name == "PADRESP13_250503042550.DAT"
+    groups = dedup.group_raw_files(filenames)
+    assert groups == [[filenames[1]], [filenames[0]]]
+
+    # No packet is a duplicate of a packet of the other clock
+    stream = dedup.deduplicate_packets(filenames)
+    assert stream.num_duplicates == 0
+    np.testing.assert_array_equal(stream.source_index, [1] * 6 + [0] * 6)
+    np.testing.assert_array_equal(stream.packet_index, list(range(6)) * 2)
+    with pytest.raises(ValueError, match="different power cycles"):
+        dedup.merge_raw_files(filenames, output_dir=tmp_path / "out")
+
+
+def test_merge_raw_files(tmp_path):
+    view = packets.open_packets(test_file)
+    filenames = [
+        write_packets(tmp_path / "raw", view, [5, 2]),
+        write_packets(tmp_path / "other", view, [2, 3]),
+    ]
+    output = dedup.merge_raw_files(filenames, output_dir=tmp_path / "out")
+    assert output == tmp_path / "out" / filenames[0].name
+    merged = packets.open_packets(output)
+    np.testing.assert_array_equal(merged.headers["sequence_count"], [3, 7, 14])
+
+    with pytest.raises(ValueError, match="overwrite the input"):
+        dedup.merge_raw_files(filenames, output_dir=tmp_path / "raw")
+    with pytest.raises(ValueError, match="No raw files"):
+        dedup.merge_raw_files([])
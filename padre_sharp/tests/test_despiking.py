@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.lib.stride_tricks import sliding_window_view
+
+import padre_sharp.calibration as calib
+from padre_sharp.calibration import despiking
+
+
+@pytest.mark.parametrize("window", [3, 5, 9, 15, 31])
+def test_rolling_median(window):
+    data = np.random.default_rng(window).normal(size=(1000, 2))
+    padded = np.pad(data, [(window // 2, window // 2), (0, 0)], mode="reflect")
+    expected = np.median(sliding_window_view(padded, window, axis=0), axis=-1)
+    result = despiking.rolling_median(data, window, chunk_size=97)
+    np.testing.assert_allclose(result, expected)
+
+
+def test_rolling_median_window():
+    with pytest.raises(ValueError, match="odd number"):
+        despiking.rolling_median(np.zeros(10), 4)
+
+
+@pytest.mark.parametrize("chunk_size", [5, 64, despiking.DEFAULT_CHUNK_SIZE])
+def test_despike(chunk_size):
+    counts = np.random.default_rng(0).poisson(20, 500)
+    spikes = [0, 100, 101, 250, 499]
+    counts[spikes] = 500
+    counts[300] = 0
+
+    result = despiking.despike(counts, chunk_size=chunk_size)
+    assert np.flatnonzero(result.mask).tolist() == spikes
+    assert result.num_spikes == result.num_corrected == 5
+    assert result.num_uncorrected == 0
+    assert np.all(result.data[spikes] < 40)
+    unchanged = ~result.mask
+    np.testing.assert_array_equal(result.data[unchanged], counts[unchanged])
+    # The input is not modified
+    assert np.all(counts[spikes] == 500)
+
+
+def test_despike_spectra():
+    spectra = np.full((100, 3), 10.0)
+    spectra[50, 1] = 1000
+    result = despiking.despike(spectra, window=5, count_data=False)
+    assert np.argwhere(result.mask).tolist() == [[50, 1]]
+    assert result.data[50, 1] == 10
+
+
+def test_despike_uncorrected():
+    data = np.zeros(20)
+    data[8:12] = [100, -100, 100, -100]
+    result = despiking.despike(data, window=5, threshold=0.5, count_data=False)
+    assert result.num_spikes == 4
+    assert result.num_uncorrected == 4
+    np.testing.assert_array_equal(result.data, data)
+
+
+def test_despike_count_rate():
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    product = calib.calibrate_product(calib.DataProduct.from_file(raw_file))
+    lightcurve, result = despiking.despike_count_rate(product.data["events"])
+    assert lightcurve["counts"].sum() == len(product.data["events"])
+    assert np.all(np.diff(lightcurve["coarse_time"].astype(np.int64)) > 0)
+    assert result.num_spikes == lightcurve["spike"].sum()
+    np.testing.assert_array_equal(lightcurve["corrected_counts"], result.data)
+
+    product = calib.calibrate_product(product)
+    assert product.data["lightcurve"].dtype == despiking.LIGHTCURVE_DTYPE
@@ -0,0 +1,102 @@
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+from astropy.table import Table
+
+import padre_sharp.calibration as calib
+from padre_sharp.calibration import energy
+from padre_sharp.io import decode
+
+
+@pytest.fixture
+def calibration():
+    return Table(
+        {
+            "channel": [0, 1, 4],
+            "offset": [1.0, -2.0, 0.5],
+            "gain": [0.5, 0.25, 1.0],
+            "c2": [0.0, 1e-4, -1e-5],
+            "c3": [1e-7, 0.0, 0.0],
+        }
+    )
+
+
+def make_events(channel, adc):
+    events = np.zeros(len(adc), dtype=decode.EVENT_DTYPE)
+    events["channel"] = channel
+    events["adc"] = adc
+    events["energy"] = np.nan
+    return events
+
+
+def test_energy_coefficients(calibration):
+    coefficients = energy.energy_coefficients(calibration)
+    assert coefficients.shape == (256, 4)
+    np.testing.assert_array_equal(coefficients[1], [0.0, 1e-4, 0.25, -2.0])
+    assert np.all(np.isnan(coefficients[2]))
+
+    with pytest.raises(ValueError, match="missing \\['gain'\\]"):
+        energy.energy_coefficients(Table({"channel": [0], "offset": [0.0]}))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, energy.DEFAULT_CHUNK_SIZE])
+def test_calibrate_energy(calibration, chunk_size):
+    rng = np.random.default_rng(0)
+    channel = rng.choice([0, 1, 4], 100)
+    adc = rng.integers(0, 4096, 100)
+    events = make_events(channel, adc)
+
+    result = energy.calibrate_energy(events, calibration, chunk_size=chunk_size)
+    assert result is events
+    for i, row in enumerate(calibration):
+        coefficients = [row["c3"], row["c2"], row["gain"], row["offset"]]
+        selected = channel == row["channel"]
+        np.testing.assert_allclose(
+            events["energy"][selected],
+            np.polyval(coefficients, adc[selected]),
+            rtol=1e-6,
+        )
+
+
+def test_calibrate_energy_unknown_channel(calibration):
+    events = make_events([0, 2, 15], [100, 100, 100])
+    energy.calibrate_energy(events, calibration)
+    assert np.isfinite(events["energy"]).tolist() == [True, False, False]
+
+
+def test_adc_to_energy_memory(calibration):
+    num_events = 2_000_000
+    channel = np.zeros(num_events, dtype=np.uint8)
+    adc = np.arange(num_events, dtype=np.uint16)
+    out = np.empty(num_events, dtype=np.float32)
+    coefficients = energy.energy_coefficients(calibration)
+
+    tracemalloc.start()
+    energy.adc_to_energy(channel, adc, coefficients, out=out, chunk_size=10_000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # Only chunk sized temporaries, far below a copy of the events
+    assert peak < 2 * 1024 * 1024
+    np.testing.assert_allclose(out[:3], [1.0, 1.5, 2.0], rtol=1e-6)
+
+
+def test_calibrate_product_energy(calibration, tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_CALIBRATIONDIR", str(tmp_path))
+    calibration = Table(
+        {"channel": np.arange(16), "offset": np.zeros(16), "gain": np.ones(16)}
+    )
+    calibration.write(tmp_path / "padre_sharp_calib_20250503_20250504.ecsv")
+
+    raw_file = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    product = calib.calibrate_product(calib.DataProduct.from_file(raw_file))
+    assert np.all(np.isnan(product.data["events"]["energy"]))
+    product = calib.calibrate_product(product)
+    assert product.level == "l1"
+    events = product.data["events"]
+    np.testing.assert_array_equal(events["energy"], events["adc"])
+
+    read_product = calib.DataProduct.from_file(product.write(tempfile.gettempdir()))
+    np.testing.assert_array_equal(read_product.data["events"]["energy"], events["adc"])
@@ -1,5 +1,149 @@
+import numpy as np
+import pytest
+from astropy.time import Time
+
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode, file_tools
 from padre_sharp.io.file_tools import read_file
 
+raw_file = "padre_sharp/tests/data/PADRESP13_250503042550.DAT"
+
 
 def test_read_file():
     assert read_file("test_file.cdf") is None
+    assert read_file("padre_sharp_l1_eventlist_20250503T042550_v0.0.0.fits") is None
+
+
+def write_events(output_dir, events, level="l1"):
+    product = DataProduct(
+        instrument="sharp",
+        time=Time("2025-05-03T04:25:50"),
+        level=level,
+        descriptor="eventlist",
+        data={"events": events},
+    )
+    return product.write(output_dir)
+
+
+@pytest.fixture
+def events():
+    rng = np.random.default_rng(0)
+    events = np.zeros(20_000, dtype=decode.EVENT_DTYPE)
+    events["coarse_time"] = 1000 + np.sort(rng.integers(0, 100, len(events)))
+    events["fine_time"] = rng.integers(0, 2**16, len(events))
+    events["adc"] = np.arange(len(events))
+    return decode.sort_events(events)
+
+
+@pytest.mark.parametrize(
+    "time_range",
+    [
+        (1010, 1040),
+        (1010.5, 1010.75),
+        (0, 1e30),
+        (1100, 1200),
+        (900, 1000),
+        (1020, 1010),
+    ],
+)
+def test_read_file_time_range(tmp_path, events, time_range):
+    filename = write_events(tmp_path, events)
+    data = read_file(filename, time_range=time_range)
+    times = decode.event_times(events)
+    expected = events[(times >= time_range[0]) & (times < time_range[1])]
+    assert list(data) == ["events"]
+    np.testing.assert_array_equal(data["events"]["adc"], expected["adc"])
+    assert data.read("events").dtype == decode.EVENT_DTYPE
+
+
+def test_read_file_unsorted(tmp_path, events):
+    filename = write_events(tmp_path, events[::-1], level="l0")
+    data = read_file(filename, time_range=(1010, 1020))
+    times = decode.event_times(events)
+    assert len(data["events"]) == np.count_nonzero((times >= 1010) & (times < 1020))
+
+
+def test_read_file_all_tables(tmp_path, events):
+    filename = write_events(tmp_path, events)
+    data = read_file(filename)
+    assert list(data) == ["events"]
+    np.testing.assert_array_equal(data["events"]["adc"], events["adc"])
+
+
+def test_time_index(events):
+    index = file_tools.TimeIndex.from_events(events, stride=100)
+    assert len(index.keys) == 200
+    keys = decode.event_keys(events)
+    for key in [0, keys[0], keys[150], keys[150] + 1, keys[-1], keys[-1] + 1]:
+        start, stop = index.row_window(key)
+        assert stop - start <= 100
+        assert index.find_row(events, key) == np.searchsorted(keys, key)
+
+
+def test_time_index_sidecar(tmp_path, events, monkeypatch):
+    filename = write_events(tmp_path, events)
+    index = file_tools.get_time_index(filename)
+    assert index.num_rows == len(events)
+    with monkeypatch.context() as m:
+        m.setattr(file_tools.TimeIndex, "from_events", None)
+        loaded = file_tools.get_time_index(filename)
+        np.testing.assert_array_equal(loaded.keys, index.keys)
+
+    # A rewritten file is indexed again
+    filename = write_events(tmp_path, events[:5000])
+    assert file_tools.get_time_index(filename).num_rows == 5000
+
+
+def test_read_file_lazy(tmp_path, events):
+    filename = write_events(tmp_path, events)
+    with read_file(filename) as dataset:
+        assert (dataset.format, dataset.level) == ("fits", "l1")
+        assert dataset._hdul is None
+        assert dataset.num_rows() == len(events)
+        table = dataset["events"]
+        # Columns stored as they are are views of the memory mapped file
+        assert not table["energy"].flags.owndata
+        assert not table[100:200]["energy"].flags.owndata
+        np.testing.assert_array_equal(table[100:200]["adc"], events["adc"][100:200])
+        with pytest.raises(KeyError):
+            dataset["spectrum"]
+
+    empty = tmp_path / "padre_sharp_l1_eventlist_20250503T052550_v0.0.0.fits"
+    empty.touch()
+    assert len(read_file(empty)) == 0
+
+
+@pytest.mark.parametrize("n_rows", [999, 20_000, 50_000])
+def test_iter_chunks(tmp_path, events, n_rows):
+    dataset = read_file(write_events(tmp_path, events))
+    chunks = list(dataset.iter_chunks(n_rows))
+    assert all(len(chunk) == n_rows for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= n_rows
+    assert chunks[0].dtype == decode.EVENT_DTYPE
+    np.testing.assert_array_equal(np.concatenate(chunks), events)
+    with pytest.raises(ValueError, match="0 rows"):
+        next(dataset.iter_chunks(0))
+
+    dataset = read_file(dataset.filename, time_range=(1010, 1020))
+    chunks = list(dataset.iter_chunks(n_rows))
+    np.testing.assert_array_equal(np.concatenate(chunks), dataset.read("events"))
+
+
+@pytest.mark.parametrize("n_rows", [1, 1000, 4321, 100_000])
+def test_read_raw_file(n_rows):
+    dataset = read_file(raw_file)
+    assert (dataset.format, dataset.level) == ("raw", "raw")
+    assert list(dataset) == ["events", "packets"]
+    expected = decode.decode_file(raw_file)
+    for name in ["events", "packets"]:
+        chunks = list(dataset.iter_chunks(n_rows, name))
+        assert all(len(chunk) == n_rows for chunk in chunks[:-1])
+        table = np.concatenate(chunks)
+        assert table.dtype == expected[name].dtype
+        for column in table.dtype.names:
+            np.testing.assert_array_equal(table[column], expected[name][column])
+    assert dataset.num_rows() == len(expected["events"])
+
+    events = read_file(raw_file, time_range=(1000, 1010))["events"]
+    times = decode.event_times(expected["events"])
+    assert len(events) == np.count_nonzero((times >= 1000) & (times < 1010))
@@ -0,0 +1,89 @@
+import subprocess
+import sys
+
+import pytest
+
+from padre_sharp.util.lazy import LazyModule, LazyObject
+
+#: Import time budget of ``import padre_sharp``, in seconds
+IMPORT_TIME_BUDGET = 0.1
+
+#: Modules too slow to import on a cold start that does not use them
+HEAVY_MODULES = ("astropy", "sunpy", "swxsoc")
+
+
+def run_python(code, *options):
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_time(module):
+    """Cumulative import time of a module in seconds, from ``-X importtime``."""
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and line.split("|")[-1].strip() == module:
+            return int(line.split("|")[1]) / 1e6
+    raise AssertionError(f"{module} not found in the import times:\n{stderr}")
+
+
+def imported_heavy_modules(module):
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    return run_python(code).stdout.split()
+
+
+def test_import_time_budget():
+    # Best of a few runs, a cold file system cache is not what is measured
+    assert min(import_time("padre_sharp") for _ in range(3)) < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.parametrize(
+    "module, allowed",
+    [
+        ("padre_sharp", ()),
+        ("padre_sharp.io.decode", ()),
+        ("padre_sharp.io.file_tools", ("astropy",)),
+        ("padre_sharp.calibration", ("astropy",)),
+    ],
+)
+def test_heavy_modules_not_imported(module, allowed):
+    assert set(imported_heavy_modules(module)) <= set(allowed)
+
+
+def test_config_and_log_on_first_use():
+    code = (
+        "import sys, padre_sharp; "
+        "assert 'config' not in vars(padre_sharp); "
+        "assert 'padre_sharp.util.logger' not in sys.modules; "
+        "padre_sharp.log.debug('first use'); "
+        "print(padre_sharp.config.has_section('logger'), padre_sharp.log.name)"
+    )
+    assert run_python(code).stdout.split() == ["True", "padre_sharp"]
+
+
+def test_lazy_module():
+    module = LazyModule("json")
+    assert module.dumps([1]) == "[1]"
+    with pytest.raises(AttributeError):
+        module.not_a_function
+
+
+def test_lazy_object():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return [3, 1, 2]
+
+    proxy = LazyObject(factory)
+    assert calls == []
+    assert proxy.index(1) == 1
+    proxy.sort()
+    assert proxy.copy() == [1, 2, 3]
+    assert calls == [1]
@@ -0,0 +1,99 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+import padre_sharp
+import padre_sharp.calibration as calib
+from padre_sharp.calibration import calibration, manifest, registry
+
+RAW_FILENAME = Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+    return Path(shutil.copy(RAW_FILENAME, tmp_path))
+
+
+def test_manifest_record(tmp_path):
+    input_path = tmp_path / "input.dat"
+    input_path.write_bytes(b"data")
+    output = tmp_path / "output.fits"
+    output.write_bytes(b"")
+    processing_manifest = manifest.ProcessingManifest(tmp_path / "manifest.sqlite")
+    assert processing_manifest.is_current(input_path, "l1") is None
+
+    processing_manifest.record(input_path, [output], "l1", "calib:1")
+    entry = processing_manifest.get(input_path, "l1")
+    assert entry.input_hash == manifest.file_hash(input_path)
+    assert entry.version == padre_sharp.__version__
+    assert processing_manifest.is_current(input_path, "l1", "calib:1") == [output]
+    # Other processing options and calibrations are not recorded
+    assert processing_manifest.is_current(input_path, "ql", "calib:1") is None
+    assert processing_manifest.is_current(input_path, "l1", "calib:2") is None
+
+    # Touched but unchanged
+    os.utime(input_path, ns=(0, 0))
+    assert processing_manifest.is_current(input_path, "l1", "calib:1") == [output]
+    assert processing_manifest.get(input_path, "l1").mtime_ns == 0
+
+    input_path.write_bytes(b"DATA")
+    os.utime(input_path, ns=(1, 1))
+    assert processing_manifest.is_current(input_path, "l1", "calib:1") is None
+
+    processing_manifest.forget(input_path)
+    assert processing_manifest.get(input_path, "l1") is None
+
+
+def test_manifest_version(tmp_path, monkeypatch):
+    input_path = tmp_path / "input.dat"
+    input_path.write_bytes(b"data")
+    processing_manifest = manifest.ProcessingManifest(tmp_path / "manifest.sqlite")
+    processing_manifest.record(input_path, [])
+    assert processing_manifest.is_current(input_path) == []
+    monkeypatch.setattr(padre_sharp, "__version__", "99.0.0")
+    assert processing_manifest.is_current(input_path) is None
+
+
+def test_process_file_skips_unchanged(raw_file, monkeypatch):
+    outputs = calib.process_file(raw_file)
+    with monkeypatch.context() as m:
+        m.setattr(calibration, "calibrate_product", None)
+        assert calib.process_file(raw_file) == outputs
+        with pytest.raises(TypeError):
+            calib.process_file(raw_file, force=True)
+
+    # A missing output is written again
+    outputs[0].unlink()
+    assert calib.process_file(raw_file) == outputs
+    assert outputs[0].exists()
+
+
+def test_process_file_changed_input(raw_file, monkeypatch):
+    calib.process_file(raw_file)
+    with open(raw_file, "ab") as fh:
+        fh.write(b"\0")
+    monkeypatch.setattr(calibration, "calibrate_product", None)
+    with pytest.raises(TypeError):
+        calib.process_file(raw_file)
+
+
+def test_process_file_calibration_identity(tmp_path, monkeypatch):
+    l0_filename = Path("padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits")
+    assert calibration._calibration_identity(l0_filename) == ""
+    assert calibration._calibration_identity(l0_filename, to_level="ql") == ""
+
+    calibration_dir = tmp_path / "calibration"
+    calibration_dir.mkdir()
+    calib_file = calibration_dir / "sharp_calib_20250101_20260101.ecsv"
+    calib_file.write_text("")
+    monkeypatch.setenv("SHARP_CALIBRATIONDIR", str(calibration_dir))
+    registry.get_calibration_registry().clear()
+    identity = calibration._calibration_identity(l0_filename)
+    assert identity.startswith(str(calib_file.resolve()))
+    assert identity == manifest.calibration_identity(calib_file)
+    # Decoding does not use the calibration
+    raw_filename = Path("padre_sharp_raw_20250503T042550_v0.0.0.bin")
+    assert calibration._calibration_identity(raw_filename, to_level="l0") == ""
+    assert calibration._calibration_identity(raw_filename, to_level="l1") == identity
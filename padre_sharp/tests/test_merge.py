@@ -0,0 +1,236 @@
+from pathlib import Path
+
+import astropy.units as u
+import numpy as np
+import pytest
+from astropy.time import Time
+
+import padre_sharp.calibration as calib
+from padre_sharp.calibration import merge
+from padre_sharp.calibration.calibration import DataProduct
+from padre_sharp.io import decode
+
+START_TIME = Time("2025-05-03T04:00:00")
+EPOCH = "2025-05-03T04:00:00.000000000"
+
+
+def make_events(coarse_times, seed=0):
+    rng = np.random.default_rng(seed)
+    events = np.zeros(len(coarse_times), dtype=decode.EVENT_DTYPE)
+    events["coarse_time"] = coarse_times
+    events["fine_time"] = rng.integers(0, 2**16, len(events))
+    events["channel"] = rng.integers(0, 4, len(events))
+    events["adc"] = rng.integers(0, 4096, len(events))
+    events["energy"] = rng.uniform(0, 100, len(events))
+    return decode.sort_events(events)
+
+
+def write_eventlist(output_dir, events, time=START_TIME, epoch=EPOCH):
+    product = DataProduct(
+        instrument="sharp",
+        time=time,
+        level="l1",
+        descriptor="eventlist",
+        data={"events": events},
+        epoch=epoch,
+    )
+    return product.write(output_dir)
+
+
+def read_events(filename):
+    return DataProduct.from_file(filename).data["events"]
+
+
+def assert_events_equal(events, expected):
+    assert len(events) == len(expected)
+    for name in decode.EVENT_DTYPE.names:
+        np.testing.assert_array_equal(events[name], expected[name])
+
+
+def test_event_list_writer(tmp_path):
+    events = make_events(np.arange(2**47, 2**47 + 1000))
+    events["packet_index"] = 2**32 - 1 - np.arange(len(events))
+    events["flags"] = np.arange(len(events))
+    events["energy"][::3] = np.nan
+    product = DataProduct(
+        instrument="sharp", time=START_TIME, level="l1", descriptor="eventlist"
+    )
+    filename = tmp_path / product.filename
+    with merge.EventListWriter(filename, product.primary_hdu()) as writer:
+        for start in range(0, len(events), 300):
+            writer.write(events[start : start + 300])
+    assert writer.num_rows == len(events)
+
+    read_product = DataProduct.from_file(filename)
+    assert read_product.level == "l1"
+    assert_events_equal(read_product.data["events"], events)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, merge.DEFAULT_CHUNK_SIZE])
+def test_merge_eventlists(tmp_path, chunk_size):
+    all_events = [
+        make_events(np.sort(np.random.default_rng(i).integers(0, 50, 200)), seed=i)
+        for i in range(3)
+    ]
+    # An overlapping downlink repeats some of the events of another file
+    all_events.append(all_events[0][50:120].copy())
+    all_events[3]["packet_index"] = 7
+    # And a file without events
+    all_events.append(all_events[0][:0])
+    input_dir = tmp_path / "inputs"
+    input_dir.mkdir()
+    filenames = [
+        write_eventlist(input_dir, events, START_TIME + i * u.min)
+        for i, events in enumerate(all_events)
+    ]
+
+    output = merge.merge_eventlists(
+        filenames, output_dir=tmp_path, chunk_size=chunk_size
+    )
+    assert output == tmp_path / "padre_sharp_l1_eventlist_20250503T040000_v0.0.0.fits"
+    assert DataProduct.from_file(output).epoch == EPOCH
+    events = read_events(output)
+    keys = decode.event_keys(events)
+    assert np.all(keys[1:] >= keys[:-1])
+    expected = np.concatenate(all_events[:3])
+    expected = expected[
+        np.lexsort([expected[name] for name in reversed(merge.DUPLICATE_COLUMNS)])
+    ]
+    assert_events_equal(events, expected)
+
+
+def test_merge_equal_times(tmp_path):
+    # More events of one time than fit in a chunk
+    first = make_events(np.full(20, 5), seed=1)
+    second = make_events(np.array([4, 5, 5, 6]), seed=2)
+    filenames = [
+        write_eventlist(tmp_path, first),
+        write_eventlist(tmp_path, second, START_TIME + 1 * u.s),
+    ]
+    output = merge.merge_eventlists(
+        filenames, output_dir=tmp_path / "out", chunk_size=3
+    )
+    events = read_events(output)
+    np.testing.assert_array_equal(events["coarse_time"], [4] + [5] * 22 + [6])
+
+
+def test_merge_unsorted(tmp_path):
+    events = make_events(np.arange(10))[::-1]
+    filename = write_eventlist(tmp_path, events)
+    with pytest.raises(ValueError, match="not time sorted"):
+        merge.merge_eventlists([filename], output_dir=tmp_path / "out", chunk_size=4)
+    assert not (tmp_path / "out" / filename.name).exists()
+
+
+def test_merge_repeated_events(tmp_path):
+    events = make_events(np.array([1, 2, 2, 3]), seed=1)
+    # An event seen twice within one input is kept twice
+    events[2] = events[1]
+    repeated = np.concatenate([events[:3], events[1:2]])
+    filenames = [
+        write_eventlist(tmp_path, events),
+        write_eventlist(tmp_path, repeated, START_TIME + 1 * u.s),
+    ]
+    output = merge.merge_eventlists(
+        filenames, output_dir=tmp_path / "out", chunk_size=2
+    )
+    # The second input repeats the first three events, with one more copy
+    expected = np.concatenate([events[:1], np.repeat(events[1:2], 3), events[3:]])
+    assert_events_equal(read_events(output), expected)
+
+
+def test_merge_clocks(tmp_path):
+    # The clock restarted between the files, their coarse times overlap
+    before = make_events(np.arange(100, 200, 10), seed=1)
+    after = before.copy()
+    after["energy"] += 1
+    later_epoch = "2025-05-03T04:00:02.500000000"
+    filenames = [
+        write_eventlist(tmp_path, after, START_TIME + 1 * u.min, later_epoch),
+        write_eventlist(tmp_path, before),
+    ]
+    output = merge.merge_eventlists(
+        filenames, output_dir=tmp_path / "out", chunk_size=3
+    )
+    assert DataProduct.from_file(output).epoch == EPOCH
+    events = read_events(output)
+    # No event of one clock is a duplicate of an event of the other
+    assert len(events) == 20
+    np.testing.assert_array_equal(events["energy"][::2], before["energy"])
+    np.testing.assert_array_equal(events["energy"][1::2], after["energy"])
+    # The same UTC times as on their own clock
+    np.testing.assert_allclose(
+        decode.event_times(events[1::2], EPOCH),
+        decode.event_times(after, later_epoch),
+        atol=1 / 2**16,
+    )
+    np.testing.assert_array_equal(
+        events["coarse_time"][1::2],
+        before["coarse_time"] + 2 + (before["fine_time"] >= 2**15),
+    )
+
+    product = DataProduct(
+        instrument="sharp",
+        time=START_TIME,
+        level="l1",
+        descriptor="eventlist",
+        data={"events": before},
+    )
+    no_epoch = product.write(tmp_path / "out")
+    with pytest.raises(ValueError, match="other clocks"):
+        merge.merge_eventlists([filenames[0], no_epoch], output_dir=tmp_path / "out")
+
+
+def test_merge_daily(tmp_path):
+    # The clock epoch is 20 hours before midnight
+    midnight = 20 * 3600
+    all_events = [
+        make_events(np.arange(midnight - 10, midnight + 10)),
+        make_events(np.arange(midnight + 100, midnight + 110)),
+        make_events(np.arange(midnight - 100, midnight - 90)),
+    ]
+    filenames = [
+        write_eventlist(tmp_path, events, START_TIME + time)
+        for events, time in zip(all_events, [19.9 * u.h, 20.1 * u.h, 19 * u.h])
+    ]
+    outputs = merge.merge_daily(filenames, output_dir=tmp_path / "daily")
+    assert [output.name for output in outputs] == [
+        "padre_sharp_l1_eventlist_20250503T000000_v0.0.0.fits",
+        "padre_sharp_l1_eventlist_20250504T000000_v0.0.0.fits",
+    ]
+    # The first file spans midnight, its events are split between the days
+    first_day, second_day = (read_events(output) for output in outputs)
+    assert len(first_day) == 20
+    assert np.all(first_day["coarse_time"] < midnight)
+    assert len(second_day) == 20
+    assert np.all(second_day["coarse_time"] >= midnight)
+    assert DataProduct.from_file(outputs[1]).epoch == EPOCH
+    with pytest.raises(ValueError, match="l1 event list"):
+        merge.merge_eventlists(
+            [Path("padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits")]
+        )
+
+
+def test_merge_daily_no_epoch(tmp_path):
+    product = DataProduct(
+        instrument="sharp",
+        time=START_TIME,
+        level="l1",
+        descriptor="eventlist",
+        data={"events": make_events(np.arange(10))},
+    )
+    filename = product.write(tmp_path)
+    with pytest.raises(ValueError, match="no clock epoch"):
+        merge.merge_daily([filename], output_dir=tmp_path / "daily")
+
+
+def test_l1_events_sorted():
+    product = calib.DataProduct.from_file(
+        "padre_sharp/tests/data/PADRESP13_250503042550.DAT"
+    )
+    l0_product = calib.calibrate_product(product)
+    l0_keys = decode.event_keys(l0_product.data["events"])
+    l1_product = calib.calibrate_product(l0_product)
+    keys = decode.event_keys(l1_product.data["events"])
+    assert np.all(keys[1:] >= keys[:-1])
+    np.testing.assert_array_equal(keys, np.sort(l0_keys))
@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import astropy.units as u
+import numpy as np
+import pytest
+from astropy.table import Table
+from astropy.time import Time
+
+import padre_sharp.calibration as calib
+from padre_sharp.calibration import registry
+from padre_sharp.util import resources
+
+
+def write_calibration_file(directory, name, gain=1.0):
+    path = Path(directory) / name
+    Table({"channel": [0, 1], "gain": [gain, gain]}).write(path, format="ascii.ecsv")
+    return path
+
+
+@pytest.fixture
+def calibration_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_CALIBRATIONDIR", str(tmp_path))
+    return tmp_path
+
+
+def test_calibration_entry():
+    entry = registry.CalibrationEntry.from_path(
+        "padre_sharp_calib_20220401_20220501T120000.ecsv"
+    )
+    assert entry.start == Time("2022-04-01").unix
+    assert entry.end == Time("2022-05-01T12:00:00").unix
+    assert registry.CalibrationEntry.from_path("README.rst") is None
+    assert registry.CalibrationEntry.from_path("sharp_calib_20220501_20220401") is None
+
+
+def test_lookup(calibration_dir, tmp_path_factory):
+    package_dir = tmp_path_factory.mktemp("package")
+    write_calibration_file(package_dir, "padre_sharp_calib_20250101_20250201.ecsv")
+    write_calibration_file(package_dir, "padre_sharp_calib_20250201_20250301.ecsv")
+    # Overrides the package file with the same start
+    write_calibration_file(calibration_dir, "padre_sharp_calib_20250201_20250301.ecsv")
+    # A long lived file with a short lived one inside it
+    write_calibration_file(calibration_dir, "padre_sharp_calib_20250301_20260101.ecsv")
+    write_calibration_file(calibration_dir, "padre_sharp_calib_20250501_20250502.ecsv")
+    (calibration_dir / "notes.txt").write_text("not a calibration file")
+
+    calibration_registry = registry.CalibrationRegistry([package_dir, calibration_dir])
+    assert len(calibration_registry.entries) == 5
+
+    def lookup(time):
+        entry = calibration_registry.lookup(Time(time))
+        return entry and (entry.path.parent, entry.path.name[18:35])
+
+    assert lookup("2024-12-31T23:59:59") is None
+    assert lookup("2025-01-01") == (package_dir, "20250101_20250201")
+    assert lookup("2025-02-28T23:59:59") == (calibration_dir, "20250201_20250301")
+    assert lookup("2025-04-01") == (calibration_dir, "20250301_20260101")
+    assert lookup("2025-05-01T12:00:00") == (calibration_dir, "20250501_20250502")
+    assert lookup("2025-05-02") == (calibration_dir, "20250301_20260101")
+    assert lookup("2026-01-01") is None
+    assert calibration_registry.num_scans == 1
+
+
+def test_read_cache(tmp_path):
+    paths = [
+        write_calibration_file(
+            tmp_path, f"padre_sharp_calib_2025010{i}_2025010{i + 1}.ecsv"
+        )
+        for i in range(1, 4)
+    ]
+    calibration_registry = registry.CalibrationRegistry([tmp_path], cache_size=2)
+    assert calibration_registry.read(paths[0]) is calibration_registry.read(paths[0])
+    assert calibration_registry.num_reads == 1
+    assert calibration_registry.num_hits == 1
+    calibration_registry.read(paths[1])
+    calibration_registry.read(paths[2])
+    # The least recently used file was evicted
+    calibration_registry.read(paths[0])
+    assert calibration_registry.num_reads == 4
+
+    with pytest.raises(FileNotFoundError):
+        calibration_registry.read(tmp_path / "missing")
+
+
+def test_calibration_lookup_hits_disk_once(calibration_dir):
+    calib_file = write_calibration_file(
+        calibration_dir, "padre_sharp_calib_20250503_20250504.ecsv", gain=2.0
+    )
+    # 10,000 files spread over the day
+    times = Time("2025-05-03") + np.arange(10_000) * 8.6 * u.s
+    for time in times:
+        calibration = calib.read_calibration_file(calib.get_calibration_file(time))
+        assert calibration["gain"][0] == 2.0
+    assert calib.get_calibration_file(times[0]) == calib_file
+    calibration_registry = registry.get_calibration_registry()
+    assert calibration_registry.num_scans == 1
+    assert calibration_registry.num_reads == 1
+
+
+def test_rescan_on_change(calibration_dir):
+    calibration_registry = registry.get_calibration_registry()
+    assert calibration_registry.lookup(Time("2025-05-03")) is None
+    assert registry.get_calibration_registry() is calibration_registry
+    calib_file = write_calibration_file(
+        calibration_dir, "padre_sharp_calib_20250503_20250504.ecsv"
+    )
+    # A warm process finds the new file without being told
+    assert calib.get_calibration_file(Time("2025-05-03")) == calib_file
+    assert calib.get_calibration_file(Time("2025-05-03")) == calib_file
+    new_registry = registry.get_calibration_registry()
+    assert new_registry is not calibration_registry
+    assert new_registry.num_scans == 1
+    calib_file.unlink()
+    assert registry.get_calibration_registry().lookup(Time("2025-05-03")) is None
+    stats = resources.get_resource_cache().stats()["calibration_registry"]
+    assert (stats.misses, stats.invalidations) == (3, 2)
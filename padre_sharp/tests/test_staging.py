@@ -0,0 +1,92 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+import padre_sharp.calibration as calib
+from padre_sharp.io import staging
+from padre_sharp.util import config
+
+
+def test_scratch_directory(tmp_path):
+    with staging.ScratchDirectory(tmp_path) as scratch:
+        assert scratch.path.parent == tmp_path / staging.STAGING_DIRNAME
+        scratch_file = scratch.path / "output.fits"
+        scratch_file.write_bytes(b"data")
+        (scratch.path / "unpublished.fits").write_bytes(b"")
+        assert not (tmp_path / "output.fits").exists()
+        assert scratch.publish(scratch_file) == tmp_path / "output.fits"
+        with pytest.raises(ValueError):
+            scratch.publish(tmp_path / "output.fits")
+        scratch_path = scratch.path
+    assert (tmp_path / "output.fits").read_bytes() == b"data"
+    assert not (tmp_path / "unpublished.fits").exists()
+    assert not scratch_path.exists()
+
+
+def test_scratch_directory_exception(tmp_path):
+    with pytest.raises(RuntimeError):
+        with staging.ScratchDirectory(tmp_path) as scratch:
+            (scratch.path / "output.fits").write_bytes(b"data")
+            raise RuntimeError()
+    assert list((tmp_path / staging.STAGING_DIRNAME).iterdir()) == []
+    assert not (tmp_path / "output.fits").exists()
+
+
+def test_concurrent_publish(tmp_path):
+    def write(i):
+        with staging.ScratchDirectory(tmp_path) as scratch:
+            scratch_file = scratch.path / "output.fits"
+            scratch_file.write_bytes(bytes([i]) * 100_000)
+            return scratch.publish(scratch_file)
+
+    with ThreadPoolExecutor(8) as executor:
+        outputs = list(executor.map(write, range(32)))
+    assert set(outputs) == {tmp_path / "output.fits"}
+    # One whole file, never a mix of writers
+    data = outputs[0].read_bytes()
+    assert len(data) == 100_000 and len(set(data)) == 1
+
+
+def test_clean_stale_scratch(tmp_path):
+    staging_dir = tmp_path / staging.STAGING_DIRNAME
+    staging_dir.mkdir()
+    # A process that has exited
+    process = subprocess.run(
+        [sys.executable, "-c", "import os; print(os.getpid())"],
+        capture_output=True,
+        text=True,
+    )
+    dead = staging_dir / f"{socket.gethostname()}-{process.stdout.strip()}-abc"
+    alive = staging_dir / f"{socket.gethostname()}-{os.getpid()}-abc"
+    other_host = staging_dir / "other-host-1-abc"
+    old = staging_dir / "other-host-2-abc"
+    for scratch_dir in [dead, alive, other_host, old]:
+        scratch_dir.mkdir()
+        (scratch_dir / "partial.fits").write_bytes(b"")
+    os.utime(old, (time.time() - 10, time.time() - 10))
+
+    removed = staging.clean_stale_scratch(tmp_path, max_age=5)
+    assert sorted(removed) == sorted([dead, old])
+    assert sorted(staging_dir.iterdir()) == sorted([alive, other_host])
+
+
+def test_process_file_output_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARP_OUTPUTDIR", str(tmp_path / "outputs"))
+    assert config.get_and_create_output_dir() == tmp_path / "outputs"
+    outputs = calib.process_file(
+        Path("padre_sharp/tests/data/PADRESP13_250503042550.DAT")
+    )
+    assert outputs == [
+        tmp_path / "outputs" / "padre_sharp_l0_eventlist_20250503T042550_v0.0.0.fits"
+    ]
+    assert sorted(p.name for p in (tmp_path / "outputs").iterdir()) == [
+        staging.STAGING_DIRNAME,
+        outputs[0].name,
+    ]
+    assert list((tmp_path / "outputs" / staging.STAGING_DIRNAME).iterdir()) == []
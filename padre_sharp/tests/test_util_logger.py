@@ -0,0 +1,197 @@
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import padre_sharp
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, gate=None):
+        super().__init__()
+        self.records = []
+        self.gate = gate
+        self.waiting = threading.Event()
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.waiting.set()
+            self.gate.wait()
+        self.records.append(record)
+
+    @property
+    def messages(self):
+        return [record.getMessage() for record in self.records]
+
+
+@pytest.fixture
+def log():
+    """The package logger with a list handler, restored after the test."""
+    padre_sharp.log.name  # set up the logger
+    log = logging.getLogger("padre_sharp")
+    handlers = log.handlers[:]
+    for handler in handlers:
+        log.removeHandler(handler)
+    yield log
+    log.disable_async_logging()
+    for handler in log.handlers[:]:
+        log.removeHandler(handler)
+    for handler in handlers:
+        log.addHandler(handler)
+
+
+def log_in_worker(i):
+    padre_sharp.log.info(f"worker {i}")
+    return os.getpid()
+
+
+def test_async_logging(log):
+    handler = ListHandler()
+    log.addHandler(handler)
+    log.enable_async_logging()
+    assert log.async_logging_enabled()
+    assert log.handlers != [handler]
+    for i in range(100):
+        log.info(f"message {i}")
+    log.disable_async_logging()
+    assert log.handlers == [handler]
+    assert handler.messages == [f"message {i}" for i in range(100)]
+
+
+def test_async_logging_drop(log):
+    gate = threading.Event()
+    handler = ListHandler(gate)
+    log.addHandler(handler)
+    log.enable_async_logging(queue_size=2, full_policy="drop")
+    (queue_handler,) = log.handlers
+    log.info("message 0")
+    # Wait for the listener to hold the first record in the blocked handler
+    handler.waiting.wait()
+    for i in range(1, 10):
+        log.info(f"message {i}")
+    # Two records wait in the queue, the others are dropped
+    assert queue_handler.num_dropped == 7
+    gate.set()
+    log.disable_async_logging()
+    log.info("after")
+    kept = [f"message {i}" for i in range(10 - queue_handler.num_dropped)]
+    assert handler.messages == kept + [
+        f"Dropped {queue_handler.num_dropped} log records, the log queue was full.",
+        "after",
+    ]
+
+
+def test_async_logging_drop_reported(log):
+    gate = threading.Event()
+    handler = ListHandler(gate)
+    log.addHandler(handler)
+    log.enable_async_logging(queue_size=2, full_policy="drop")
+    (queue_handler,) = log.handlers
+    log.info("message 0")
+    # Wait for the listener to hold the first record in the blocked handler
+    handler.waiting.wait()
+    for i in range(1, 5):
+        log.info(f"message {i}")
+    num_dropped = queue_handler.num_dropped
+    assert num_dropped == 2
+    gate.set()
+    while not queue_handler.queue.empty():
+        time.sleep(0.001)
+    log.info("after")
+    log.disable_async_logging()
+    assert handler.messages[-2:] == [
+        f"Dropped {num_dropped} log records, the log queue was full.",
+        "after",
+    ]
+
+
+def test_async_logging_dropped_at_exit(log):
+    gate = threading.Event()
+    handler = ListHandler(gate)
+    log.addHandler(handler)
+    log.enable_async_logging(queue_size=1, full_policy="drop")
+    (queue_handler,) = log.handlers
+    log.info("message 0")
+    # Wait for the listener to hold the first record in the blocked handler
+    handler.waiting.wait()
+    for i in range(1, 5):
+        log.info(f"message {i}")
+    gate.set()
+    log.disable_async_logging()
+    assert handler.messages[-1] == (
+        f"Dropped {queue_handler.num_dropped} log records, the log queue was full."
+    )
+
+
+def test_async_logging_block(log):
+    handler = ListHandler()
+    log.addHandler(handler)
+    log.enable_async_logging(queue_size=1, full_policy="block")
+    for i in range(100):
+        log.info(f"message {i}")
+    log.disable_async_logging()
+    assert handler.messages == [f"message {i}" for i in range(100)]
+    with pytest.raises(ValueError, match="policy"):
+        log.enable_async_logging(full_policy="wait")
+
+
+def test_worker_logging(log):
+    handler = ListHandler()
+    log.addHandler(handler)
+    with log.worker_logging() as (initializer, initargs):
+        assert initializer is None and initargs == ()
+
+    log.enable_async_logging()
+    with log.worker_logging() as (initializer, initargs):
+        with ProcessPoolExecutor(2, initializer=initializer, initargs=initargs) as ex:
+            pids = set(ex.map(log_in_worker, range(20)))
+    log.disable_async_logging()
+    assert os.getpid() not in pids
+    assert sorted(handler.messages) == sorted(f"worker {i}" for i in range(20))
+    assert {record.process for record in handler.records} == pids
+
+
+def test_async_logging_from_config(tmp_path):
+    (tmp_path / "configrc").write_text(
+        "[logger]\nlog_to_file = False\nlog_async = True\nlog_queue_full = block\n"
+    )
+    code = (
+        "import padre_sharp; "
+        "padre_sharp.log.info('hello'); "
+        "print(padre_sharp.log.async_logging_enabled(), "
+        "padre_sharp.log.handlers[0].full_policy)"
+    )
+    stdout = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "SHARP_CONFIGDIR": str(tmp_path)},
+    ).stdout
+    assert "True block" in stdout
+    # Handled by the time the interpreter exits
+    assert "hello" in stdout
+
+
+def test_record_origin(log):
+    handler = ListHandler()
+    log.addHandler(handler)
+    log.info("message")
+    assert handler.records[-1].origin == __name__
+
+
+def test_warnings_logged_before_first_use():
+    code = (
+        "import padre_sharp; "
+        "from padre_sharp.util.exceptions import warn_user; "
+        "warn_user('early')"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert "WARNING: SHARPUserWarning: early" in result.stderr
@@ -0,0 +1,143 @@
+"""Tests for packets.py"""
+
+import os
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pytest
+from ccsdspy import utils
+
+from padre_sharp.util import packets
+
+test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+
+
+def test_packet_boundaries():
+    file_bytes = packets.read_file_bytes(test_file)
+    offsets, lengths = packets.packet_boundaries(file_bytes)
+    expected = [len(packet) for packet in utils.split_packet_bytes(test_file)]
+    np.testing.assert_array_equal(lengths, expected)
+    np.testing.assert_array_equal(offsets, np.cumsum([0] + expected[:-1]))
+
+
+def test_packet_boundaries_truncated():
+    file_bytes = packets.read_file_bytes(test_file)
+    # A partial last packet is dropped
+    offsets, lengths = packets.packet_boundaries(file_bytes[:-10])
+    assert len(offsets) == 10
+    # Garbage bytes too short for a header are ignored
+    offsets, lengths = packets.packet_boundaries(
+        np.append(file_bytes, np.uint8([1, 2, 3]))
+    )
+    assert len(offsets) == 11
+
+
+def test_packet_checksums():
+    file_bytes = packets.read_file_bytes(BytesIO(test_file.read_bytes()))
+    offsets, lengths = packets.packet_boundaries(file_bytes)
+    checksums = packets.packet_checksums(file_bytes, offsets, lengths)
+    expected = [
+        np.bitwise_xor.reduce(np.frombuffer(packet, dtype=np.uint8))
+        for packet in utils.split_packet_bytes(test_file)
+    ]
+    np.testing.assert_array_equal(checksums, expected)
+
+
+def test_packet_checksums_empty():
+    file_bytes = packets.read_file_bytes(BytesIO(b""))
+    offsets, lengths = packets.packet_boundaries(file_bytes)
+    assert len(offsets) == 0
+    assert len(packets.packet_checksums(file_bytes, offsets, lengths)) == 0
+
+
+def test_packet_view():
+    view = packets.scan_packets(test_file)
+    assert packets.scan_packets(view) is view
+    assert len(view) == 11
+    assert view.num_trailing_bytes == 0
+
+    with pytest.warns(UserWarning, match="Missing packets found"):
+        headers = utils.read_primary_headers(test_file)
+    np.testing.assert_array_equal(view.headers["apid"], headers["CCSDS_APID"])
+    np.testing.assert_array_equal(
+        view.headers["sequence_count"], headers["CCSDS_SEQUENCE_COUNT"]
+    )
+    np.testing.assert_array_equal(
+        view.headers["secondary_flag"], headers["CCSDS_SECONDARY_FLAG"]
+    )
+    np.testing.assert_array_equal(
+        view.headers["version"], headers["CCSDS_VERSION_NUMBER"]
+    )
+
+    for i, packet in enumerate(utils.split_packet_bytes(test_file)):
+        assert view.packet(i).tobytes() == packet
+        assert view.payload(i).tobytes() == packet[packets.PRIMARY_HEADER_NUM_BYTES :]
+        assert np.shares_memory(view.payload(i), view.file_bytes)
+
+
+def test_open_packets(tmp_path, cache_dir, monkeypatch):
+    raw_file = tmp_path / test_file.name
+    raw_file.write_bytes(test_file.read_bytes())
+    view = packets.open_packets(raw_file)
+    assert isinstance(view.file_bytes, np.memmap)
+    assert len(view) == 11
+    sidecars = list((cache_dir / "packet_index").glob("*.npz"))
+    assert len(sidecars) == 1
+
+    # The index is now loaded instead of walking the file again
+    def fail(file_bytes):
+        raise AssertionError("packet index was rebuilt")
+
+    with monkeypatch.context() as m:
+        m.setattr(packets, "packet_boundaries", fail)
+        cached = packets.open_packets(raw_file)
+        np.testing.assert_array_equal(cached.headers, view.headers)
+        assert cached.content_hash == view.content_hash
+        assert np.shares_memory(cached.payload(3), cached.file_bytes)
+
+        # Touching the file keeps the index if the contents are unchanged
+        os.utime(raw_file, ns=(0, 0))
+        packets.open_packets(raw_file)
+
+    # Changing the contents rebuilds it
+    raw_file.write_bytes(test_file.read_bytes()[:-10])
+    assert len(packets.open_packets(raw_file)) == 10
+    assert len(list((cache_dir / "packet_index").glob("*"))) == 1
+
+
+def test_open_packets_no_cache(tmp_path, cache_dir):
+    empty_file = tmp_path / "empty.bin"
+    empty_file.touch()
+    assert len(packets.open_packets(empty_file)) == 0
+    assert len(packets.open_packets(test_file, use_cache=False)) == 11
+    assert len(list((cache_dir / "packet_index").glob("*.npz"))) == 1
+
+
+def test_packet_hashes(monkeypatch):
+    file_bytes = packets.read_file_bytes(test_file)
+    offsets, lengths = packets.packet_boundaries(file_bytes)
+    weights = packets._hash_weights()
+    assert np.all(weights[: packets.PRIMARY_HEADER_NUM_BYTES] == 0)
+    expected = [
+        np.sum(np.frombuffer(packet, dtype=np.uint8) * weights[: len(packet)])
+        for packet in utils.split_packet_bytes(test_file)
+    ]
+    hashes = packets.packet_hashes(file_bytes, offsets, lengths)
+    np.testing.assert_array_equal(hashes, expected)
+    assert len(np.unique(hashes)) == len(hashes)
+
+    # Hashed a few packets at a time, or one at a time
+    for chunk_size in [50_000, 1]:
+        monkeypatch.setattr(packets, "HASH_CHUNK_SIZE", chunk_size)
+        np.testing.assert_array_equal(
+            packets.packet_hashes(file_bytes, offsets, lengths), expected
+        )
+
+    # One byte of difference changes the hash
+    changed = file_bytes.copy()
+    changed[offsets[3] + 100] ^= 1
+    changed_hashes = packets.PacketView(changed).hashes
+    assert changed_hashes[3] != hashes[3]
+    np.testing.assert_array_equal(np.delete(changed_hashes, 3), np.delete(hashes, 3))
+    assert len(packets.packet_hashes(file_bytes, offsets[:0], lengths[:0])) == 0
@@ -0,0 +1,68 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from padre_sharp.util import resources
+
+
+def test_get():
+    cache = resources.ResourceCache()
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    value = cache.get("value", factory, token=1)
+    assert cache.get("value", factory, token=1) is value
+    assert cache.get("value", factory, token=2) is not value
+    assert len(calls) == 2
+    stats = cache.stats()["value"]
+    assert (stats.hits, stats.misses, stats.invalidations) == (1, 2, 1)
+    assert stats.hit_rate == pytest.approx(1 / 3)
+
+
+def test_invalidate():
+    cache = resources.ResourceCache()
+    value = cache.get("value", object)
+    cache.get("other", object)
+    cache.invalidate("value")
+    assert "value" not in cache and "other" in cache
+    assert cache.get("value", object) is not value
+    cache.invalidate()
+    assert "value" not in cache and "other" not in cache
+    assert cache.stats()["value"].invalidations == 2
+    assert cache.stats()["value"].misses == 2
+
+
+def test_concurrent_get():
+    cache = resources.ResourceCache()
+
+    def slow_factory():
+        time.sleep(0.01)
+        return object()
+
+    with ThreadPoolExecutor(8) as executor:
+        values = list(
+            executor.map(lambda _: cache.get("value", slow_factory), range(16))
+        )
+    assert all(value is values[0] for value in values)
+    assert cache.stats()["value"].misses == 1
+
+
+def test_path_token(tmp_path):
+    token = resources.path_token([tmp_path, tmp_path / "missing"])
+    assert token[1] == (str(tmp_path / "missing"), None)
+    os.utime(tmp_path, ns=(0, 0))
+    token = resources.path_token([tmp_path])
+    (tmp_path / "new_file").write_text("")
+    assert resources.path_token([tmp_path]) != token
+
+
+def test_get_resource_cache():
+    with ThreadPoolExecutor(8) as executor:
+        caches = list(executor.map(lambda _: resources.get_resource_cache(), range(16)))
+    assert all(cache is caches[0] for cache in caches)
+    assert resources.get_resource_cache() is caches[0]
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+from padre_sharp.util import sidecar
+
+
+def test_sidecar_path(tmp_path, cache_dir):
+    path = tmp_path / "file.bin"
+    sidecar_file = sidecar.sidecar_path(path, "packet_index")
+    assert sidecar_file.parent == cache_dir / "packet_index"
+    assert sidecar_file.suffix == ".npz"
+    assert sidecar.sidecar_path(path, "time_index").name == sidecar_file.name
+    assert sidecar.sidecar_path(tmp_path / "other.bin", "packet_index") != sidecar_file
+
+
+def test_sidecar_round_trip(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"abc")
+    sidecar_file = sidecar.sidecar_path(path, "test")
+    assert sidecar.load_sidecar(sidecar_file, 1, path.stat(), ["keys"]) is None
+
+    sidecar.save_sidecar(sidecar_file, 1, path.stat(), keys=np.arange(3))
+    content = sidecar.load_sidecar(sidecar_file, 1, path.stat(), ["keys"])
+    np.testing.assert_array_equal(content["keys"], np.arange(3))
+    assert content["mtime_ns"] == path.stat().st_mtime_ns
+    assert sidecar.load_sidecar(sidecar_file, 2, path.stat(), ["keys"]) is None
+    assert sidecar.load_sidecar(sidecar_file, 1, path.stat(), ["other"]) is None
+    assert not list(sidecar_file.parent.glob("*.tmp"))
+
+
+def test_sidecar_stale(tmp_path):
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"abc")
+    sidecar_file = sidecar.sidecar_path(path, "test")
+    sidecar.save_sidecar(sidecar_file, 1, path.stat(), keys=np.arange(3))
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert sidecar.load_sidecar(sidecar_file, 1, path.stat(), ["keys"]) is None
+    # The caller can check a touched file further
+    content = sidecar.load_sidecar(
+        sidecar_file, 1, path.stat(), ["keys"], check_mtime=False
+    )
+    assert content["mtime_ns"] == stat.st_mtime_ns
+
+    path.write_bytes(b"abcd")
+    assert (
+        sidecar.load_sidecar(sidecar_file, 1, path.stat(), ["keys"], check_mtime=False)
+        is None
+    )
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from astropy.time import Time, TimeDelta
+
+from padre_sharp.util import time_conversion
+
+# A clock counting from the GPS epoch, far enough back to span leap seconds
+EPOCH = "1980-01-06T00:00:00"
+
+# Away from leap seconds, astropy spreads these over their whole day for unix
+# times and Julian dates
+COARSE_TIME = np.array([0, 10**9, 1_167_264_018, 1_167_264_018, 1_430_000_000])
+FINE_TIME = np.array([0, 32768, 1, 6554, 12345])
+
+
+@pytest.fixture
+def reference():
+    """The times computed row by row with astropy."""
+    epoch = Time(EPOCH, scale="utc")
+    return Time(
+        [
+            epoch + TimeDelta(int(coarse), fine / 2**16, format="sec")
+            for coarse, fine in zip(COARSE_TIME, FINE_TIME)
+        ]
+    )
+
+
+def test_spacecraft_to_unix(reference):
+    unix = time_conversion.spacecraft_to_unix(EPOCH, COARSE_TIME, FINE_TIME)
+    np.testing.assert_allclose(unix, reference.utc.unix, rtol=0, atol=1e-6)
+    unix_ns = time_conversion.spacecraft_to_unix(
+        EPOCH, COARSE_TIME, FINE_TIME, as_ns=True
+    )
+    assert unix_ns.dtype == np.int64
+    np.testing.assert_array_equal(unix_ns // 10**9, np.floor(unix).astype(np.int64))
+
+
+def test_spacecraft_to_tt2000(reference):
+    tt2000 = time_conversion.spacecraft_to_tt2000(EPOCH, COARSE_TIME, FINE_TIME)
+    expected = (reference - Time("2000-01-01T12:00:00", scale="tt")).to_value("ns")
+    np.testing.assert_allclose(tt2000, expected, rtol=0, atol=1e3)
+    # 2000-01-01T12:00:00 UTC is 64.184 s after J2000
+    assert time_conversion.spacecraft_to_tt2000(EPOCH, 630_763_213) == 64_184_000_000
+
+
+def test_spacecraft_to_jd(reference):
+    jd1, jd2 = time_conversion.spacecraft_to_jd(EPOCH, COARSE_TIME, FINE_TIME)
+    np.testing.assert_array_equal(jd1 % 1, 0.5)
+    np.testing.assert_allclose(
+        (jd1 - reference.utc.jd1) + (jd2 - reference.utc.jd2), 0, atol=1e-11
+    )
+
+
+def test_spacecraft_to_isot(reference):
+    isot = time_conversion.spacecraft_to_isot(EPOCH, COARSE_TIME, FINE_TIME, unit="ms")
+    np.testing.assert_array_equal(isot, reference.utc.isot)
+
+
+def test_spacecraft_to_time(reference):
+    time = time_conversion.spacecraft_to_time(EPOCH, COARSE_TIME, FINE_TIME)
+    np.testing.assert_allclose((time - reference).to_value("ns"), 0, atol=1)
+
+
+def test_leap_second():
+    # 2016-12-31T23:59:60 is the spacecraft second 1_167_264_017
+    coarse_time = 1_167_264_016 + np.arange(4)
+    isot = time_conversion.spacecraft_to_isot(EPOCH, coarse_time, unit="s")
+    np.testing.assert_array_equal(
+        isot,
+        [
+            "2016-12-31T23:59:59",
+            "2017-01-01T00:00:00",
+            "2017-01-01T00:00:00",
+            "2017-01-01T00:00:01",
+        ],
+    )
+    unix_ns = time_conversion.spacecraft_to_unix(
+        EPOCH, np.repeat(coarse_time, 4), np.tile([0, 1, 30000, 65535], 4), as_ns=True
+    )
+    assert np.all(np.diff(unix_ns) >= 0)
+
+
+def test_leap_second_table():
+    starts, offsets = time_conversion.leap_second_table()
+    assert offsets[0] == 10 * 10**9
+    assert np.all(np.diff(starts) > 0)
+    assert offsets[-1] >= 37 * 10**9
+
+
+def test_clock_epoch():
+    epoch = time_conversion.clock_epoch(Time("2025-05-03T04:25:50"), 969)
+    assert epoch == "2025-05-03T04:09:41.000000000"
+    isot = time_conversion.spacecraft_to_isot(epoch, [969, 1114], unit="s")
+    np.testing.assert_array_equal(isot, ["2025-05-03T04:25:50", "2025-05-03T04:28:15"])
+    # Leap seconds between the epoch and the reading are not counted by the clock
+    epoch = time_conversion.clock_epoch("2017-01-01T00:00:01", 1_167_264_019)
+    assert epoch == "1980-01-06T00:00:00.000000000"
@@ -1,9 +1,13 @@
+import tracemalloc
+from io import BytesIO
 from pathlib import Path
 
+import numpy as np
 import pytest
+from ccsdspy import utils
 
 import padre_sharp
-from padre_sharp.util import validation
+from padre_sharp.util import packets, validation
 
 
 def test_validate_packet_checksums():
@@ -20,3 +24,254 @@ def test_validate():
     warnings = validation.validate(test_file)
     assert len(warnings) == 1
     assert "No such file or directory:" in warnings[0]
+
+
+def make_packet(apid, seq_count, payload, valid_checksum=True):
+    """Build a CCSDS packet whose bytes XOR to 0 unless told otherwise."""
+    payload = bytearray(payload) + b"\x00"
+    header = bytearray(6)
+    header[0:2] = (0x0800 | apid).to_bytes(2, "big")
+    header[2:4] = (0xC000 | seq_count).to_bytes(2, "big")
+    header[4:6] = (len(payload) - 1).to_bytes(2, "big")
+    packet = header + payload
+    packet[-1] = np.bitwise_xor.reduce(np.frombuffer(bytes(packet), dtype=np.uint8))
+    if not valid_checksum:
+        packet[-1] ^= 0xFF
+    return bytes(packet)
+
+
+def test_find_checksum_errors():
+    bad = [1, 4]
+    stream = b"".join(
+        make_packet(160, i, bytes(range(i, i + 10 + i)), valid_checksum=i not in bad)
+        for i in range(6)
+    )
+    errors = validation.find_checksum_errors(BytesIO(stream))
+    np.testing.assert_array_equal(errors, bad)
+
+    warnings = validation.validate_packet_checksums(BytesIO(stream))
+    assert warnings == [
+        "ChecksumWarning: Packet 1 has a checksum error.",
+        "ChecksumWarning: Packet 4 has a checksum error.",
+    ]
+
+
+def test_find_checksum_errors_matches_per_packet_loop():
+    test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+    expected = [
+        i
+        for i, packet in enumerate(utils.split_packet_bytes(test_file))
+        if np.bitwise_xor.reduce(np.frombuffer(packet, dtype=np.uint8)) != 0
+    ]
+    np.testing.assert_array_equal(validation.find_checksum_errors(test_file), expected)
+
+
+def test_default_validation_has_no_checksum_findings():
+    # The SHARP checksum is not defined yet, the sample file must validate as
+    # it did before the checksum check was vectorized
+    test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+    expected = utils.validate(test_file)
+    findings = validation.validate(
+        test_file, custom_validators=validation.DEFAULT_CUSTOM_VALIDATORS
+    )
+    assert findings == expected
+    assert validation.validate_stream(test_file) == expected
+    assert not any(
+        finding.category == validation.FindingCategory.CHECKSUM
+        for finding in findings.findings
+    )
+
+
+@pytest.mark.parametrize("valid_apids", [None, [19], [160]])
+def test_validate_matches_ccsdspy(valid_apids):
+    test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+    stream = (
+        make_packet(160, 5, b"abc")
+        + test_file.read_bytes()
+        + make_packet(160, 3, b"def")
+        + make_packet(160, 9, b"ghi")
+    )
+    expected = utils.validate(BytesIO(stream), valid_apids)
+    assert validation.validate(BytesIO(stream), valid_apids) == expected
+
+
+def test_validate_truncated():
+    stream = make_packet(160, 0, b"abc") + make_packet(160, 1, b"def")
+    warnings = validation.validate(BytesIO(stream[:-2]))
+    assert warnings == [
+        "UserWarning: File appears truncated-- missing 2 byte (or maybe garbage at end)"
+    ]
+    warnings = validation.validate(BytesIO(stream + b"\x01\x02"))
+    assert len(warnings) == 2
+    assert "missing -2 byte" in warnings[1]
+
+
+def test_validate_custom_validators_share_view():
+    stream = b"".join(
+        make_packet(160, i, b"abc", valid_checksum=i != 2) for i in range(4)
+    )
+    views = []
+
+    def record_view(view):
+        views.append(view)
+        return []
+
+    warnings = validation.validate(
+        BytesIO(stream),
+        custom_validators=[
+            record_view,
+            validation.validate_packet_checksums,
+            record_view,
+        ],
+    )
+    assert warnings == ["ChecksumWarning: Packet 2 has a checksum error."]
+    assert len(views) == 2
+    assert views[0] is views[1]
+    assert isinstance(views[0], packets.PacketView)
+
+
+@pytest.mark.parametrize("chunk_size", [1000, 30_000, 10**7])
+@pytest.mark.parametrize("valid_apids", [None, [160]])
+def test_validate_stream_matches_validate(chunk_size, valid_apids):
+    test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+    stream = (
+        make_packet(160, 5, b"abc", valid_checksum=False)
+        + test_file.read_bytes()
+        + make_packet(160, 3, b"def")
+        + make_packet(160, 9, b"ghi")
+    )
+    for data in (stream, stream[:-2], stream + b"\x01\x02", b""):
+        expected = validation.validate(
+            BytesIO(data),
+            valid_apids,
+            custom_validators=[validation.validate_packet_checksums],
+        )
+        warnings = validation.validate_stream(
+            BytesIO(data), valid_apids, check_checksums=True, chunk_size=chunk_size
+        )
+        assert warnings == expected
+
+
+def test_validate_stream_missing_file():
+    warnings = validation.validate_stream(Path("missing_file.bin"))
+    assert len(warnings) == 1
+    assert "No such file or directory:" in warnings[0]
+
+
+def test_validate_stream_bounded_memory(tmp_path):
+    chunk_size = 1024 * 1024
+    num_packets = 10_000
+    test_file = tmp_path / "large.bin"
+    with open(test_file, "wb") as fh:
+        for i in range(num_packets):
+            fh.write(make_packet(160, i, bytes(4000), valid_checksum=i % 1000 != 0))
+    assert test_file.stat().st_size > 32 * chunk_size
+
+    tracemalloc.start()
+    warnings = validation.validate_stream(
+        test_file, check_checksums=True, chunk_size=chunk_size
+    )
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(warnings) == num_packets // 1000
+    assert peak < 8 * chunk_size
+
+
+def test_validation_findings():
+    stream = b"".join(
+        make_packet(160, i, b"abc", valid_checksum=i % 3 != 1)
+        for i in range(11)
+        if i not in (4, 5)
+    )
+    stream += make_packet(5, 0, b"abc")
+    findings = validation.validate(
+        BytesIO(stream),
+        valid_apids=[160],
+        custom_validators=[
+            validation.validate_packet_checksums,
+            lambda view: ["CustomWarning: something else."],
+        ],
+    )
+    assert isinstance(findings, validation.ValidationFindings)
+    assert findings.counts == {
+        validation.FindingCategory.UNKNOWN_APID: 1,
+        validation.FindingCategory.MISSING_PACKETS: 2,
+        validation.FindingCategory.CHECKSUM: 3,
+        validation.FindingCategory.OTHER: 1,
+    }
+    np.testing.assert_array_equal(
+        findings.indices(validation.FindingCategory.CHECKSUM), [1, 5, 8]
+    )
+    assert findings.summary() == [
+        "3 checksum errors in packets 1..8",
+        "1 unknown APID [5] in packets 9..9",
+        "2 missing packets for APID 160 in sequence counts 4..5",
+        "CustomWarning: something else.",
+    ]
+
+    expected = [
+        "UserWarning: Found unknown APID 5",
+        "UserWarning: Missing packets found [4, 5].",
+        "ChecksumWarning: Packet 1 has a checksum error.",
+        "ChecksumWarning: Packet 5 has a checksum error.",
+        "ChecksumWarning: Packet 8 has a checksum error.",
+        "CustomWarning: something else.",
+    ]
+    assert findings == expected
+    assert len(findings) == len(expected)
+    assert [findings[i] for i in range(-len(expected), len(expected))] == 2 * expected
+    assert findings[2:4] == expected[2:4]
+    with pytest.raises(IndexError):
+        findings[len(expected)]
+
+
+def make_headers(apids, seq_counts):
+    headers = np.zeros(len(apids), dtype=packets.HEADER_DTYPE)
+    headers["apid"] = apids
+    headers["sequence_count"] = seq_counts
+    return headers
+
+
+def gap_rows(*rows):
+    return np.array(list(rows), dtype=validation.SEQUENCE_GAP_DTYPE)
+
+
+def test_analyze_sequence_counts_wraparound():
+    seq_counts = [16380, 16381, 16382, 16383, 0, 1, 2]
+    gaps = validation.analyze_sequence_counts(make_headers([1] * 7, seq_counts))
+    assert len(gaps) == 0
+
+    seq_counts = [16381, 16382, 2, 3]
+    gaps = validation.analyze_sequence_counts(make_headers([1] * 4, seq_counts))
+    np.testing.assert_array_equal(gaps, gap_rows((1, 0, 2, 16383, 3)))
+
+
+def test_analyze_sequence_counts():
+    MISSING, DUPLICATE, OUT_OF_ORDER = validation.SequenceIssue
+    apids = [7, 5, 7, 5, 7, 5, 7, 7, 7, 7, 7, 5]
+    seq_counts = [0, 10, 1, 11, 4, 15, 5, 3, 4, 5, 6, 14]
+    gaps = validation.analyze_sequence_counts(make_headers(apids, seq_counts))
+    expected = gap_rows(
+        # APID 5: 12, 13 missing then 14 arrives late
+        (5, MISSING, 11, 12, 2),
+        (5, OUT_OF_ORDER, 11, 14, 1),
+        # APID 7: 2 missing, 3 arrives late, then 4 and 5 again
+        (7, MISSING, 7, 2, 1),
+        (7, OUT_OF_ORDER, 7, 3, 2),
+        (7, DUPLICATE, 8, 4, 2),
+    )
+    np.testing.assert_array_equal(gaps, expected)
+
+
+def test_analyze_sequence_counts_file():
+    test_file = Path(__file__).parent / "data" / "PADRESP13_250503042550.DAT"
+    gaps = validation.analyze_sequence_counts(test_file)
+    assert np.all(gaps["issue"] == validation.SequenceIssue.MISSING)
+    missing = np.concatenate(
+        [np.arange(g["first_count"], g["first_count"] + g["num_packets"]) for g in gaps]
+    )
+    assert validation.validate(test_file) == [
+        f"UserWarning: Missing packets found {missing.tolist()}."
+    ]
+    assert len(validation.analyze_sequence_counts(BytesIO(b""))) == 0
@@ -7,30 +7,51 @@ This code is based on that provided by SunPy see
 
 import os
 import shutil
+import tempfile
 import configparser
+from functools import lru_cache
 from pathlib import Path
 
 import padre_sharp
 from padre_sharp.util.exceptions import warn_user
 
-# This is to fix issue with AppDirs not writing to /tmp/ in AWS Lambda
-if not os.getenv("LAMBDA_ENVIRONMENT"):
-    from sunpy.extern.appdirs import AppDirs
-
 __all__ = ["load_config", "copy_default_config", "print_config", "CONFIG_DIR"]
 
 # Default directories for Lambda Environment
-CONFIG_DIR = "/tmp/.config"
-CACHE_DIR = "/tmp/.cache"
+LAMBDA_CONFIG_DIR = "/tmp/.config"
+LAMBDA_CACHE_DIR = "/tmp/.cache"
+
+# Default size limit of the decode cache, in MB
+DEFAULT_DECODE_CACHE_SIZE = 2048
+
+
+@lru_cache()
+def _default_dirs():
+    """
+    Return the default configuration and cache directories.
+
+    These are found with AppDirs, which imports sunpy, so only on first use
+    rather than when the package is imported.
+    """
+    # This is to fix issue with AppDirs not writing to /tmp/ in AWS Lambda
+    if os.getenv("LAMBDA_ENVIRONMENT"):
+        return LAMBDA_CONFIG_DIR, LAMBDA_CACHE_DIR
+
+    from sunpy.extern.appdirs import AppDirs
 
-# This is to fix issue with AppDirs not writing to /tmp/ in AWS Lambda
-if not os.getenv("LAMBDA_ENVIRONMENT"):
     # This is to avoid creating a new config dir for each new dev version.
     # We use AppDirs to locate and create the config directory.
     dirs = AppDirs("padre_sharp", "padre_sharp")
     # Default one set by AppDirs
-    CONFIG_DIR = dirs.user_config_dir
-    CACHE_DIR = dirs.user_cache_dir
+    return dirs.user_config_dir, dirs.user_cache_dir
+
+
+def __getattr__(name):
+    if name == "CONFIG_DIR":
+        return _default_dirs()[0]
+    if name == "CACHE_DIR":
+        return _default_dirs()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def load_config():
@@ -106,6 +127,70 @@ def get_and_create_download_dir():
     return padre_sharp.config.get("downloads", "download_dir")
 
 
+def get_and_create_cache_dir():
+    """
+    Get the cache directory and create one if not present.
+
+    The default is ``CACHE_DIR`` and can be overridden with the "SHARP_CACHEDIR"
+    environment variable.
+    """
+    cache_dir = os.environ.get("SHARP_CACHEDIR") or _default_dirs()[1]
+    cache_dir = Path(cache_dir).expanduser()
+    if not _is_writable_dir(cache_dir):
+        raise RuntimeError(f'Could not write to cache directory="{cache_dir}"')
+
+    return cache_dir
+
+
+def get_and_create_output_dir():
+    """
+    Get the directory the pipeline publishes its output files to, and create it
+    if not present.
+
+    This is the "output_dir" configuration option, which can be overridden with the
+    "SHARP_OUTPUTDIR" environment variable. The default is the system temporary
+    directory.
+    """
+    output_dir = os.environ.get("SHARP_OUTPUTDIR") or padre_sharp.config.get(
+        "outputs", "output_dir", fallback=""
+    )
+    output_dir = Path(output_dir or tempfile.gettempdir()).expanduser()
+    if not _is_writable_dir(output_dir):
+        raise RuntimeError(f'Could not write to output directory="{output_dir}"')
+
+    return output_dir
+
+
+def get_decode_cache_size():
+    """
+    Get the size limit in bytes of the cache of decoded raw files.
+
+    This is the "decode_cache_size" configuration option in MB, which can be
+    overridden with the "SHARP_DECODE_CACHE_SIZE" environment variable.
+    """
+    size = os.environ.get("SHARP_DECODE_CACHE_SIZE") or padre_sharp.config.get(
+        "cache", "decode_cache_size", fallback=""
+    )
+    return int(float(size or DEFAULT_DECODE_CACHE_SIZE) * 1e6)
+
+
+def get_calibration_dirs():
+    """
+    Get the directories to search for calibration files, in increasing priority.
+
+    These are the calibration directory included with the package followed by the
+    "calibration_dir" configuration option, which can be overridden with the
+    "SHARP_CALIBRATIONDIR" environment variable.
+    """
+    calibration_dirs = [padre_sharp._data_directory / "calibration"]
+    user_dir = os.environ.get("SHARP_CALIBRATIONDIR") or padre_sharp.config.get(
+        "calibration", "calibration_dir", fallback=""
+    )
+    if user_dir:
+        calibration_dirs.append(Path(user_dir).expanduser())
+    return calibration_dirs
+
+
 def get_and_create_sample_dir():
     """
     Get the config of download directory and create one if not present.
@@ -158,7 +243,7 @@ def _get_user_configdir():
     ``.util.config.CONFIG_DIR``. You can override this with the
     "SHARP_CONFIGDIR" environment variable.
     """
-    configdir = os.environ.get("SHARP_CONFIGDIR", CONFIG_DIR)
+    configdir = os.environ.get("SHARP_CONFIGDIR") or _default_dirs()[0]
 
     if not _is_writable_dir(configdir):
         raise RuntimeError(f'Could not write to SHARP_CONFIGDIR="{configdir}"')
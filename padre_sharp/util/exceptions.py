@@ -63,6 +63,7 @@ def warn_user(msg, stacklevel=1):
         e.g. ``stacklevel=1`` (the default) sets the stack level in the
         code that calls this function.
     """
+    _set_up_log()
     warnings.warn(msg, SHARPUserWarning, stacklevel + 1)
 
 
@@ -79,4 +80,14 @@ def warn_deprecated(msg, stacklevel=1):
         e.g. ``stacklevel=1`` (the default) sets the stack level in the
         code that calls this function.
     """
+    _set_up_log()
     warnings.warn(msg, SHARPDeprecationWarning, stacklevel + 1)
+
+
+def _set_up_log():
+    """
+    Set up the logger, which captures the warnings, if it is not used yet.
+    """
+    import padre_sharp
+
+    padre_sharp.log._resolve()
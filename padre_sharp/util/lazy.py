@@ -0,0 +1,82 @@
+"""
+This module provides lazy loading of modules and objects.
+
+Importing ``padre_sharp`` or one of its light modules should not pay for the
+heavy dependencies (astropy, sunpy, swxsoc) or read the configuration before
+they are used, which matters for the cold start of short lived processes such
+as AWS Lambda invocations or command line tools. A name bound to a `LazyModule`
+or `LazyObject` at import time only does the work on its first use.
+"""
+
+import importlib
+import threading
+import types
+from typing import Any, Callable
+
+__all__ = ["LazyModule", "LazyObject"]
+
+
+class LazyModule(types.ModuleType):
+    """
+    A module that is imported on first attribute access.
+
+    Parameters
+    ----------
+    name: str
+        The full name of the module, e.g. ``"swxsoc.util.util"``.
+
+    Examples
+    --------
+    >>> util = LazyModule("swxsoc.util.util")  # doctest: +SKIP
+    >>> util.parse_science_filename("padre_sharp_l1_20250503T042550_v0.1.0.fits")  # doctest: +SKIP
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        # Imported modules are a dictionary lookup in sys.modules
+        return getattr(importlib.import_module(self.__name__), name)
+
+    def __dir__(self):
+        return dir(importlib.import_module(self.__name__))
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r}>"
+
+
+class LazyObject:
+    """
+    A proxy to an object created by a factory on first attribute access.
+
+    The factory is called once, also when several threads use the proxy at the
+    same time.
+
+    Parameters
+    ----------
+    factory: callable
+        Returns the object, called without arguments.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_object", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _resolve(self) -> Any:
+        if self._object is None:
+            with self._lock:
+                if self._object is None:
+                    object.__setattr__(self, "_object", self._factory())
+        return self._object
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._resolve(), name, value)
+
+    def __dir__(self):
+        return dir(self._resolve())
+
+    def __repr__(self) -> str:
+        if self._object is None:
+            return f"<lazy {self._factory.__name__}>"
+        return repr(self._object)
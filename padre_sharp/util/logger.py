@@ -1,6 +1,11 @@
 import os
 import sys
+import queue
+import atexit
 import logging
+import multiprocessing
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
 
 from astropy.logger import AstropyLogger
 
@@ -10,6 +15,15 @@ from padre_sharp.util.exceptions import SHARPWarning
     licenses/SUNPY.rst and licenses/ASTROPY.rst
 """
 
+#: Default maximum number of records waiting to be handled in asynchronous mode
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+#: What asynchronous logging does with a record when its queue is full
+QUEUE_FULL_POLICIES = ("drop", "block")
+
+# Modules between the caller and the record, skipped to find the origin
+_LOGGER_MODULES = {"logging", "warnings", "astropy.logger", __name__}
+
 
 class MyLogger(AstropyLogger):
     """
@@ -59,13 +73,268 @@ class MyLogger(AstropyLogger):
         else:
             self.warning(message)
 
+    def makeRecord(
+        self,
+        name,
+        level,
+        pathname,
+        lineno,
+        msg,
+        args,
+        exc_info,
+        func=None,
+        extra=None,
+        sinfo=None,
+    ):
+        # The origin is the module of the caller, found from the frames rather
+        # than by `~astropy.logger.AstropyLogger`, which looks up the source
+        # file of each frame on disk and takes most of the time of a record
+        if extra is None or "origin" not in extra:
+            extra = {**(extra or {}), "origin": _caller_module()}
+        return super().makeRecord(
+            name,
+            level,
+            pathname,
+            lineno,
+            msg,
+            args,
+            exc_info,
+            func=func,
+            extra=extra,
+            sinfo=sinfo,
+        )
+
+    def _set_defaults(self):
+        # The handlers are replaced, stop handing records to the old ones first
+        self.disable_async_logging()
+        super()._set_defaults()
+
+    def async_logging_enabled(self):
+        """
+        Determine if records are handled by a background thread.
+        """
+        return getattr(self, "_async_logging", None) is not None
+
+    def enable_async_logging(
+        self, queue_size=DEFAULT_LOG_QUEUE_SIZE, full_policy="drop"
+    ):
+        """
+        Hand the records to the handlers of the logger from a background thread.
+
+        Logging a record then only puts it in a bounded queue, so the calling
+        thread does not wait for the log file or the terminal. The records left
+        in the queue are handled when asynchronous logging is disabled, at the
+        latest when the interpreter exits.
+
+        Parameters
+        ----------
+        queue_size : `int`
+            The maximum number of records waiting in the queue.
+        full_policy : `str`
+            What to do with a record when the queue is full, ``"drop"`` it or
+            ``"block"`` until there is room. Dropped records are counted and
+            reported by a warning once the queue has room again.
+        """
+        if full_policy not in QUEUE_FULL_POLICIES:
+            raise ValueError(
+                f"Log queue full policy must be one of {QUEUE_FULL_POLICIES}, "
+                f"not {full_policy!r}."
+            )
+        self.disable_async_logging()
+        handlers = self.handlers[:]
+        log_queue = queue.Queue(queue_size)
+        listener = _QueueListener(log_queue, *handlers, respect_handler_level=True)
+        queue_handler = BoundedQueueHandler(log_queue, full_policy)
+        for handler in handlers:
+            self.removeHandler(handler)
+        self.addHandler(queue_handler)
+        self._async_logging = (queue_handler, listener, handlers)
+        listener.start()
+        atexit.register(self.disable_async_logging)
+
+    def disable_async_logging(self):
+        """
+        Handle the queued records and go back to handling records in the
+        calling thread.
+        """
+        if not self.async_logging_enabled():
+            return
+        queue_handler, listener, handlers = self._async_logging
+        self._async_logging = None
+        atexit.unregister(self.disable_async_logging)
+        self.removeHandler(queue_handler)
+        # Handles the records left in the queue
+        listener.stop()
+        for handler in handlers:
+            self.addHandler(handler)
+        if queue_handler.num_unreported:
+            self.handle(queue_handler.dropped_record())
+
+    def _after_fork_in_child(self):
+        # The background thread does not survive a fork, the child handles its
+        # records itself unless they are forwarded, see worker_logging
+        if self.async_logging_enabled():
+            queue_handler, _, handlers = self._async_logging
+            self._async_logging = None
+            atexit.unregister(self.disable_async_logging)
+            self.removeHandler(queue_handler)
+            for handler in handlers:
+                self.addHandler(handler)
+
+    @contextmanager
+    def worker_logging(self):
+        """
+        Context manager forwarding the records of worker processes to the
+        handlers of this process, when asynchronous logging is enabled.
+
+        The workers then do not write to the log file concurrently, and put
+        their records in a queue of the same size and policy as this process.
+        The context gives the initializer of the workers and its arguments, for
+        `~concurrent.futures.ProcessPoolExecutor` or `multiprocessing.Pool`,
+        both None when asynchronous logging is disabled and the workers handle
+        their own records. The records the workers logged before they exited
+        are all handled when the context exits.
+
+        Examples
+        --------
+        The context manager is used as::
+
+            with log.worker_logging() as (initializer, initargs):
+                with ProcessPoolExecutor(
+                    initializer=initializer, initargs=initargs
+                ) as executor:
+                    # your code here
+        """
+        if not self.async_logging_enabled():
+            yield None, ()
+            return
+        queue_handler, _, handlers = self._async_logging
+        log_queue = multiprocessing.Queue(queue_handler.queue.maxsize)
+        listener = _QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        try:
+            yield _init_worker_log, (log_queue, queue_handler.full_policy)
+        finally:
+            listener.stop()
+            log_queue.close()
+            log_queue.join_thread()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    A `~logging.handlers.QueueHandler` that drops records or waits for room
+    when its queue is full.
+
+    Parameters
+    ----------
+    queue : `queue.Queue` or `multiprocessing.Queue`
+        A bounded queue.
+    full_policy : `str`
+        ``"drop"`` a record when the queue is full, or ``"block"`` until there
+        is room.
+
+    Attributes
+    ----------
+    num_dropped : `int`
+        The number of records dropped.
+    num_unreported : `int`
+        The number of records dropped since the last warning about them.
+    """
+
+    def __init__(self, queue, full_policy="drop"):
+        super().__init__(queue)
+        self.full_policy = full_policy
+        self.num_dropped = 0
+        self.num_unreported = 0
+
+    def enqueue(self, record):
+        if self.full_policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            if self.num_unreported:
+                # Ahead of the record, in the first room in the queue
+                self.queue.put_nowait(self.dropped_record())
+                self.num_unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.num_dropped += 1
+            self.num_unreported += 1
+
+    def dropped_record(self):
+        """
+        Return a warning record about the records dropped since the last one.
+        """
+        record = logging.LogRecord(
+            "padre_sharp",
+            logging.WARNING,
+            __file__,
+            0,
+            f"Dropped {self.num_unreported} log records, the log queue was full.",
+            None,
+            None,
+        )
+        record.origin = __name__
+        return record
+
+
+class _QueueListener(QueueListener):
+    """
+    A `~logging.handlers.QueueListener` that can stop with a full queue.
+    """
+
+    def enqueue_sentinel(self):
+        # Waits for room in a bounded queue rather than failing
+        self.queue.put(self._sentinel)
+
+
+def _caller_module():
+    """
+    Return the name of the module that called the logger.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get("__name__")
+        if name not in _LOGGER_MODULES:
+            # Code run with python -c has no module to tell
+            if name is None or (
+                name == "__main__" and "__file__" not in frame.f_globals
+            ):
+                return "unknown"
+            return name
+        frame = frame.f_back
+    return "unknown"
+
+
+def _init_worker_log(log_queue, full_policy):
+    """
+    Forward the records of a worker process to a queue, see
+    `MyLogger.worker_logging`.
+    """
+    # Set up from the configuration in a spawned worker that has not logged yet
+    from padre_sharp import log
+
+    log.disable_async_logging()
+    for handler in log.handlers[:]:
+        log.removeHandler(handler)
+    log.addHandler(BoundedQueueHandler(log_queue, full_policy))
+
+
+def _after_fork_in_child():
+    log = logging.Logger.manager.loggerDict.get("padre_sharp")
+    if isinstance(log, MyLogger):
+        log._after_fork_in_child()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
 
 def _init_log(config=None):
     """
     Initializes the log.
 
-    In most circumstances this is called automatically when importing.
-    This code is based on that provided by Astropy see
+    In most circumstances this is called automatically on the first use of
+    ``padre_sharp.log``. This code is based on that provided by Astropy see
     "licenses/ASTROPY.rst".
     """
     orig_logger_cls = logging.getLoggerClass()
@@ -75,6 +344,15 @@ def _init_log(config=None):
         if config is not None:
             _config_to_loggerConf(config)
         log._set_defaults()
+        if config is not None and config.getboolean(
+            "logger", "log_async", fallback=False
+        ):
+            log.enable_async_logging(
+                queue_size=config.getint(
+                    "logger", "log_queue_size", fallback=DEFAULT_LOG_QUEUE_SIZE
+                ),
+                full_policy=config.get("logger", "log_queue_full", fallback="drop"),
+            )
     finally:
         logging.setLoggerClass(orig_logger_cls)
 
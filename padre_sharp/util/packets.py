@@ -0,0 +1,484 @@
+"""
+This module provides fast, vectorized access to the CCSDS packets in a raw file.
+"""
+
+import hashlib
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from padre_sharp.util import sidecar
+
+__all__ = [
+    "PRIMARY_HEADER_NUM_BYTES",
+    "HEADER_DTYPE",
+    "PacketView",
+    "scan_packets",
+    "open_packets",
+    "iter_packet_views",
+    "read_file_bytes",
+    "packet_boundaries",
+    "read_headers",
+    "packet_checksums",
+    "packet_hashes",
+]
+
+#: Number of bytes in a CCSDS primary header
+PRIMARY_HEADER_NUM_BYTES = 6
+
+#: Default number of bytes read at a time when streaming a file
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+#: Version of the on-disk packet index format, bump when it changes
+INDEX_VERSION = 1
+
+#: Number of bytes hashed at a time by `packet_hashes`, small enough to stay in cache
+HASH_CHUNK_SIZE = 256 * 1024
+
+#: Largest number of bytes in a CCSDS packet payload
+MAX_PAYLOAD_NUM_BYTES = 2**16
+
+#: Structured dtype of the per-packet header table
+HEADER_DTYPE = np.dtype(
+    [
+        ("offset", np.int64),
+        ("length", np.int64),
+        ("version", np.uint8),
+        ("packet_type", np.uint8),
+        ("secondary_flag", np.uint8),
+        ("apid", np.uint16),
+        ("sequence_flag", np.uint8),
+        ("sequence_count", np.uint16),
+    ]
+)
+
+
+class PacketView:
+    """
+    The packets of a raw file, scanned once and shared by all consumers.
+
+    The file contents are held in a single buffer and the primary headers of all
+    complete packets are decoded into a structured array. Individual packets are
+    handed out as zero-copy slices of the buffer.
+
+    Parameters
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents as returned by `read_file_bytes`, or memory mapped.
+    headers: `np.ndarray`, optional
+        A previously built header table for ``file_bytes``. If not given the
+        headers are read from ``file_bytes``.
+
+    Attributes
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents as a 1D array of ``uint8``.
+    headers: `np.ndarray`
+        The primary header fields of each packet, with dtype `HEADER_DTYPE`.
+    """
+
+    def __init__(self, file_bytes: np.ndarray, headers: np.ndarray = None):
+        self.file_bytes = file_bytes
+        if headers is None:
+            offsets, lengths = packet_boundaries(file_bytes)
+            headers = read_headers(file_bytes, offsets, lengths)
+        self.headers = headers
+        self._checksums = None
+        self._hashes = None
+        self._content_hash = None
+
+    @classmethod
+    def from_file(cls, file) -> "PacketView":
+        """
+        Scan a file path or file-like object.
+        """
+        return cls(read_file_bytes(file))
+
+    def __len__(self) -> int:
+        return len(self.headers)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.headers["offset"]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self.headers["length"]
+
+    @property
+    def end(self) -> int:
+        """Number of bytes covered by complete packets."""
+        if len(self.headers) == 0:
+            return 0
+        return int(self.offsets[-1] + self.lengths[-1])
+
+    @property
+    def num_trailing_bytes(self) -> int:
+        """Number of bytes after the last complete packet."""
+        return len(self.file_bytes) - self.end
+
+    def packet(self, index: int) -> np.ndarray:
+        """
+        Return the bytes of a packet, primary header included, without copying.
+        """
+        offset, length = self.offsets[index], self.lengths[index]
+        return self.file_bytes[offset : offset + length]
+
+    def payload(self, index: int) -> np.ndarray:
+        """
+        Return the bytes of a packet after its primary header, without copying.
+        """
+        return self.packet(index)[PRIMARY_HEADER_NUM_BYTES:]
+
+    @property
+    def checksums(self) -> np.ndarray:
+        """The rolling XOR of every packet, computed on first access."""
+        if self._checksums is None:
+            self._checksums = packet_checksums(
+                self.file_bytes, self.offsets, self.lengths
+            )
+        return self._checksums
+
+    @property
+    def hashes(self) -> np.ndarray:
+        """The 64 bit hash of every packet payload, computed on first access."""
+        if self._hashes is None:
+            self._hashes = packet_hashes(self.file_bytes, self.offsets, self.lengths)
+        return self._hashes
+
+    @property
+    def content_hash(self) -> str:
+        """Hex digest of the file contents, computed on first access."""
+        if self._content_hash is None:
+            self._content_hash = _content_hash(self.file_bytes)
+        return self._content_hash
+
+
+def scan_packets(file) -> PacketView:
+    """
+    Scan a file into a `PacketView`.
+
+    Parameters
+    ----------
+    file: `str | Path | BytesIO | PacketView`
+        A file path, file-like object with a `.read()` method or an existing view,
+        which is returned unchanged.
+
+    Returns
+    -------
+    `PacketView`
+    """
+    if isinstance(file, PacketView):
+        return file
+    return PacketView.from_file(file)
+
+
+def open_packets(file, use_cache: bool = True) -> PacketView:
+    """
+    Memory map a raw file and return its packets.
+
+    The packet index (the header table of the returned view) is persisted as a
+    sidecar file in the cache directory (see
+    `~padre_sharp.util.config.get_and_create_cache_dir`). Later calls on the same
+    file load the index instead of walking the packets again. The sidecar is
+    reused while the file size and modification time are unchanged, or when the
+    content hash still matches after the file was touched.
+
+    Parameters
+    ----------
+    file: `str | Path`
+        Path to a raw file.
+    use_cache: `bool`, optional
+        If False, the index is neither loaded from nor saved to the cache.
+
+    Returns
+    -------
+    `PacketView` whose buffer is a read-only memory map of the file.
+    """
+    path = Path(file).resolve()
+    stat = path.stat()
+    if stat.st_size == 0:
+        # empty files cannot be memory mapped
+        file_bytes = np.empty(0, dtype=np.uint8)
+    else:
+        file_bytes = np.memmap(path, dtype=np.uint8, mode="r")
+    if not use_cache:
+        return PacketView(file_bytes)
+
+    sidecar_file = sidecar.sidecar_path(path, "packet_index")
+    view = _load_index(sidecar_file, file_bytes, stat)
+    if view is None:
+        view = PacketView(file_bytes)
+        _save_index(sidecar_file, view, stat)
+    return view
+
+
+def _content_hash(file_bytes: np.ndarray) -> str:
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+
+
+def _load_index(sidecar_file: Path, file_bytes: np.ndarray, stat: os.stat_result):
+    """
+    Load a packet index, returning None if it is missing or stale.
+    """
+    index = sidecar.load_sidecar(
+        sidecar_file,
+        INDEX_VERSION,
+        stat,
+        ["headers", "content_hash"],
+        check_mtime=False,
+    )
+    if index is None or index["headers"].dtype != HEADER_DTYPE:
+        return None
+    content_hash = str(index["content_hash"])
+    view = PacketView(file_bytes, headers=index["headers"])
+
+    if index["mtime_ns"] != stat.st_mtime_ns:
+        # Touched or copied, only reuse if the contents are the same
+        if view.content_hash != content_hash:
+            return None
+        _save_index(sidecar_file, view, stat)
+    view._content_hash = content_hash
+    return view
+
+
+def _save_index(sidecar_file: Path, view: PacketView, stat: os.stat_result):
+    """
+    Atomically write the packet index of a view to its sidecar file.
+    """
+    sidecar.save_sidecar(
+        sidecar_file,
+        INDEX_VERSION,
+        stat,
+        content_hash=view.content_hash,
+        headers=view.headers,
+    )
+
+
+def iter_packet_views(file, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Scan a file in fixed-size chunks, yielding a `PacketView` for each chunk.
+
+    A partial packet at the end of a chunk is carried over to the start of the
+    next one, so every packet appears complete in exactly one view and memory use
+    does not depend on the size of the file. Only the trailing bytes of the last
+    view are trailing bytes of the file.
+
+    Parameters
+    ----------
+    file: `str | Path | BytesIO`
+        A file path or file-like object with a `.read()` method.
+    chunk_size: `int`
+        Number of bytes to read at a time.
+
+    Yields
+    ------
+    first_index: `int`
+        The index in the file of the first packet of the view.
+    view: `PacketView`
+        The packets of the chunk.
+    """
+    if hasattr(file, "read"):
+        yield from _iter_packet_views(file, chunk_size)
+    else:
+        with open(file, "rb") as fh:
+            yield from _iter_packet_views(fh, chunk_size)
+
+
+def _iter_packet_views(fh, chunk_size):
+    first_index = 0
+    carry = np.empty(0, dtype=np.uint8)
+    view = None
+    while chunk := fh.read(chunk_size):
+        view = PacketView(np.concatenate((carry, np.frombuffer(chunk, dtype=np.uint8))))
+        yield first_index, view
+        first_index += len(view)
+        carry = view.file_bytes[view.end :]
+    if view is None:
+        # Empty file
+        yield 0, PacketView(carry)
+
+
+def read_file_bytes(file) -> np.ndarray:
+    """
+    Read a whole file into a single contiguous buffer of bytes.
+
+    Parameters
+    ----------
+    file: `str | Path | BytesIO`
+        A file path or file-like object with a `.read()` method.
+
+    Returns
+    -------
+    file_bytes: `np.ndarray`
+        The file contents as a 1D array of ``uint8``.
+    """
+    if hasattr(file, "read"):
+        return np.frombuffer(file.read(), dtype=np.uint8)
+    return np.fromfile(file, dtype=np.uint8)
+
+
+def packet_boundaries(file_bytes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build the table of packet offsets and lengths from the primary headers.
+
+    Only the packet length field of each primary header is read, so this walk is
+    cheap compared to splitting the file into separate packet objects. A trailing
+    partial packet (truncated file or garbage bytes) is not included.
+
+    Parameters
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents as returned by `read_file_bytes`.
+
+    Returns
+    -------
+    offsets: `np.ndarray`
+        Byte offset of the start of each complete packet.
+    lengths: `np.ndarray`
+        Total length in bytes (primary header included) of each complete packet.
+    """
+    buffer = memoryview(file_bytes).cast("B")
+    num_bytes = len(buffer)
+    offsets = []
+    offset = 0
+    while offset + PRIMARY_HEADER_NUM_BYTES <= num_bytes:
+        # CCSDS packet length field is the number of bytes after the header minus 1
+        packet_nbytes = (
+            ((buffer[offset + 4] << 8) | buffer[offset + 5])
+            + PRIMARY_HEADER_NUM_BYTES
+            + 1
+        )
+        if offset + packet_nbytes > num_bytes:
+            break
+        offsets.append(offset)
+        offset += packet_nbytes
+
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets, append=offset)
+    return offsets, lengths
+
+
+def read_headers(
+    file_bytes: np.ndarray, offsets: np.ndarray, lengths: np.ndarray
+) -> np.ndarray:
+    """
+    Decode the primary headers of all packets at once.
+
+    Parameters
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents as returned by `read_file_bytes`.
+    offsets: `np.ndarray`
+        Packet offsets as returned by `packet_boundaries`.
+    lengths: `np.ndarray`
+        Packet lengths as returned by `packet_boundaries`.
+
+    Returns
+    -------
+    headers: `np.ndarray`
+        Structured array with dtype `HEADER_DTYPE`.
+    """
+    headers = np.empty(len(offsets), dtype=HEADER_DTYPE)
+    headers["offset"] = offsets
+    headers["length"] = lengths
+
+    header_bytes = file_bytes[
+        offsets[:, np.newaxis] + np.arange(4)[np.newaxis, :]
+    ].astype(np.uint16)
+    word0 = (header_bytes[:, 0] << 8) | header_bytes[:, 1]
+    word1 = (header_bytes[:, 2] << 8) | header_bytes[:, 3]
+    headers["version"] = word0 >> 13
+    headers["packet_type"] = (word0 >> 12) & 0x1
+    headers["secondary_flag"] = (word0 >> 11) & 0x1
+    headers["apid"] = word0 & 0x7FF
+    headers["sequence_flag"] = word1 >> 14
+    headers["sequence_count"] = word1 & 0x3FFF
+    return headers
+
+
+def packet_checksums(
+    file_bytes: np.ndarray, offsets: np.ndarray, lengths: np.ndarray
+) -> np.ndarray:
+    """
+    Compute the rolling XOR of every packet in a single pass over the buffer.
+
+    Parameters
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents as returned by `read_file_bytes`.
+    offsets: `np.ndarray`
+        Packet offsets as returned by `packet_boundaries`.
+    lengths: `np.ndarray`
+        Packet lengths as returned by `packet_boundaries`.
+
+    Returns
+    -------
+    checksums: `np.ndarray`
+        The XOR of all bytes of each packet, as ``uint8``.
+    """
+    if len(offsets) == 0:
+        return np.empty(0, dtype=np.uint8)
+    # Packets are contiguous so a segmented reduce over the covered bytes
+    # gives one value per packet
+    end = offsets[-1] + lengths[-1]
+    return np.bitwise_xor.reduceat(file_bytes[:end], offsets)
+
+
+def packet_hashes(
+    file_bytes: np.ndarray, offsets: np.ndarray, lengths: np.ndarray
+) -> np.ndarray:
+    """
+    Hash the payload of every packet, the bytes after the primary header, in bulk.
+
+    The hash of a payload is the sum of its bytes weighted by fixed random odd
+    64 bit numbers, one per position, modulo 2**64. Payloads that differ in one
+    byte never have the same hash. It is computed with array operations about
+    `HASH_CHUNK_SIZE` bytes at a time, no Python object is created per packet.
+
+    Parameters
+    ----------
+    file_bytes: `np.ndarray`
+        The file contents as returned by `read_file_bytes`.
+    offsets: `np.ndarray`
+        Packet offsets as returned by `packet_boundaries`.
+    lengths: `np.ndarray`
+        Packet lengths as returned by `packet_boundaries`.
+
+    Returns
+    -------
+    hashes: `np.ndarray`
+        The ``uint64`` hash of each packet payload, 0 for an empty payload.
+    """
+    hashes = np.empty(len(offsets), dtype=np.uint64)
+    ends = offsets + lengths
+    first = 0
+    while first < len(offsets):
+        last = np.searchsorted(ends, offsets[first] + HASH_CHUNK_SIZE, side="right")
+        last = max(int(last), first + 1)
+        # Packets are contiguous, the chunk is one slice of the buffer
+        chunk_offsets = offsets[first:last] - offsets[first]
+        positions = np.arange(ends[last - 1] - offsets[first])
+        positions -= np.repeat(chunk_offsets, lengths[first:last])
+        values = file_bytes[offsets[first] : ends[last - 1]].astype(np.uint64)
+        # Integer products and sums wrap around, modulo 2**64
+        values *= _hash_weights()[positions]
+        hashes[first:last] = np.add.reduceat(values, chunk_offsets)
+        first = last
+    return hashes
+
+
+@lru_cache()
+def _hash_weights() -> np.ndarray:
+    """
+    The weight of each byte position of a packet in `packet_hashes`, 0 for the
+    primary header.
+    """
+    rng = np.random.default_rng(0x5A4D)
+    weights = rng.integers(0, 2**64, MAX_PAYLOAD_NUM_BYTES, dtype=np.uint64)
+    return np.concatenate(
+        [np.zeros(PRIMARY_HEADER_NUM_BYTES, dtype=np.uint64), weights | np.uint64(1)]
+    )
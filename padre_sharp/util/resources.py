@@ -0,0 +1,172 @@
+"""
+This module provides a process level cache of resources shared between calls.
+
+In a long running worker or a warm AWS Lambda invocation, state built by one
+call, such as the calibration registry, is reused by the next. Each resource is
+created by a factory and kept with a token describing what it was built from,
+e.g. the modification times of the directories it scanned (see `path_token`). A
+resource is built again when its token changes. Hits, misses and invalidations
+are counted per resource.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Tuple
+
+__all__ = ["ResourceStats", "ResourceCache", "path_token", "get_resource_cache"]
+
+
+@dataclass
+class ResourceStats:
+    """
+    The use counters of a resource.
+
+    Attributes
+    ----------
+    hits: int
+        The number of times the cached resource was returned.
+    misses: int
+        The number of times the resource was created.
+    invalidations: int
+        The number of times the cached resource was dropped, because its token
+        changed or it was invalidated explicitly.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    value: Any
+    token: Hashable
+
+
+class ResourceCache:
+    """
+    A thread safe cache of named resources, each built again when stale.
+
+    Examples
+    --------
+    >>> cache = ResourceCache()
+    >>> cache.get("answer", lambda: 42)
+    42
+    >>> cache.stats()["answer"].misses
+    1
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._stats: Dict[Hashable, ResourceStats] = {}
+        self._lock = threading.RLock()
+
+    def get(
+        self,
+        name: Hashable,
+        factory: Callable[[], Any],
+        token: Hashable = None,
+    ) -> Any:
+        """
+        Return a resource, creating it if it is not cached or is stale.
+
+        Parameters
+        ----------
+        name: hashable
+            The name of the resource.
+        factory: callable
+            Creates the resource, called without arguments.
+        token: hashable, optional
+            Describes what the resource is built from, the cached resource is
+            stale if it was built with a different token.
+
+        Returns
+        -------
+        The resource.
+        """
+        with self._lock:
+            stats = self._stats.setdefault(name, ResourceStats())
+            entry = self._entries.get(name)
+            if entry is not None:
+                if entry.token == token:
+                    stats.hits += 1
+                    return entry.value
+                stats.invalidations += 1
+            stats.misses += 1
+            # Built under the lock, so concurrent callers share one resource
+            value = factory()
+            self._entries[name] = _Entry(value, token)
+            return value
+
+    def invalidate(self, name: Hashable = None) -> None:
+        """
+        Forget a resource, or every resource if no name is given.
+        """
+        with self._lock:
+            names = list(self._entries) if name is None else [name]
+            for name in names:
+                if self._entries.pop(name, None) is not None:
+                    self._stats.setdefault(name, ResourceStats()).invalidations += 1
+
+    def stats(self) -> Dict[Hashable, ResourceStats]:
+        """
+        Return a copy of the counters of every resource used.
+        """
+        with self._lock:
+            return {
+                name: ResourceStats(**vars(stats))
+                for name, stats in self._stats.items()
+            }
+
+    def __contains__(self, name: Hashable) -> bool:
+        return name in self._entries
+
+
+def path_token(paths: Iterable[Path]) -> Tuple:
+    """
+    Return a token that changes when files or directories are modified.
+
+    The token of a directory changes when files are added, removed or renamed
+    in it, but not when a file in it is modified in place.
+
+    Parameters
+    ----------
+    paths: list
+        The files or directories.
+
+    Returns
+    -------
+    token: tuple
+        The path and modification time of each path, None for a missing path.
+    """
+    token = []
+    for path in paths:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        token.append((str(path), mtime))
+    return tuple(token)
+
+
+_resource_cache = None
+_resource_cache_lock = threading.Lock()
+
+
+def get_resource_cache() -> ResourceCache:
+    """
+    Return the resource cache shared by the whole process.
+    """
+    global _resource_cache
+    if _resource_cache is None:
+        with _resource_cache_lock:
+            if _resource_cache is None:
+                _resource_cache = ResourceCache()
+    return _resource_cache
@@ -0,0 +1,113 @@
+"""
+This module provides sidecar files, on-disk caches of what is derived from a file.
+
+A sidecar is an ``.npz`` file in a subdirectory of the cache directory, named
+after the hash of the path of the file it describes, such as the packet index of
+a raw file or the time index of an event list. It records a format version and
+the size and modification time of the file, so that a stale sidecar is ignored.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+
+from padre_sharp import log
+from padre_sharp.util import config
+
+__all__ = ["sidecar_path", "load_sidecar", "save_sidecar"]
+
+
+def sidecar_path(path: Path, kind: str) -> Path:
+    """
+    Return the sidecar file of a kind describing a file.
+
+    Parameters
+    ----------
+    path: Path
+        The resolved path of the file.
+    kind: str
+        The kind of sidecar, the name of its subdirectory of the cache directory.
+
+    Returns
+    -------
+    sidecar: Path
+    """
+    key = hashlib.sha1(str(path).encode()).hexdigest()
+    return config.get_and_create_cache_dir() / kind / f"{key}.npz"
+
+
+def load_sidecar(
+    sidecar: Path,
+    version: int,
+    stat: os.stat_result,
+    names: Iterable[str],
+    check_mtime: bool = True,
+) -> Dict[str, np.ndarray]:
+    """
+    Load a sidecar file, returning None if it is missing, unreadable or stale.
+
+    Parameters
+    ----------
+    sidecar: Path
+        The sidecar file, see `sidecar_path`.
+    version: int
+        The current version of the sidecar format.
+    stat: os.stat_result
+        The status of the file the sidecar describes.
+    names: list
+        The arrays to load, besides the version, size and modification time.
+    check_mtime: bool, optional
+        If False, a sidecar whose file was modified is returned, for the caller
+        to check further, e.g. by the hash of the contents.
+
+    Returns
+    -------
+    arrays: dict
+        The arrays by name, including ``mtime_ns``.
+    """
+    try:
+        with np.load(sidecar) as content:
+            if content["version"] != version or content["size"] != stat.st_size:
+                return None
+            if check_mtime and content["mtime_ns"] != stat.st_mtime_ns:
+                return None
+            return {name: content[name] for name in ["mtime_ns", *names]}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_sidecar(
+    sidecar: Path, version: int, stat: os.stat_result, **arrays: np.ndarray
+) -> None:
+    """
+    Atomically write a sidecar file, only logging a warning if it fails.
+
+    Parameters
+    ----------
+    sidecar: Path
+        The sidecar file, see `sidecar_path`.
+    version: int
+        The current version of the sidecar format.
+    stat: os.stat_result
+        The status of the file the sidecar describes.
+    **arrays
+        The arrays to save.
+    """
+    tmp_file = sidecar.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, "wb") as fh:
+            np.savez(
+                fh,
+                version=version,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                **arrays,
+            )
+        os.replace(tmp_file, sidecar)
+    except OSError as e:
+        log.warning(f"Could not save {sidecar}: {e}")
+        tmp_file.unlink(missing_ok=True)
@@ -0,0 +1,319 @@
+"""
+This module provides vectorized conversions of spacecraft clock times.
+
+Spacecraft times are whole seconds (coarse time) and 1/65536 s ticks (fine
+time) of a clock counting SI seconds since an epoch, without leap seconds. The
+SHARP clock counts from when the instrument is powered on (about 1000 s in the
+first packets of a file), so its epoch is not fixed: it is derived for each
+file from the time in the filename and the first coarse time of the file, see
+`clock_epoch`, and kept with the products.
+
+Times are converted on whole arrays with integer arithmetic: to TAI nanoseconds
+first, then to UTC with a leap second table, and an `~astropy.time.Time` is only
+built at the end, from whole arrays, if asked for.
+"""
+
+import calendar
+from functools import lru_cache
+from typing import Tuple
+
+import erfa
+import numpy as np
+from astropy.time import Time
+
+__all__ = [
+    "clock_epoch",
+    "leap_second_table",
+    "spacecraft_to_tai",
+    "spacecraft_to_unix",
+    "spacecraft_to_tt2000",
+    "spacecraft_to_jd",
+    "spacecraft_to_isot",
+    "spacecraft_to_time",
+]
+
+#: Fine time ticks per second of the spacecraft clock
+FINE_TIME_PER_COARSE_TIME = 2**16
+
+#: Nanoseconds per second
+NS_PER_S = 1_000_000_000
+
+#: Seconds per day
+S_PER_DAY = 86_400
+
+#: TT - TAI, in nanoseconds
+TT_MINUS_TAI_NS = 32_184_000_000
+
+#: Julian date of the unix epoch
+UNIX_EPOCH_JD = 2_440_587.5
+
+#: Julian date of J2000, the TT2000 epoch in TT
+J2000_JD = 2_451_545.0
+
+# TAI nanoseconds are counted like unix nanoseconds but on the TAI calendar,
+# they are the unix nanoseconds plus TAI - UTC from the leap second table.
+
+
+@lru_cache()
+def leap_second_table() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the leap second table, from 1972 on when TAI - UTC is whole seconds.
+
+    The table is the one of ERFA, kept up to date by astropy.
+
+    Returns
+    -------
+    starts: `np.ndarray`
+        The ``int64`` TAI nanoseconds from which each offset applies.
+    offsets: `np.ndarray`
+        The ``int64`` TAI - UTC offsets, in nanoseconds.
+    """
+    table = erfa.leap_seconds.get()
+    table = table[table["year"] >= 1972]
+    utc_starts = np.array(
+        [calendar.timegm((year, month, 1, 0, 0, 0)) for year, month, _ in table],
+        dtype=np.int64,
+    )
+    offsets = np.round(table["tai_utc"]).astype(np.int64) * NS_PER_S
+    return utc_starts * NS_PER_S + offsets, offsets
+
+
+def clock_epoch(time, coarse_time: int) -> str:
+    """
+    Return the epoch of the spacecraft clock, given the time of one reading.
+
+    Parameters
+    ----------
+    time: `~astropy.time.Time` or str
+        The time at which the clock read ``coarse_time``, e.g. the time in the
+        filename of a raw file, which is the time of its first packet.
+    coarse_time: int
+        The clock reading, e.g. the first coarse time of the file.
+
+    Returns
+    -------
+    epoch: str
+        The UTC ISO 8601 time at which the clock read 0, to the nanosecond.
+
+    Examples
+    --------
+    >>> clock_epoch("2025-05-03T04:25:50", 969)
+    '2025-05-03T04:09:41.000000000'
+    """
+    if isinstance(time, Time):
+        time = time.utc.isot
+    tai = _utc_to_tai_ns(_isot_to_unix_ns(time)) - int(coarse_time) * NS_PER_S
+    unix_ns = _tai_to_unix_ns(np.int64(tai))
+    return str(np.datetime_as_string(unix_ns.astype("datetime64[ns]"), unit="ns"))
+
+
+def spacecraft_to_tai(
+    epoch: str, coarse_time: np.ndarray, fine_time: np.ndarray = None
+) -> np.ndarray:
+    """
+    Convert spacecraft times to TAI nanoseconds.
+
+    Parameters
+    ----------
+    epoch: str
+        The UTC epoch of the clock, see `clock_epoch`.
+    coarse_time: `np.ndarray`
+        The whole seconds since ``epoch``.
+    fine_time: `np.ndarray`, optional
+        The 1/65536 s ticks, rounded to the nearest nanosecond.
+
+    Returns
+    -------
+    tai: `np.ndarray`
+        The ``int64`` TAI nanoseconds, counted such that TAI - UTC is the value
+        of `leap_second_table`.
+    """
+    tai = np.asarray(coarse_time, dtype=np.int64) * NS_PER_S
+    tai += _epoch_tai(epoch)
+    if fine_time is not None:
+        fine_ns = np.asarray(fine_time, dtype=np.int64) * NS_PER_S
+        fine_ns += FINE_TIME_PER_COARSE_TIME // 2
+        fine_ns //= FINE_TIME_PER_COARSE_TIME
+        tai += fine_ns
+    return tai
+
+
+def spacecraft_to_unix(
+    epoch: str,
+    coarse_time: np.ndarray,
+    fine_time: np.ndarray = None,
+    as_ns: bool = False,
+) -> np.ndarray:
+    """
+    Convert spacecraft times to unix times, UTC seconds since 1970.
+
+    A time during a leap second is given the unix time of the end of it.
+
+    Parameters
+    ----------
+    epoch: str
+        The UTC epoch of the clock, see `clock_epoch`.
+    coarse_time: `np.ndarray`
+        The whole seconds since ``epoch``.
+    fine_time: `np.ndarray`, optional
+        The 1/65536 s ticks.
+    as_ns: bool, optional
+        If True, return ``int64`` nanoseconds instead of ``float64`` seconds.
+
+    Returns
+    -------
+    unix: `np.ndarray`
+    """
+    unix_ns = _tai_to_unix_ns(spacecraft_to_tai(epoch, coarse_time, fine_time))
+    if as_ns:
+        return unix_ns
+    return unix_ns / NS_PER_S
+
+
+def spacecraft_to_tt2000(
+    epoch: str, coarse_time: np.ndarray, fine_time: np.ndarray = None
+) -> np.ndarray:
+    """
+    Convert spacecraft times to TT2000, TT nanoseconds since J2000 as in CDF.
+
+    Parameters
+    ----------
+    epoch: str
+        The UTC epoch of the clock, see `clock_epoch`.
+    coarse_time: `np.ndarray`
+        The whole seconds since ``epoch``.
+    fine_time: `np.ndarray`, optional
+        The 1/65536 s ticks.
+
+    Returns
+    -------
+    tt2000: `np.ndarray`
+        The ``int64`` TT2000 times.
+    """
+    tt2000 = spacecraft_to_tai(epoch, coarse_time, fine_time)
+    tt2000 -= _j2000_tai()
+    return tt2000
+
+
+def spacecraft_to_jd(
+    epoch: str, coarse_time: np.ndarray, fine_time: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert spacecraft times to two part UTC Julian dates, as used by ERFA.
+
+    Parameters
+    ----------
+    epoch: str
+        The UTC epoch of the clock, see `clock_epoch`.
+    coarse_time: `np.ndarray`
+        The whole seconds since ``epoch``.
+    fine_time: `np.ndarray`, optional
+        The 1/65536 s ticks.
+
+    Returns
+    -------
+    jd1, jd2: `np.ndarray`
+        The whole days, at midnight, and the ``float64`` fraction of the day.
+        ``jd1 + jd2`` is the Julian date.
+    """
+    unix_ns = spacecraft_to_unix(epoch, coarse_time, fine_time, as_ns=True)
+    days, day_ns = np.divmod(unix_ns, S_PER_DAY * NS_PER_S)
+    return days + UNIX_EPOCH_JD, day_ns / (S_PER_DAY * NS_PER_S)
+
+
+def spacecraft_to_isot(
+    epoch: str,
+    coarse_time: np.ndarray,
+    fine_time: np.ndarray = None,
+    unit: str = "us",
+) -> np.ndarray:
+    """
+    Convert spacecraft times to UTC ISO 8601 strings.
+
+    Parameters
+    ----------
+    epoch: str
+        The UTC epoch of the clock, see `clock_epoch`.
+    coarse_time: `np.ndarray`
+        The whole seconds since ``epoch``.
+    fine_time: `np.ndarray`, optional
+        The 1/65536 s ticks.
+    unit: str, optional
+        The precision of the strings, a `np.datetime64` unit such as ``"s"``,
+        ``"ms"``, ``"us"`` or ``"ns"``.
+
+    Returns
+    -------
+    isot: `np.ndarray`
+        The strings, e.g. ``"2025-05-03T04:25:50.000000"``.
+    """
+    unix_ns = spacecraft_to_unix(epoch, coarse_time, fine_time, as_ns=True)
+    return np.datetime_as_string(unix_ns.astype("datetime64[ns]"), unit=unit)
+
+
+def spacecraft_to_time(
+    epoch: str, coarse_time: np.ndarray, fine_time: np.ndarray = None
+) -> Time:
+    """
+    Convert spacecraft times to an `~astropy.time.Time` array, built in one go.
+
+    The times are exact to the nanosecond, leap seconds included.
+
+    Parameters
+    ----------
+    epoch: str
+        The UTC epoch of the clock, see `clock_epoch`.
+    coarse_time: `np.ndarray`
+        The whole seconds since ``epoch``.
+    fine_time: `np.ndarray`, optional
+        The 1/65536 s ticks.
+
+    Returns
+    -------
+    time: `~astropy.time.Time`
+        The times, in the TT scale.
+    """
+    days, day_ns = np.divmod(
+        spacecraft_to_tt2000(epoch, coarse_time, fine_time), S_PER_DAY * NS_PER_S
+    )
+    return Time(
+        J2000_JD + days.astype(np.float64),
+        day_ns / (S_PER_DAY * NS_PER_S),
+        format="jd",
+        scale="tt",
+    )
+
+
+@lru_cache()
+def _epoch_tai(epoch: str) -> int:
+    """TAI nanoseconds of a UTC epoch."""
+    return _utc_to_tai_ns(_isot_to_unix_ns(epoch))
+
+
+def _j2000_tai() -> int:
+    """TAI nanoseconds of J2000, 2000-01-01T12:00:00 TT."""
+    # TAI nanoseconds read as unix nanoseconds give the TAI calendar time
+    return _isot_to_unix_ns("2000-01-01T12:00:00") - TT_MINUS_TAI_NS
+
+
+def _isot_to_unix_ns(isot: str) -> int:
+    """Unix nanoseconds of a UTC ISO 8601 time."""
+    return int(np.datetime64(isot, "ns").astype(np.int64))
+
+
+def _utc_to_tai_ns(unix_ns: int) -> int:
+    """TAI nanoseconds of a unix time in nanoseconds."""
+    starts, offsets = leap_second_table()
+    utc_starts = starts - offsets
+    i = int(np.searchsorted(utc_starts, unix_ns, side="right")) - 1
+    return unix_ns + int(offsets[max(i, 0)])
+
+
+def _tai_to_unix_ns(tai: np.ndarray) -> np.ndarray:
+    """Unix nanoseconds of TAI nanoseconds."""
+    starts, offsets = leap_second_table()
+    i = np.maximum(np.searchsorted(starts, tai, side="right") - 1, 0)
+    # A time in a leap second, just before the start of the next offset, is
+    # held at the start of the next UTC second
+    next_utc_starts = np.append(starts[1:] - offsets[1:], np.iinfo(np.int64).max)
+    return np.minimum(tai - offsets[i], next_utc_starts[i])
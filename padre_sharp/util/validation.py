@@ -2,52 +2,629 @@
 This module contains utilities for file and packet validation.
 """
 
-from typing import List
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+from typing import Iterator, List
 
 import numpy as np
-from ccsdspy import utils
 
+from padre_sharp.util import packets
 
-def validate_packet_checksums(file) -> List[str]:
+__all__ = [
+    "FindingCategory",
+    "Finding",
+    "ValidationFindings",
+    "find_checksum_errors",
+    "validate_packet_checksums",
+    "validate_primary_headers",
+    "validate_stream",
+    "validate",
+    "SequenceIssue",
+    "SEQUENCE_GAP_DTYPE",
+    "analyze_sequence_counts",
+]
+
+#: Number of distinct CCSDS sequence counts (14 bits), after which they wrap
+NUM_SEQUENCE_COUNTS = 2**14
+
+#: Custom validators run on raw files by the pipeline. The SHARP packet checksum
+#: is not defined yet, so `validate_packet_checksums` (the MEDDEA XOR checksum,
+#: kept as an example) is not included: it flags valid SHARP packets.
+DEFAULT_CUSTOM_VALIDATORS = []
+
+
+class FindingCategory(Enum):
+    """
+    The kinds of issue reported by validation.
+    """
+
+    EXCEPTION = "exception"
+    UNKNOWN_APID = "unknown APID"
+    TRUNCATION = "truncation"
+    MISSING_PACKETS = "missing packets"
+    OUT_OF_ORDER = "out of order"
+    CHECKSUM = "checksum error"
+    OTHER = "other"
+
+
+# Categories reported once per affected packet
+_PER_PACKET_CATEGORIES = (FindingCategory.CHECKSUM, FindingCategory.UNKNOWN_APID)
+
+# Messages of the list of strings view, see `Finding.messages`
+_MESSAGE_TEMPLATES = {
+    FindingCategory.CHECKSUM: "ChecksumWarning: Packet {index} has a checksum error.",
+    FindingCategory.UNKNOWN_APID: "UserWarning: Found unknown APID {value}",
+    FindingCategory.MISSING_PACKETS: "UserWarning: Missing packets found {indices}.",
+    FindingCategory.OUT_OF_ORDER: "UserWarning: Sequence count are out of order.",
+}
+
+
+@dataclass
+class Finding:
+    """
+    A single validation issue, possibly affecting many packets.
+
+    Parameters
+    ----------
+    category: `FindingCategory`
+        The kind of issue.
+    indices: `np.ndarray`, optional
+        The packet indices affected by the issue. For
+        `FindingCategory.MISSING_PACKETS` these are the missing sequence counts.
+    values: `np.ndarray`, optional
+        A value for each of ``indices``, e.g. the unknown APID of each packet.
+    apid: `int`, optional
+        The APID the issue applies to.
+    message: `str`, optional
+        The message for categories without a message template.
+    """
+
+    category: FindingCategory
+    indices: np.ndarray = None
+    values: np.ndarray = None
+    apid: int = None
+    message: str = None
+
+    def __post_init__(self):
+        if self.indices is None:
+            self.indices = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        if self.category in _PER_PACKET_CATEGORIES:
+            return len(self.indices)
+        return 1
+
+    def messages(self, start: int = 0) -> Iterator[str]:
+        """
+        Render the messages of the finding, one per packet where applicable.
+
+        Parameters
+        ----------
+        start: `int`, optional
+            Index of the first message to render.
+        """
+        template = _MESSAGE_TEMPLATES.get(self.category)
+        if template is None:
+            yield from [self.message][start:]
+        elif self.category in _PER_PACKET_CATEGORIES:
+            values = self.indices if self.values is None else self.values
+            for index, value in zip(self.indices[start:], values[start:]):
+                yield template.format(index=index, value=value)
+        else:
+            yield from [template.format(indices=self.indices.tolist())][start:]
+
+
+class ValidationFindings(Sequence):
+    """
+    The issues found while validating a file.
+
+    Findings are held as arrays of packet indices per category, so a badly
+    corrupted file does not produce one string per packet. The individual
+    messages are only rendered on request: iterating or indexing the findings
+    behaves like the list of "WarningType: message" strings that validation used
+    to return, while `summary` gives one aggregated line per issue.
+
+    Parameters
+    ----------
+    findings: `list[Finding]`, optional
+        The initial findings.
+    """
+
+    def __init__(self, findings: List[Finding] = None):
+        self._findings = list(findings or [])
+
+    def add(self, category: FindingCategory, **kwargs):
+        """
+        Add a finding, see `Finding` for the arguments.
+        """
+        self._findings.append(Finding(category, **kwargs))
+
+    def extend(self, findings):
+        """
+        Add the findings of another `ValidationFindings` or a list of strings.
+        """
+        if isinstance(findings, ValidationFindings):
+            self._findings.extend(findings._findings)
+        else:
+            for message in findings:
+                self.add(FindingCategory.OTHER, message=message)
+
+    @property
+    def findings(self) -> List[Finding]:
+        return list(self._findings)
+
+    @property
+    def counts(self) -> dict:
+        """
+        Number of affected packets (or findings) for each category found.
+        """
+        counts = {}
+        for finding in self._findings:
+            if finding.category is FindingCategory.MISSING_PACKETS:
+                count = len(finding.indices)
+            else:
+                count = len(finding)
+            counts[finding.category] = counts.get(finding.category, 0) + count
+        return counts
+
+    def indices(self, category: FindingCategory) -> np.ndarray:
+        """
+        The indices held by all findings of a category.
+        """
+        return np.concatenate(
+            [np.empty(0, dtype=np.int64)]
+            + [f.indices for f in self._findings if f.category is category]
+        )
+
+    def summary(self) -> List[str]:
+        """
+        Aggregated, human readable lines such as
+        "4,812 checksum errors in packets 10..99,812".
+        """
+        lines = []
+        for category in _PER_PACKET_CATEGORIES:
+            indices = self.indices(category)
+            if len(indices) == 0:
+                continue
+            line = f"{len(indices):,} {_plural(category.value, len(indices))}"
+            if category is FindingCategory.UNKNOWN_APID:
+                apids = np.concatenate(
+                    [f.values for f in self._findings if f.category is category]
+                )
+                line += f" {np.unique(apids).tolist()}"
+            lines.append(line + f" in packets {indices.min():,}..{indices.max():,}")
+
+        for finding in self._findings:
+            if finding.category in _PER_PACKET_CATEGORIES:
+                continue
+            if finding.category is FindingCategory.MISSING_PACKETS:
+                missing = finding.indices
+                lines.append(
+                    f"{len(missing):,} missing packets for APID {finding.apid} in "
+                    f"sequence counts {missing.min():,}..{missing.max():,}"
+                )
+            elif finding.category is FindingCategory.OUT_OF_ORDER:
+                lines.append(f"Sequence counts out of order for APID {finding.apid}")
+            else:
+                lines.extend(finding.messages())
+        return lines
+
+    def __iter__(self) -> Iterator[str]:
+        for finding in self._findings:
+            yield from finding.messages()
+
+    def __len__(self) -> int:
+        return sum(len(finding) for finding in self._findings)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        for finding in self._findings:
+            if 0 <= index < len(finding):
+                return next(finding.messages(start=index))
+            index -= len(finding)
+        raise IndexError("validation finding index out of range")
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ValidationFindings, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ValidationFindings({self.summary()})"
+
+
+def _plural(noun: str, count: int) -> str:
+    return noun if count == 1 else f"{noun}s"
+
+
+def find_checksum_errors(file) -> np.ndarray:
+    """
+    Find the packets whose contents do not match their checksums.
+
+    The rolling XOR of every packet is computed in one vectorized pass over the
+    file buffer. A packet is in error if its final XOR value is not 0. This is
+    MEDDEA's checksum, included as an example: SHARP packets do not follow it, so
+    it is not part of `DEFAULT_CUSTOM_VALIDATORS`.
+
+    Parameters
+    ----------
+    file: `str | BytesIO | PacketView`
+        A file path (str), file-like object with a `.read()` method or an already
+        scanned `~padre_sharp.util.packets.PacketView`.
+
+    Returns
+    -------
+    `np.ndarray` of the indices of the packets with a checksum error.
+    """
+    view = packets.scan_packets(file)
+    return np.flatnonzero(view.checksums != 0)
+
+
+def validate_packet_checksums(file) -> ValidationFindings:
     """
     Custom Validation Function to check that all packets have contents that match their checksums. This is achieved be a rolling XOR of the packet contents. If the final XOR value is not 0, a warning is issued.
 
+    Included is MEDDEA's checksum validation as an example, it is not run by
+    default until the SHARP checksum is defined. See `find_checksum_errors` for
+    the array-based version of this check.
+
+    Parameters
+    ----------
+    file: `str | BytesIO | PacketView`
+        A file path (str), file-like object with a `.read()` method or an already
+        scanned `~padre_sharp.util.packets.PacketView`.
+
+    Returns
+    -------
+    `ValidationFindings`, which also behaves as a list of strings, each in the format "WarningType: message", describing potential validation issues. Empty if no warnings are issued.
+    """
+    findings = ValidationFindings()
+    errors = find_checksum_errors(file)
+    if len(errors) != 0:
+        findings.add(FindingCategory.CHECKSUM, indices=errors)
+    return findings
+
+
+def validate_primary_headers(file, valid_apids: List[int] = None) -> ValidationFindings:
+    """
+    Check the primary headers and integrity of a file containing CCSDS packets.
+
+    This reproduces the checks (and messages) of ``ccsdspy.utils.validate`` on the
+    header table of a `~padre_sharp.util.packets.PacketView`, so the packets are
+    not split again. A partial packet at the end of the file is only reported as
+    a truncation.
+
+    Parameters
+    ----------
+    file: `str | BytesIO | PacketView`
+        A file path (str), file-like object with a `.read()` method or an already
+        scanned `~padre_sharp.util.packets.PacketView`.
+    valid_apids: `list[int]| None`, optional
+       Optional list of valid APIDs. If specified, warning will be issued when
+       an APID is encountered outside this list.
+
+    Returns
+    -------
+    `ValidationFindings`, which also behaves as a list of strings, each in the
+    format "WarningType: message", describing potential validation issues.
+    Empty if no warnings are issued.
+    """
+    view = packets.scan_packets(file)
+    sequence_counts = _SequenceCountTracker()
+    sequence_counts.update(view.headers)
+
+    findings = ValidationFindings()
+    _add_apid_findings(findings, view.headers, valid_apids)
+    _add_truncation_findings(findings, view)
+    sequence_counts.add_findings(findings)
+    return findings
+
+
+def validate_stream(
+    file,
+    valid_apids: List[int] = None,
+    check_checksums: bool = False,
+    chunk_size: int = packets.DEFAULT_CHUNK_SIZE,
+) -> ValidationFindings:
+    """
+    Validate a file containing CCSDS packets in bounded memory.
+
+    The file is read in chunks of ``chunk_size`` bytes (see
+    `~padre_sharp.util.packets.iter_packet_views`) and the header, integrity and
+    checksum checks are run incrementally, so peak memory does not grow with the
+    size of the file. The findings are identical to those of `validate`, with
+    `validate_packet_checksums` as a custom validator if ``check_checksums`` is set.
+
     Parameters
     ----------
     file: `str | BytesIO`
         A file path (str) or file-like object with a `.read()` method.
+    valid_apids: `list[int]| None`, optional
+       Optional list of valid APIDs. If specified, warning will be issued when
+       an APID is encountered outside this list.
+    check_checksums: `bool`, optional
+        Whether to check the packet checksums with `find_checksum_errors`, off by
+        default until the SHARP checksum is defined.
+    chunk_size: `int`, optional
+        Number of bytes to read at a time.
 
     Returns
     -------
-    List of strings, each in the format "WarningType: message", describing potential validation issues. Returns an empty list if no warnings are issued.
-    """
-    validation_warnings = []
-    # Read the file
-    packets = utils.split_packet_bytes(file)
-    for i, packet in enumerate(packets):
-        # Convert to an array of u16 integers
-        packet_arr = np.frombuffer(packet, dtype=np.uint8)
-
-        # Insert your custom checksum validation here
-        # Included is MEDDEA's checksum validation as an example
-
-        # checksum_validation = np.bitwise_xor.reduce(packet_arr)
-        checksum_validation = 0
-
-        # Make sure the Checksum Validation was correct
-        # For MEDDEA This means the checksum_validation should be 0
-        # Modify for you own checksum validation
-        if checksum_validation != 0:
-            validation_warnings.append(
-                f"ChecksumWarning: Packet {i} has a checksum error."
+    `ValidationFindings`, which also behaves as a list of strings, each in the
+    format "WarningType: message", describing potential validation issues.
+    Empty if no warnings are issued.
+    """
+    findings = ValidationFindings()
+    checksum_errors = []
+    sequence_counts = _SequenceCountTracker()
+    try:
+        for first_index, view in packets.iter_packet_views(file, chunk_size):
+            _add_apid_findings(findings, view.headers, valid_apids, first_index)
+            sequence_counts.update(view.headers)
+            if check_checksums:
+                checksum_errors.append(find_checksum_errors(view) + first_index)
+    except Exception as e:
+        # Capture any exceptions as warnings
+        return _exception_findings(e)
+
+    _add_truncation_findings(findings, view)
+    sequence_counts.add_findings(findings)
+    if check_checksums:
+        checksum_errors = np.concatenate(checksum_errors)
+        if len(checksum_errors) != 0:
+            findings.add(FindingCategory.CHECKSUM, indices=checksum_errors)
+    return findings
+
+
+class SequenceIssue(IntEnum):
+    """
+    The kinds of sequence count issue in a gap table.
+    """
+
+    MISSING = 0
+    DUPLICATE = 1
+    OUT_OF_ORDER = 2
+
+
+#: Structured dtype of the gap table returned by `analyze_sequence_counts`
+SEQUENCE_GAP_DTYPE = np.dtype(
+    [
+        ("apid", np.uint16),
+        ("issue", np.uint8),
+        ("packet_index", np.int64),
+        ("first_count", np.uint16),
+        ("num_packets", np.int64),
+    ]
+)
+
+
+def analyze_sequence_counts(file) -> np.ndarray:
+    """
+    Find missing, duplicated and out of order packets of each APID.
+
+    The sequence counts of each APID are unwrapped (the 14-bit counter wraps
+    from 16383 to 0) by taking every step between consecutive packets as the
+    shortest signed distance modulo 2**14. All APIDs are analyzed together with
+    array operations, without a Python loop over packets.
+
+    Each row of the returned gap table describes one run of packets:
+
+    - `SequenceIssue.MISSING`: ``num_packets`` consecutive sequence counts
+      starting at ``first_count`` were never received. ``packet_index`` is the
+      received packet with the next sequence count. Packets that arrive late
+      fill their gap.
+    - `SequenceIssue.DUPLICATE`: ``num_packets`` consecutive sequence counts
+      starting at ``first_count`` were received again. ``packet_index`` is the
+      first repeated packet.
+    - `SequenceIssue.OUT_OF_ORDER`: the sequence count went back by
+      ``num_packets`` at ``packet_index``, whose count is ``first_count``.
+
+    Parameters
+    ----------
+    file: `str | BytesIO | PacketView | np.ndarray`
+        A file path (str), file-like object with a `.read()` method, an already
+        scanned `~padre_sharp.util.packets.PacketView` or its header table.
+
+    Returns
+    -------
+    `np.ndarray` with dtype `SEQUENCE_GAP_DTYPE`, sorted by APID and packet
+    index.
+    """
+    if isinstance(file, np.ndarray):
+        headers = file
+    else:
+        headers = packets.scan_packets(file).headers
+    if len(headers) == 0:
+        return np.empty(0, dtype=SEQUENCE_GAP_DTYPE)
+
+    # Group the packets by APID, keeping the file order within each group
+    order = np.argsort(headers["apid"], kind="stable")
+    apids = headers["apid"][order]
+    seq_counts = headers["sequence_count"][order].astype(np.int64)
+    group_start = np.ones(len(order), dtype=bool)
+    group_start[1:] = apids[1:] != apids[:-1]
+
+    # Unwrap each group from its first sequence count
+    steps = np.zeros(len(order), dtype=np.int64)
+    steps[1:] = (seq_counts[1:] - seq_counts[:-1]) % NUM_SEQUENCE_COUNTS
+    steps[steps >= NUM_SEQUENCE_COUNTS // 2] -= NUM_SEQUENCE_COUNTS
+    steps[group_start] = 0
+    group = np.cumsum(group_start) - 1
+    cumulative = np.cumsum(steps)
+    first = np.flatnonzero(group_start)
+    unwrapped = cumulative - cumulative[first][group] + seq_counts[first][group]
+
+    backward = steps < 0
+    tables = [
+        _gap_rows(
+            apids[backward],
+            SequenceIssue.OUT_OF_ORDER,
+            order[backward],
+            seq_counts[backward],
+            -steps[backward],
+        )
+    ]
+
+    # Sort each group by unwrapped count, ties stay in file order
+    by_count = np.lexsort((unwrapped, apids))
+    apids, unwrapped, order = apids[by_count], unwrapped[by_count], order[by_count]
+    same_group = apids[1:] == apids[:-1]
+    increments = unwrapped[1:] - unwrapped[:-1]
+
+    missing = same_group & (increments > 1)
+    tables.append(
+        _gap_rows(
+            apids[1:][missing],
+            SequenceIssue.MISSING,
+            order[1:][missing],
+            unwrapped[:-1][missing] + 1,
+            increments[missing] - 1,
+        )
+    )
+
+    # Merge repeated packets with consecutive counts into runs
+    repeated = np.flatnonzero(same_group & (increments == 0)) + 1
+    run_start = np.ones(len(repeated), dtype=bool)
+    run_start[1:] = (np.diff(unwrapped[repeated]) != 1) | (
+        apids[repeated[1:]] != apids[repeated[:-1]]
+    )
+    starts = repeated[run_start]
+    tables.append(
+        _gap_rows(
+            apids[starts],
+            SequenceIssue.DUPLICATE,
+            order[starts],
+            unwrapped[starts],
+            np.diff(np.append(np.flatnonzero(run_start), len(repeated))),
+        )
+    )
+
+    gaps = np.concatenate(tables)
+    return gaps[np.lexsort((gaps["issue"], gaps["packet_index"], gaps["apid"]))]
+
+
+def _gap_rows(apids, issue, packet_index, counts, num_packets) -> np.ndarray:
+    rows = np.empty(len(apids), dtype=SEQUENCE_GAP_DTYPE)
+    rows["apid"] = apids
+    rows["issue"] = issue
+    rows["packet_index"] = packet_index
+    rows["first_count"] = counts % NUM_SEQUENCE_COUNTS
+    rows["num_packets"] = num_packets
+    return rows
+
+
+def _exception_findings(exception: Exception) -> ValidationFindings:
+    return ValidationFindings(
+        [Finding(FindingCategory.EXCEPTION, message=f"Exception: {str(exception)}")]
+    )
+
+
+def _add_apid_findings(
+    findings: ValidationFindings,
+    headers: np.ndarray,
+    valid_apids: List[int] = None,
+    first_index: int = 0,
+):
+    """
+    Report unknown APIDs, once per packet in the order they appear.
+    """
+    if valid_apids is None:
+        return
+    unknown = np.flatnonzero(~np.isin(headers["apid"], list(valid_apids)))
+    if len(unknown) != 0:
+        findings.add(
+            FindingCategory.UNKNOWN_APID,
+            indices=unknown + first_index,
+            values=headers["apid"][unknown],
+        )
+
+
+def _add_truncation_findings(findings: ValidationFindings, view: packets.PacketView):
+    """
+    Report bytes after the last complete packet of a view.
+    """
+    num_trailing_bytes = view.num_trailing_bytes
+    if num_trailing_bytes == 0:
+        return
+
+    if num_trailing_bytes < packets.PRIMARY_HEADER_NUM_BYTES:
+        findings.add(
+            FindingCategory.TRUNCATION,
+            message=(
+                "UserWarning: File appears truncated or with garbage bytes. Unable "
+                "to enough bytes for primary header"
+            ),
+        )
+        missing_bytes = -num_trailing_bytes
+    else:
+        length_field = view.file_bytes[view.end + 4 : view.end + 6].astype(int)
+        missing_bytes = (
+            ((length_field[0] << 8) | length_field[1])
+            + packets.PRIMARY_HEADER_NUM_BYTES
+            + 1
+            - num_trailing_bytes
+        )
+    findings.add(
+        FindingCategory.TRUNCATION,
+        message=(
+            f"UserWarning: File appears truncated-- missing {missing_bytes} byte "
+            "(or maybe garbage at end)"
+        ),
+    )
+
+
+class _SequenceCountTracker:
+    """
+    Accumulate the sequence counts of each APID over one or more header tables.
+
+    Each APID keeps a fixed-size table of the 14-bit sequence counts seen so far,
+    so memory does not grow with the number of packets.
+    """
+
+    def __init__(self):
+        # APID -> [first count, last count, counts seen, out of order], in order
+        # of first appearance
+        self._state = {}
+
+    def update(self, headers: np.ndarray):
+        apids, first_index = np.unique(headers["apid"], return_index=True)
+        for apid in apids[np.argsort(first_index)]:
+            seq_counts = headers["sequence_count"][headers["apid"] == apid].astype(int)
+            state = self._state.setdefault(
+                int(apid),
+                [
+                    seq_counts[0],
+                    seq_counts[0],
+                    np.zeros(NUM_SEQUENCE_COUNTS, dtype=bool),
+                    False,
+                ],
+            )
+            state[2][seq_counts] = True
+            state[3] = (
+                state[3]
+                or seq_counts[0] < state[1]
+                or bool(np.any(np.diff(seq_counts) < 0))
             )
+            state[1] = seq_counts[-1]
 
-    return validation_warnings
+    def add_findings(self, findings: ValidationFindings):
+        for apid, (first, last, seen, out_of_order) in self._state.items():
+            missing = first + np.flatnonzero(~seen[first : last + 1])
+            if len(missing) != 0:
+                findings.add(
+                    FindingCategory.MISSING_PACKETS, indices=missing, apid=apid
+                )
+            if out_of_order:
+                findings.add(FindingCategory.OUT_OF_ORDER, apid=apid)
 
 
 def validate(
     file, valid_apids: List[int] = None, custom_validators: List[callable] = None
-) -> List[str]:
+) -> ValidationFindings:
     """
     Validate a file containing CCSDS packets and capturing any exceptions or warnings they generate.
     This function checks:
@@ -55,30 +632,40 @@ def validate(
     - Primary header consistency (sequence counts in order, no missing sequence numbers, found APIDs)
     - File integrity (truncation, extra bytes)
 
+    The file is read and scanned only once. The resulting
+    `~padre_sharp.util.packets.PacketView` is shared by the header checks and
+    every custom validator.
+
     Parameters
     ----------
-    file: `str | BytesIO`
-        A file path (str) or file-like object with a `.read()` method.
+    file: `str | BytesIO | PacketView`
+        A file path (str), file-like object with a `.read()` method or an already
+        scanned `~padre_sharp.util.packets.PacketView`.
     valid_apids: `list[int]| None`, optional
        Optional list of valid APIDs. If specified, warning will be issued when
        an APID is encountered outside this list.
     custom_validators: `List[callable]`, optional
-        List of custom validation functions that take a file-like object as input and return a list of warnings
+        List of custom validation functions that take a
+        `~padre_sharp.util.packets.PacketView` as input and return a
+        `ValidationFindings` or a list of warnings
 
     Returns
     -------
-    List of strings, each in the format "WarningType: message", describing
-    potential validation issues. Returns an empty list if no warnings are issued.
+    `ValidationFindings`, which also behaves as a list of strings, each in the
+    format "WarningType: message", describing potential validation issues.
+    Empty if no warnings are issued.
     """
-    validation_warnings = []
-    # Run Baseline CCSDSPy validation
-    ccsdspy_warnings = utils.validate(file, valid_apids)
-    validation_warnings.extend(ccsdspy_warnings)
+    try:
+        view = packets.scan_packets(file)
+    except Exception as e:
+        # Capture any exceptions as warnings
+        return _exception_findings(e)
+
+    findings = validate_primary_headers(view, valid_apids)
     # Run custom validation functions
     if custom_validators:
         for validator in custom_validators:
             # Execute Custom Validator
-            custom_warnings = validator(file)
-            validation_warnings.extend(custom_warnings)
+            findings.extend(validator(view))
 
-    return validation_warnings
+    return findings